@@ -0,0 +1,39 @@
+"""Cache de questões geradas por IA
+
+Revision ID: 8c1f4e2a9b37
+Revises: 27459e23a5a0
+Create Date: 2026-10-18 09:12:40.512833
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f4e2a9b37'
+down_revision: Union[str, Sequence[str], None] = '27459e23a5a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('questoes_geradas_cache',
+    sa.Column('chave', sa.String(length=64), nullable=False),
+    sa.Column('materia_id', sa.Integer(), nullable=True),
+    sa.Column('texto_hash', sa.String(length=64), nullable=False),
+    sa.Column('questoes', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('ultimo_acesso', sa.TIMESTAMP(), nullable=False),
+    sa.ForeignKeyConstraint(['materia_id'], ['materias.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('chave')
+    )
+    op.create_index(op.f('ix_questoes_geradas_cache_materia_id'), 'questoes_geradas_cache', ['materia_id'], unique=False)
+    op.create_index(op.f('ix_questoes_geradas_cache_ultimo_acesso'), 'questoes_geradas_cache', ['ultimo_acesso'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_questoes_geradas_cache_ultimo_acesso'), table_name='questoes_geradas_cache')
+    op.drop_index(op.f('ix_questoes_geradas_cache_materia_id'), table_name='questoes_geradas_cache')
+    op.drop_table('questoes_geradas_cache')
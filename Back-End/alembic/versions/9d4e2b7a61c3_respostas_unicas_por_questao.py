@@ -0,0 +1,33 @@
+"""Uma resposta por questão em cada avaliação do aluno
+
+Revision ID: 9d4e2b7a61c3
+Revises: d2a85f6e3c10
+Create Date: 2026-10-18 14:02:37.518260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e2b7a61c3'
+down_revision: Union[str, Sequence[str], None] = 'd2a85f6e3c10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Envios repetidos podiam gravar a mesma questão mais de uma vez: mantém a primeira resposta
+    op.execute("""
+        DELETE FROM respostas_alunos
+        WHERE id NOT IN (SELECT MIN(id) FROM respostas_alunos GROUP BY aluno_id, avaliacao_id, questao_id)
+    """)
+    # O índice único substitui o de aluno_id, que é prefixo dele
+    op.drop_index('idx_respostas_aluno', table_name='respostas_alunos')
+    op.create_index('idx_respostas_aluno', 'respostas_alunos', ['aluno_id', 'avaliacao_id', 'questao_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_respostas_aluno', table_name='respostas_alunos')
+    op.create_index('idx_respostas_aluno', 'respostas_alunos', ['aluno_id'], unique=False)
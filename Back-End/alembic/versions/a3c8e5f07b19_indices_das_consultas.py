@@ -0,0 +1,69 @@
+"""Índices das consultas do crud
+
+Revision ID: a3c8e5f07b19
+Revises: f19a6c2d8e54
+Create Date: 2026-10-18 18:21:40.117092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c8e5f07b19'
+down_revision: Union[str, Sequence[str], None] = 'f19a6c2d8e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # senha_acesso identifica a matéria na inscrição dos alunos: precisa ser única
+    duplicadas = op.get_bind().execute(sa.text(
+        "SELECT senha_acesso FROM materias GROUP BY senha_acesso HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if duplicadas:
+        raise RuntimeError(
+            "Há matérias com a mesma senha de acesso; altere-as antes de migrar: " + ", ".join(duplicadas)
+        )
+    op.create_index('idx_materias_senha_acesso', 'materias', ['senha_acesso'], unique=True)
+    op.create_index('idx_materias_professor', 'materias', ['professor_id', 'id'], unique=False)
+    op.create_index('idx_avaliacoes_materia', 'avaliacoes', ['materia_id'], unique=False)
+    op.create_index('idx_respostas_questao', 'respostas_alunos', ['questao_id'], unique=False)
+    op.create_index('idx_desempenho_avaliacao', 'desempenho', ['avaliacao_id'], unique=False)
+
+    # Índices da etapa 1 ampliados para as consultas reais: (filtro, id) atende também a ordenação
+    # da paginação por cursor. As respostas por (aluno, avaliação) já usam o prefixo do índice único
+    # idx_respostas_aluno (aluno_id, avaliacao_id, questao_id)
+    op.drop_index('idx_inscricoes_aluno', table_name='inscricoes')
+    op.create_index('idx_inscricoes_aluno', 'inscricoes', ['aluno_id', 'id'], unique=False)
+    op.drop_index('idx_inscricoes_materia', table_name='inscricoes')
+    op.create_index('idx_inscricoes_materia', 'inscricoes', ['materia_id', 'id'], unique=False)
+    op.drop_index('idx_questoes_materia', table_name='questoes')
+    op.create_index('idx_questoes_materia', 'questoes', ['materia_id', 'id'], unique=False)
+    # Ranking da turma (crud.get_desempenho_individual_alunos), na mesma ordem da consulta
+    op.drop_index('idx_desempenho_materia', table_name='desempenho')
+    op.create_index(
+        'idx_desempenho_materia', 'desempenho',
+        ['materia_id', sa.text('COALESCE(nota_final, 0) DESC'), sa.text('id DESC')], unique=False
+    )
+    # Coberto pela restrição única _aluno_avaliacao_uc (aluno_id, avaliacao_id)
+    op.drop_index('idx_desempenho_aluno', table_name='desempenho')
+
+
+def downgrade() -> None:
+    op.create_index('idx_desempenho_aluno', 'desempenho', ['aluno_id'], unique=False)
+    op.drop_index('idx_desempenho_materia', table_name='desempenho')
+    op.create_index('idx_desempenho_materia', 'desempenho', ['materia_id'], unique=False)
+    op.drop_index('idx_questoes_materia', table_name='questoes')
+    op.create_index('idx_questoes_materia', 'questoes', ['materia_id'], unique=False)
+    op.drop_index('idx_inscricoes_materia', table_name='inscricoes')
+    op.create_index('idx_inscricoes_materia', 'inscricoes', ['materia_id'], unique=False)
+    op.drop_index('idx_inscricoes_aluno', table_name='inscricoes')
+    op.create_index('idx_inscricoes_aluno', 'inscricoes', ['aluno_id'], unique=False)
+
+    op.drop_index('idx_desempenho_avaliacao', table_name='desempenho')
+    op.drop_index('idx_respostas_questao', table_name='respostas_alunos')
+    op.drop_index('idx_avaliacoes_materia', table_name='avaliacoes')
+    op.drop_index('idx_materias_professor', table_name='materias')
+    op.drop_index('idx_materias_senha_acesso', table_name='materias')
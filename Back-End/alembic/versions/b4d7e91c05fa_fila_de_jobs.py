@@ -0,0 +1,42 @@
+"""Fila de jobs em segundo plano
+
+Revision ID: b4d7e91c05fa
+Revises: 8c1f4e2a9b37
+Create Date: 2026-10-18 11:03:27.144092
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d7e91c05fa'
+down_revision: Union[str, Sequence[str], None] = '8c1f4e2a9b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('tipo', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('parametros', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('resultado', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('erro', sa.Text(), nullable=True),
+    sa.Column('user_type', sa.String(length=20), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('tentativas', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    sa.Column('iniciado_em', sa.TIMESTAMP(), nullable=True),
+    sa.Column('concluido_em', sa.TIMESTAMP(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_jobs_status', 'jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_jobs_status', table_name='jobs')
+    op.drop_table('jobs')
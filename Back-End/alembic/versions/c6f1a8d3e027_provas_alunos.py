@@ -0,0 +1,35 @@
+"""Provas sorteadas por aluno
+
+Revision ID: c6f1a8d3e027
+Revises: a3c8e5f07b19
+Create Date: 2026-10-18 19:02:13.448215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f1a8d3e027'
+down_revision: Union[str, Sequence[str], None] = 'a3c8e5f07b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('provas_alunos',
+    sa.Column('avaliacao_id', sa.Integer(), nullable=False),
+    sa.Column('aluno_id', sa.Integer(), nullable=False),
+    sa.Column('semente', sa.BigInteger(), nullable=False),
+    sa.Column('questoes', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['aluno_id'], ['alunos.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['avaliacao_id'], ['avaliacoes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('avaliacao_id', 'aluno_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('provas_alunos')
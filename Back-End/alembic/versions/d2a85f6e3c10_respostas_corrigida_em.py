@@ -0,0 +1,33 @@
+"""Marca de correção nas respostas dos alunos
+
+Revision ID: d2a85f6e3c10
+Revises: b4d7e91c05fa
+Create Date: 2026-10-18 13:40:05.871224
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a85f6e3c10'
+down_revision: Union[str, Sequence[str], None] = 'b4d7e91c05fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('respostas_alunos', sa.Column('corrigida_em', sa.TIMESTAMP(), nullable=True))
+    # As respostas existentes já tiveram correta/nota definidas no envio: contam como corrigidas
+    op.execute("UPDATE respostas_alunos SET corrigida_em = created_at")
+    # Busca das pendentes de uma avaliação
+    op.create_index(
+        'idx_respostas_pendentes', 'respostas_alunos', ['avaliacao_id'],
+        unique=False, postgresql_where=sa.text('corrigida_em IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_respostas_pendentes', table_name='respostas_alunos')
+    op.drop_column('respostas_alunos', 'corrigida_em')
@@ -0,0 +1,40 @@
+"""Desempenho incremental: soma das notas e unicidade por aluno/avaliação
+
+Revision ID: e7b3c9d41a28
+Revises: 9d4e2b7a61c3
+Create Date: 2026-10-18 15:22:51.390617
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3c9d41a28'
+down_revision: Union[str, Sequence[str], None] = '9d4e2b7a61c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('desempenho', sa.Column('soma_notas', sa.DECIMAL(precision=8, scale=2), server_default='0', nullable=False))
+    # Recalcula todos os desempenhos a partir das respostas existentes (as linhas antigas não têm
+    # soma_notas e podem estar duplicadas); daqui em diante os contadores são incrementais
+    op.execute("DELETE FROM desempenho")
+    op.execute("""
+        INSERT INTO desempenho (aluno_id, avaliacao_id, materia_id, total_questoes, acertos, soma_notas, tempo_total, nota_final)
+        SELECT r.aluno_id, r.avaliacao_id, a.materia_id, COUNT(*),
+               SUM(CASE WHEN r.corrigida_em IS NOT NULL AND r.correta THEN 1 ELSE 0 END),
+               COALESCE(SUM(CASE WHEN r.corrigida_em IS NOT NULL THEN r.nota ELSE 0 END), 0),
+               COALESCE(SUM(r.tempo_resposta), 0),
+               ROUND(COALESCE(SUM(CASE WHEN r.corrigida_em IS NOT NULL THEN r.nota ELSE 0 END), 0) / COUNT(*), 2)
+        FROM respostas_alunos r JOIN avaliacoes a ON a.id = r.avaliacao_id
+        GROUP BY r.aluno_id, r.avaliacao_id, a.materia_id
+    """)
+    op.create_unique_constraint('_aluno_avaliacao_uc', 'desempenho', ['aluno_id', 'avaliacao_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('_aluno_avaliacao_uc', 'desempenho', type_='unique')
+    op.drop_column('desempenho', 'soma_notas')
@@ -0,0 +1,46 @@
+"""Relatório agregado por matéria
+
+Revision ID: f19a6c2d8e54
+Revises: e7b3c9d41a28
+Create Date: 2026-10-18 17:05:12.603448
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19a6c2d8e54'
+down_revision: Union[str, Sequence[str], None] = 'e7b3c9d41a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('relatorio_materia',
+    sa.Column('materia_id', sa.Integer(), nullable=False),
+    sa.Column('total_alunos', sa.Integer(), nullable=False),
+    sa.Column('soma_notas', sa.DECIMAL(precision=12, scale=2), nullable=False),
+    sa.Column('quantidade_notas', sa.Integer(), nullable=False),
+    sa.Column('menor_nota', sa.DECIMAL(precision=5, scale=2), nullable=True),
+    sa.Column('maior_nota', sa.DECIMAL(precision=5, scale=2), nullable=True),
+    sa.ForeignKeyConstraint(['materia_id'], ['materias.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('materia_id')
+    )
+    # Preenche a partir das tabelas de origem (o mesmo que `python -m core.relatorios`)
+    op.execute("""
+        INSERT INTO relatorio_materia (materia_id, total_alunos, soma_notas, quantidade_notas, menor_nota, maior_nota)
+        SELECT m.id, COALESCE(i.total, 0), COALESCE(d.soma, 0), COALESCE(d.quantidade, 0), d.menor, d.maior
+        FROM materias m
+        LEFT JOIN (SELECT materia_id, COUNT(*) AS total FROM inscricoes GROUP BY materia_id) i ON i.materia_id = m.id
+        LEFT JOIN (
+            SELECT materia_id, COALESCE(SUM(nota_final), 0) AS soma, COUNT(*) AS quantidade,
+                   MIN(nota_final) AS menor, MAX(nota_final) AS maior
+            FROM desempenho GROUP BY materia_id
+        ) d ON d.materia_id = m.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('relatorio_materia')
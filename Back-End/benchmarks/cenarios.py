@@ -0,0 +1,243 @@
+"""Suíte de benchmarks da API: massa de dados realista e cenários de uso sob concorrência.
+
+Popula o banco de DATABASE_URL (Postgres ou SQLite; use um banco descartável) com centenas de
+professores, milhares de matérias e centenas de milhares de respostas (benchmarks.dados), e
+depois conduz a app FastAPI real, em processo via ASGI, pelos cenários:
+
+    login         rajada de logins de alunos (POST /token, bcrypt)
+    inicio_prova  alunos abrindo a prova (GET /avaliacoes/{id}/questoes)
+    submissao     envio das provas no fim do prazo (POST /avaliacoes/{id}/submit); grava no banco,
+                  cada execução usa pares aluno/avaliação ainda sem respostas
+    relatorio     professores consultando relatorio-geral e desempenho-individual
+    analise_itens professores consultando a análise de itens das avaliações já respondidas
+
+Para cada cenário imprime, em JSON, vazão, latências p50/p95/p99, erros por status e consultas
+SQL por requisição, junto com o commit atual, para comparar execuções entre commits:
+
+    cd Back-End
+    python -m benchmarks.cenarios --popular          # uma vez: cria as tabelas e popula
+    python -m benchmarks.cenarios --concorrencia 50 --requisicoes 1000 > resultado.json
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+import httpx
+import sqlalchemy as sa
+from sqlalchemy import event, select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import dados  # noqa: E402
+from core import models, relatorios, security  # noqa: E402
+from core.database import AsyncSessionLocal, async_engine  # noqa: E402
+from main import app  # noqa: E402
+
+CENARIOS = {}
+
+def cenario(nome: str):
+    """Registra a função que monta as requisições de um cenário: async fn(conn, quantidade)."""
+    def registrar(fn):
+        CENARIOS[nome] = fn
+        return fn
+    return registrar
+
+def _headers(user_type: str, user_id: int, email: str) -> dict:
+    # Token emitido direto, sem passar pelo bcrypt do login (medido só no cenário login)
+    token = security.create_access_token(
+        {"sub": email, "user_type": user_type, "id": user_id}, timedelta(hours=1)
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+async def _amostra_inscricoes(conn, quantidade: int):
+    """(aluno_id, materia_id) espalhados pela tabela de inscrições."""
+    total = await conn.scalar(select(sa.func.count()).select_from(models.Inscricao))
+    passo = max(1, total // max(1, quantidade))
+    return (await conn.execute(
+        select(models.Inscricao.aluno_id, models.Inscricao.materia_id)
+        .where(models.Inscricao.id % passo == 0)
+        .order_by(models.Inscricao.id)
+        .limit(quantidade)
+    )).all()
+
+@cenario("login")
+async def _login(conn, quantidade):
+    linhas = await _amostra_inscricoes(conn, quantidade)
+    return [
+        ("POST", "/token", {"data": {"username": f"aluno{aluno_id}@bench", "password": dados.SENHA}})
+        for aluno_id, _ in linhas
+    ]
+
+@cenario("inicio_prova")
+async def _inicio_prova(conn, quantidade):
+    linhas = await _amostra_inscricoes(conn, quantidade)
+    primeiras = dict((await conn.execute(
+        select(models.Avaliacao.materia_id, sa.func.min(models.Avaliacao.id))
+        .where(models.Avaliacao.materia_id.in_({materia_id for _, materia_id in linhas}))
+        .group_by(models.Avaliacao.materia_id)
+    )).all())
+    return [
+        ("GET", f"/avaliacoes/{primeiras[materia_id]}/questoes",
+         {"headers": _headers("aluno", aluno_id, f"aluno{aluno_id}@bench")})
+        for aluno_id, materia_id in linhas if materia_id in primeiras
+    ]
+
+@cenario("submissao")
+async def _submissao(conn, quantidade):
+    i, a, r = models.Inscricao, models.Avaliacao, models.RespostaAluno
+    # Agrupados por avaliação: muitos alunos enviando a mesma prova no fim do prazo
+    pares = (await conn.execute(
+        select(i.aluno_id, a.id, a.materia_id)
+        .join(a, a.materia_id == i.materia_id)
+        .where(~sa.exists().where(r.aluno_id == i.aluno_id, r.avaliacao_id == a.id))
+        .order_by(a.id, i.aluno_id)
+        .limit(quantidade)
+    )).all()
+    questoes = {}
+    for materia_id, questao_id in (await conn.execute(
+        select(models.Questao.materia_id, models.Questao.id)
+        .where(models.Questao.materia_id.in_({materia_id for _, _, materia_id in pares}))
+    )).all():
+        questoes.setdefault(materia_id, []).append(questao_id)
+    return [
+        ("POST", f"/avaliacoes/{avaliacao_id}/submit", {
+            "headers": _headers("aluno", aluno_id, f"aluno{aluno_id}@bench"),
+            "json": {"respostas": [
+                {"questao_id": q, "resposta_aluno": "A" if (aluno_id + q) % 4 else "B", "tempo_resposta": 30}
+                for q in questoes[materia_id]
+            ]},
+        })
+        for aluno_id, avaliacao_id, materia_id in pares
+    ]
+
+@cenario("relatorio")
+async def _relatorio(conn, quantidade):
+    materias = (await conn.execute(
+        select(models.Materia.id, models.Materia.professor_id).order_by(models.Materia.id).limit(quantidade)
+    )).all()
+    requisicoes = []
+    for n in range(quantidade):
+        materia_id, professor_id = materias[n % len(materias)]
+        rota = "relatorio-geral" if n % 2 == 0 else "desempenho-individual"
+        requisicoes.append(("GET", f"/materias/{materia_id}/{rota}",
+                            {"headers": _headers("professor", professor_id, f"professor{professor_id}@bench")}))
+    return requisicoes
+
+@cenario("analise_itens")
+async def _analise_itens(conn, quantidade):
+    # Poucas avaliações consultadas muitas vezes: a primeira calcula, as demais usam o cache
+    avaliacoes = (await conn.execute(
+        select(models.Avaliacao.id, models.Materia.professor_id)
+        .join(models.Materia, models.Materia.id == models.Avaliacao.materia_id)
+        .where(sa.exists().where(models.RespostaAluno.avaliacao_id == models.Avaliacao.id))
+        .order_by(models.Avaliacao.id).limit(max(1, quantidade // 10))
+    )).all()
+    return [
+        ("GET", f"/avaliacoes/{avaliacao_id}/analise-itens",
+         {"headers": _headers("professor", professor_id, f"professor{professor_id}@bench")})
+        for avaliacao_id, professor_id in (avaliacoes[n % len(avaliacoes)] for n in range(quantidade))
+    ]
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+async def executar_cenario(cliente, nome, requisicoes, concorrencia):
+    consultas = [0]
+    def contar(*args):
+        consultas[0] += 1
+    latencias, status = [], Counter()
+    pendentes = iter(requisicoes)
+
+    async def cliente_virtual():
+        for metodo, rota, opcoes in pendentes:
+            inicio = time.perf_counter()
+            resposta = await cliente.request(metodo, rota, **opcoes)
+            latencias.append(time.perf_counter() - inicio)
+            status[resposta.status_code] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", contar)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente_virtual() for _ in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+    event.remove(async_engine.sync_engine, "before_cursor_execute", contar)
+
+    resultado = {"cenario": nome, "concorrencia": concorrencia, "requisicoes": len(latencias)}
+    if not latencias:
+        return resultado
+    return {
+        **resultado,
+        "erros": {str(codigo): n for codigo, n in sorted(status.items()) if codigo >= 400},
+        "segundos": decorrido,
+        "requisicoes_por_segundo": len(latencias) / decorrido,
+        "latencia_ms": {
+            "p50": _percentil(latencias, 50) * 1000,
+            "p95": _percentil(latencias, 95) * 1000,
+            "p99": _percentil(latencias, 99) * 1000,
+            "max": max(latencias) * 1000,
+        },
+        "consultas_por_requisicao": consultas[0] / len(latencias),
+    }
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def preparar(args):
+    """Cria as tabelas e popula o banco (vazio), reconstruindo o relatório agregado no fim."""
+    async with async_engine.begin() as conn:
+        await dados.criar_tabelas(conn)
+        if await dados.tem_dados(conn):
+            raise SystemExit("A tabela de matérias já tem dados: use um banco descartável")
+        # Todos os usuários com a mesma senha, no custo atual do bcrypt (o login não regrava o hash)
+        volume = await dados.popular(
+            conn, args.professores, args.materias, args.alunos, args.inscricoes_por_aluno,
+            args.questoes_por_materia, args.avaliacoes_por_materia,
+            senha_hash=await security.get_password_hash_async(dados.SENHA),
+        )
+    async with AsyncSessionLocal() as db:
+        await relatorios.reconstruir(db)
+    async with async_engine.begin() as conn:
+        await conn.execute(sa.text("ANALYZE"))
+    return volume
+
+async def executar(args):
+    volume = await preparar(args) if args.popular else None
+    resultados = []
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as cliente:
+        for nome in args.cenarios:
+            async with async_engine.connect() as conn:
+                requisicoes = await CENARIOS[nome](conn, args.requisicoes)
+            resultados.append(await executar_cenario(cliente, nome, requisicoes, args.concorrencia))
+    banco = async_engine.dialect.name
+    await async_engine.dispose()
+    return {"commit": _commit(), "banco": banco, "volume": volume, "cenarios": resultados}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--requisicoes", type=int, default=500, help="por cenário")
+    parser.add_argument("--popular", action="store_true", help="cria as tabelas e popula o banco antes")
+    parser.add_argument("--professores", type=int, default=300)
+    parser.add_argument("--materias", type=int, default=3000)
+    parser.add_argument("--alunos", type=int, default=30000)
+    parser.add_argument("--inscricoes-por-aluno", type=int, default=3)
+    parser.add_argument("--questoes-por-materia", type=int, default=5)
+    parser.add_argument("--avaliacoes-por-materia", type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(executar(args)), indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
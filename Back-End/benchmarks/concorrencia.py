@@ -0,0 +1,83 @@
+"""Benchmark de requisições por segundo da API sob carga concorrente.
+
+Dispara clientes concorrentes contra a app FastAPI (em processo, via ASGI, no mesmo event loop)
+durante alguns segundos e imprime vazão e latências em JSON. Como tudo roda em um único event
+loop, qualquer chamada bloqueante dentro de um endpoint async serializa as requisições, o que
+torna o efeito da camada assíncrona de banco visível. Para comparar antes/depois, rode o mesmo
+comando em cada commit contra o mesmo banco (DATABASE_URL):
+
+    cd Back-End
+    python -m benchmarks.concorrencia --email prof@exemplo.com --senha 123 \\
+        --rota /professores/me/materias --concorrencia 50 --duracao 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from main import app  # noqa: E402
+from core.database import async_engine  # noqa: E402
+
+async def _login(cliente: httpx.AsyncClient, email: str, senha: str) -> dict:
+    resposta = await cliente.post("/token", data={"username": email, "password": senha})
+    resposta.raise_for_status()
+    return {"Authorization": f"Bearer {resposta.json()['access_token']}"}
+
+async def _cliente(cliente, rota, headers, fim, latencias, erros):
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        resposta = await cliente.get(rota, headers=headers)
+        latencias.append(time.perf_counter() - inicio)
+        if resposta.status_code >= 400:
+            erros.append(resposta.status_code)
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+async def executar(email, senha, rota, concorrencia, duracao):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        headers = await _login(cliente, email, senha) if email else {}
+        latencias, erros = [], []
+        inicio = time.perf_counter()
+        fim = inicio + duracao
+        await asyncio.gather(*(
+            _cliente(cliente, rota, headers, fim, latencias, erros) for _ in range(concorrencia)
+        ))
+        decorrido = time.perf_counter() - inicio
+    await async_engine.dispose()
+    return {
+        "rota": rota,
+        "concorrencia": concorrencia,
+        "requisicoes": len(latencias),
+        "erros": len(erros),
+        "req_por_s": len(latencias) / decorrido,
+        "latencia_ms": {
+            "media": statistics.fmean(latencias) * 1000 if latencias else None,
+            "p50": _percentil(latencias, 50) * 1000 if latencias else None,
+            "p95": _percentil(latencias, 95) * 1000 if latencias else None,
+            "p99": _percentil(latencias, 99) * 1000 if latencias else None,
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--email", help="usuário para autenticar (omitir para rotas públicas)")
+    parser.add_argument("--senha")
+    parser.add_argument("--rota", default="/professores/me/materias")
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--duracao", type=float, default=10.0, help="em segundos")
+    args = parser.parse_args()
+    resultado = asyncio.run(executar(args.email, args.senha, args.rota, args.concorrencia, args.duracao))
+    print(json.dumps(resultado, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Massa de dados sintética para os benchmarks (professores, matérias, alunos, respostas...).
+
+Gera um volume configurável com ids explícitos, calculando as relações em vez de consultá-las,
+e insere em lotes. Usado por benchmarks.cenarios e pelo teste de índices (tests/test_indices.py);
+aponte DATABASE_URL para um banco descartável.
+"""
+import sqlalchemy as sa
+
+from core import crud, models
+
+LOTE = 5000 # linhas por INSERT ao popular
+SENHA = "senha-bench" # senha de todos os usuários criados
+
+async def criar_tabelas(conn):
+    """Cria as tabelas que ainda não existirem (no Postgres, prefira alembic upgrade head)."""
+    await conn.run_sync(models.Base.metadata.create_all)
+
+async def tem_dados(conn) -> bool:
+    return bool(await conn.scalar(sa.select(sa.func.count()).select_from(models.Materia)))
+
+async def _inserir(conn, model, linhas):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) == LOTE:
+            await conn.execute(sa.insert(model), lote)
+            lote = []
+    if lote:
+        await conn.execute(sa.insert(model), lote)
+
+async def popular(conn, professores, materias, alunos, inscricoes_por_aluno, questoes_por_materia,
+                  avaliacoes_por_materia, senha_hash="x"):
+    """Insere o volume pedido e devolve a contagem de linhas das tabelas maiores.
+
+    Cada aluno se inscreve em até inscricoes_por_aluno matérias e responde uma das avaliações de
+    cada uma (todas as questões da matéria); as demais avaliações ficam livres para envio.
+    """
+    await _inserir(conn, models.Professor, (
+        {"id": p, "nome": f"Professor {p}", "email": f"professor{p}@bench", "senha_hash": senha_hash}
+        for p in range(1, professores + 1)
+    ))
+    await _inserir(conn, models.Materia, (
+        {"id": m, "professor_id": m % professores + 1, "nome": f"Matéria {m}", "senha_acesso": f"senha-{m}",
+         "texto_base": "texto", "ativa": True}
+        for m in range(1, materias + 1)
+    ))
+    await _inserir(conn, models.Aluno, (
+        {"id": a, "ra": f"RA{a}", "nome": f"Aluno {a}", "email": f"aluno{a}@bench", "senha_hash": senha_hash}
+        for a in range(1, alunos + 1)
+    ))
+    await _inserir(conn, models.Questao, (
+        {"id": (m - 1) * questoes_por_materia + q, "materia_id": m, "pergunta": f"Pergunta {q}?",
+         "tipo": "multipla_escolha", "opcoes": {"A": "a", "B": "b", "C": "c", "D": "d"},
+         "resposta_correta": "A", "nivel_dificuldade": "medio"}
+        for m in range(1, materias + 1) for q in range(1, questoes_por_materia + 1)
+    ))
+    await _inserir(conn, models.Avaliacao, (
+        {"id": (m - 1) * avaliacoes_por_materia + v, "materia_id": m, "titulo": f"Avaliação {v}",
+         "quantidade_questoes": questoes_por_materia}
+        for m in range(1, materias + 1) for v in range(1, avaliacoes_por_materia + 1)
+    ))
+
+    def inscricoes():
+        for a in range(1, alunos + 1):
+            for m in sorted({(a * 7 + k * 13) % materias + 1 for k in range(inscricoes_por_aluno)}):
+                # Avaliação respondida pelo aluno nesta matéria
+                yield a, m, (m - 1) * avaliacoes_por_materia + a % avaliacoes_por_materia + 1
+
+    def respostas(agora):
+        for a, m, v in inscricoes():
+            for q in range(1, questoes_por_materia + 1):
+                correta = (a + q) % 3 != 0
+                yield {
+                    "aluno_id": a, "questao_id": (m - 1) * questoes_por_materia + q, "avaliacao_id": v,
+                    "resposta_aluno": "A" if correta else "B", "correta": correta, "nota": 10 if correta else 0,
+                    # Uma em cada dez provas com a primeira resposta ainda por corrigir
+                    "corrigida_em": None if q == 1 and a % 10 == 0 else agora,
+                }
+
+    def desempenhos():
+        for a, m, v in inscricoes():
+            acertos = sum((a + q) % 3 != 0 for q in range(1, questoes_por_materia + 1))
+            yield {
+                "aluno_id": a, "avaliacao_id": v, "materia_id": m, "total_questoes": questoes_por_materia,
+                "acertos": acertos, "soma_notas": acertos * 10, "nota_final": acertos * 10 / questoes_por_materia,
+            }
+
+    await _inserir(conn, models.Inscricao, ({"aluno_id": a, "materia_id": m} for a, m, _ in inscricoes()))
+    await _inserir(conn, models.RespostaAluno, respostas(crud._agora()))
+    await _inserir(conn, models.Desempenho, desempenhos())
+    await _inserir(conn, models.Job, (
+        {"tipo": "corrigir_avaliacao", "status": ("pendente", "executando", "concluido")[j % 3],
+         "parametros": {"avaliacao_id": j}, "user_type": "professor", "user_id": j % professores + 1}
+        for j in range(1, 1001)
+    ))
+    # Ajusta as sequências do Postgres aos ids inseridos explicitamente
+    if conn.dialect.name == "postgresql":
+        for model in (models.Professor, models.Materia, models.Aluno, models.Questao, models.Avaliacao):
+            tabela = model.__tablename__
+            await conn.execute(sa.text(
+                f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT MAX(id) FROM {tabela}))"
+            ))
+    total_inscricoes = sum(1 for _ in inscricoes())
+    return {
+        "professores": professores,
+        "materias": materias,
+        "alunos": alunos,
+        "inscricoes": total_inscricoes,
+        "respostas": total_inscricoes * questoes_por_materia,
+        "desempenhos": total_inscricoes,
+    }
@@ -0,0 +1,82 @@
+"""Benchmark offline da geração de questões por IA (provedor local, sem rede).
+
+Mede o tempo de core.ia.gerar_questoes com diferentes limites de concorrência usando o provedor
+determinístico com latência simulada, e opcionalmente uma taxa de falhas temporárias para
+exercitar as retentativas. Imprime o resultado em JSON:
+
+    cd Back-End
+    python -m benchmarks.geracao_ia --questoes 100 --trechos 20 --latencia 0.5 --concorrencia 1 4 8
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core import ia  # noqa: E402
+
+class ProvedorInstavel(ia.ProvedorLocal):
+    """Provedor local que falha temporariamente em uma fração das chamadas."""
+
+    def __init__(self, latencia: float, taxa_falha: float, semente: int = 0):
+        super().__init__(latencia)
+        self.taxa_falha = taxa_falha
+        self.chamadas = 0
+        self.falhas = 0
+        self._aleatorio = random.Random(semente)
+
+    async def gerar(self, trecho, quantidade, nivel_dificuldade):
+        self.chamadas += 1
+        if self._aleatorio.random() < self.taxa_falha:
+            self.falhas += 1
+            await asyncio.sleep(self.latencia)
+            raise ia.ErroTemporarioIA("falha simulada")
+        return await super().gerar(trecho, quantidade, nivel_dificuldade)
+
+def _texto(trechos: int, tamanho: int) -> str:
+    # Um parágrafo por trecho, cada um perto do tamanho máximo de trecho
+    frase = "O conteúdo da aula número {} descreve o conceito {} em detalhes. "
+    paragrafos = []
+    for i in range(trechos):
+        paragrafo = ""
+        j = 0
+        while len(paragrafo) + len(frase) + 10 < tamanho:
+            paragrafo += frase.format(i, j)
+            j += 1
+        paragrafos.append(paragrafo.strip())
+    return "\n\n".join(paragrafos)
+
+async def executar(questoes, trechos, latencia, concorrencia, taxa_falha):
+    texto = _texto(trechos, ia.IA_TRECHO_TAMANHO)
+    provedor = ProvedorInstavel(latencia, taxa_falha)
+    inicio = time.perf_counter()
+    geradas = await ia.gerar_questoes(1, texto, questoes, provedor=provedor, concorrencia=concorrencia)
+    return {
+        "concorrencia": concorrencia,
+        "trechos": len(ia.dividir_texto(texto)),
+        "questoes": len(geradas),
+        "chamadas": provedor.chamadas,
+        "falhas": provedor.falhas,
+        "segundos": time.perf_counter() - inicio,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questoes", type=int, default=100)
+    parser.add_argument("--trechos", type=int, default=20)
+    parser.add_argument("--latencia", type=float, default=0.5, help="em segundos, por chamada")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--taxa-falha", type=float, default=0.0, help="fração de chamadas com falha temporária")
+    args = parser.parse_args()
+    resultados = [
+        asyncio.run(executar(args.questoes, args.trechos, args.latencia, c, args.taxa_falha))
+        for c in args.concorrencia
+    ]
+    print(json.dumps(resultados, indent=2))
+
+if __name__ == "__main__":
+    main()
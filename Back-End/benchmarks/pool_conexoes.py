@@ -0,0 +1,96 @@
+"""Teste de carga que verifica se o número de conexões com o banco permanece limitado.
+
+Executa o benchmark de concorrência (benchmarks/concorrencia.py) enquanto conta, via eventos do
+pool do SQLAlchemy, as conexões abertas e as emprestadas às sessões. No modo "fila" o máximo de
+conexões abertas não deve passar de DB_POOL_TAMANHO + DB_POOL_OVERFLOW, qualquer que seja a
+concorrência; no modo "nulo" cada sessão abre e fecha a sua, e o limite fica a cargo do PgBouncer.
+No Postgres, também amostra pg_stat_activity para ver as conexões do lado do servidor.
+
+    cd Back-End
+    DB_POOL_TAMANHO=5 DB_POOL_OVERFLOW=5 python -m benchmarks.pool_conexoes \\
+        --email prof@exemplo.com --senha 123 --concorrencia 200 --duracao 10
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import event, text
+
+from benchmarks.concorrencia import executar
+from core.config import DB_POOL_MODO, DB_POOL_TAMANHO, DB_POOL_OVERFLOW
+from core.database import async_engine, engine
+
+class ContadorConexoes:
+    """Acompanha, pelos eventos do pool, as conexões abertas e emprestadas (e seus máximos)."""
+
+    def __init__(self, engine_sync):
+        self.abertas = self.max_abertas = 0
+        self.emprestadas = self.max_emprestadas = 0
+        event.listen(engine_sync, "connect", self._connect)
+        event.listen(engine_sync, "close", self._close)
+        event.listen(engine_sync, "checkout", self._checkout)
+        event.listen(engine_sync, "checkin", self._checkin)
+
+    def _connect(self, *args):
+        self.abertas += 1
+        self.max_abertas = max(self.max_abertas, self.abertas)
+
+    def _close(self, *args):
+        self.abertas -= 1
+
+    def _checkout(self, *args):
+        self.emprestadas += 1
+        self.max_emprestadas = max(self.max_emprestadas, self.emprestadas)
+
+    def _checkin(self, *args):
+        self.emprestadas -= 1
+
+async def _amostrar_servidor(parar: asyncio.Event, maximo: list):
+    """Amostra pg_stat_activity (por uma conexão síncrona à parte) até o fim da carga."""
+    consulta = text("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+    while not parar.is_set():
+        total = await asyncio.to_thread(_contar_no_servidor, consulta)
+        maximo[0] = max(maximo[0], total - 1) # desconta a própria conexão de amostragem
+        await asyncio.sleep(0.2)
+
+def _contar_no_servidor(consulta):
+    with engine.connect() as conexao:
+        return conexao.execute(consulta).scalar()
+
+async def medir(email, senha, rota, concorrencia, duracao):
+    contador = ContadorConexoes(async_engine.sync_engine)
+    maximo_servidor = [0]
+    parar = asyncio.Event()
+    amostragem = None
+    if async_engine.dialect.name == "postgresql":
+        amostragem = asyncio.create_task(_amostrar_servidor(parar, maximo_servidor))
+    carga = await executar(email, senha, rota, concorrencia, duracao)
+    parar.set()
+    if amostragem:
+        await amostragem
+    limite = DB_POOL_TAMANHO + DB_POOL_OVERFLOW if DB_POOL_MODO == "fila" else None
+    return {
+        "pool_modo": DB_POOL_MODO,
+        "limite_conexoes": limite,
+        "max_conexoes_abertas": contador.max_abertas,
+        "max_conexoes_emprestadas": contador.max_emprestadas,
+        "max_conexoes_no_servidor": maximo_servidor[0] if amostragem else None,
+        "dentro_do_limite": limite is None or contador.max_abertas <= limite,
+        "carga": carga,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--email")
+    parser.add_argument("--senha")
+    parser.add_argument("--rota", default="/professores/me/materias")
+    parser.add_argument("--concorrencia", type=int, default=200)
+    parser.add_argument("--duracao", type=float, default=10.0, help="em segundos")
+    args = parser.parse_args()
+    resultado = asyncio.run(medir(args.email, args.senha, args.rota, args.concorrencia, args.duracao))
+    print(json.dumps(resultado, indent=2))
+    if not resultado["dentro_do_limite"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
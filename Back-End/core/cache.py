@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import threading
+
+from cachetools import LRUCache, TTLCache
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from .config import (
+    PRINCIPAL_CACHE_TAMANHO, PRINCIPAL_CACHE_TTL, IA_CACHE_LRU_TAMANHO,
+    BANCO_QUESTOES_CACHE_TAMANHO, BANCO_QUESTOES_CACHE_TTL, ANALISE_ITENS_CACHE_TAMANHO
+)
+
+def chave_conteudo(*partes) -> str:
+    """sha256 (hex) das partes, usado como endereço de conteúdo."""
+    return hashlib.sha256("\x1f".join(str(parte) for parte in partes).encode()).hexdigest()
+
+class CachePrincipais:
+    """Cache limitado, com TTL, dos usuários autenticados, chaveado por (user_type, sub).
+
+    Guarda cópias destacadas (detached) dos objetos ORM, que são reanexadas à sessão da requisição
+    com merge(load=False), sem nenhuma consulta ao banco. Deve ser invalidado sempre que um
+    professor/aluno for criado, alterado ou removido.
+    """
+
+    def __init__(self, tamanho: int, ttl: int):
+        self._cache = TTLCache(maxsize=tamanho, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, user_type: str, sub: str):
+        with self._lock:
+            return self._cache.get((user_type, sub))
+
+    def set(self, user_type: str, sub: str, usuario):
+        # Copia apenas as colunas, para não reter a sessão nem relacionamentos carregados
+        mapper = inspect(usuario).mapper
+        copia = mapper.class_(**{attr.key: getattr(usuario, attr.key) for attr in mapper.column_attrs})
+        make_transient_to_detached(copia)
+        with self._lock:
+            self._cache[(user_type, sub)] = copia
+
+    def invalidar(self, user_type: str, sub: str):
+        with self._lock:
+            self._cache.pop((user_type, sub), None)
+
+    def limpar(self):
+        with self._lock:
+            self._cache.clear()
+
+principais = CachePrincipais(PRINCIPAL_CACHE_TAMANHO, PRINCIPAL_CACHE_TTL)
+
+class CacheQuestoes:
+    """Camada em memória (LRU, por processo) do cache de questões geradas por IA.
+
+    A chave é o endereço do conteúdo do trecho (ver core.ia.chave_trecho), então uma matéria cujo
+    texto mudou simplesmente deixa de encontrar as entradas antigas; invalidar_materia só libera
+    memória. A camada persistente fica na tabela questoes_geradas_cache (core.crud). Os
+    contadores somam as duas camadas.
+    """
+
+    def __init__(self, tamanho: int):
+        self._cache = LRUCache(maxsize=tamanho)
+        self._lock = threading.Lock()
+        self.acertos_memoria = 0
+        self.acertos_banco = 0
+        self.faltas = 0
+
+    def get(self, chave: str):
+        with self._lock:
+            entrada = self._cache.get(chave)
+        return entrada[2] if entrada else None
+
+    def set(self, chave: str, materia_id: int, texto_hash: str, questoes: list):
+        with self._lock:
+            self._cache[chave] = (materia_id, texto_hash, questoes)
+
+    def invalidar_materia(self, materia_id: int, texto_hash: str):
+        """Remove as entradas da matéria geradas a partir de outro texto base."""
+        with self._lock:
+            obsoletas = [
+                chave for chave, (id_materia, hash_entrada, _) in self._cache.items()
+                if id_materia == materia_id and hash_entrada != texto_hash
+            ]
+            for chave in obsoletas:
+                del self._cache[chave]
+
+    def registrar(self, acertos_memoria: int = 0, acertos_banco: int = 0, faltas: int = 0):
+        with self._lock:
+            self.acertos_memoria += acertos_memoria
+            self.acertos_banco += acertos_banco
+            self.faltas += faltas
+
+    def limpar(self):
+        with self._lock:
+            self._cache.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            total = self.acertos_memoria + self.acertos_banco + self.faltas
+            return {
+                "entradas_memoria": len(self._cache),
+                "acertos_memoria": self.acertos_memoria,
+                "acertos_banco": self.acertos_banco,
+                "faltas": self.faltas,
+                "taxa_acerto": (self.acertos_memoria + self.acertos_banco) / total if total else None,
+            }
+
+questoes = CacheQuestoes(IA_CACHE_LRU_TAMANHO)
+
+class CacheBancoQuestoes:
+    """Banco de questões de cada matéria, já serializado, em memória (TTL, por processo).
+
+    Requisições simultâneas que não encontram a matéria compartilham uma única carga: enquanto ela
+    está em andamento, as demais aguardam a mesma tarefa. Usado só no event loop (sem lock). Deve
+    ser invalidado quando questões da matéria são criadas ou removidas; uma carga iniciada antes da
+    invalidação não é guardada. O TTL limita a defasagem entre processos.
+    """
+
+    def __init__(self, tamanho: int, ttl: int):
+        self._cache = TTLCache(maxsize=tamanho, ttl=ttl)
+        self._carregando = {}
+        self._geracoes = {}
+        self.acertos = 0
+        self.cargas = 0
+
+    async def obter(self, materia_id: int, carregar):
+        """Banco da matéria; `carregar(materia_id)` (async, com sessão própria) é chamado na falta."""
+        banco = self._cache.get(materia_id)
+        if banco is not None:
+            self.acertos += 1
+            return banco
+        tarefa = self._carregando.get(materia_id)
+        if tarefa is None:
+            self.cargas += 1
+            tarefa = asyncio.ensure_future(self._carregar(materia_id, carregar))
+            self._carregando[materia_id] = tarefa
+        # shield: o cancelamento de uma requisição não interrompe a carga das outras
+        return await asyncio.shield(tarefa)
+
+    async def _carregar(self, materia_id: int, carregar):
+        geracao = self._geracoes.get(materia_id, 0)
+        try:
+            banco = await carregar(materia_id)
+            if self._geracoes.get(materia_id, 0) == geracao:
+                self._cache[materia_id] = banco
+            return banco
+        finally:
+            if self._carregando.get(materia_id) is asyncio.current_task():
+                del self._carregando[materia_id]
+
+    def invalidar(self, materia_id: int):
+        self._geracoes[materia_id] = self._geracoes.get(materia_id, 0) + 1
+        self._cache.pop(materia_id, None)
+        self._carregando.pop(materia_id, None)
+
+    def limpar(self):
+        self._cache.clear()
+
+    def metricas(self) -> dict:
+        return {"materias": len(self._cache), "acertos": self.acertos, "cargas": self.cargas}
+
+banco_questoes = CacheBancoQuestoes(BANCO_QUESTOES_CACHE_TAMANHO, BANCO_QUESTOES_CACHE_TTL)
+
+class CacheVersionado:
+    """Resultados calculados (LRU, por processo) válidos enquanto a versão dos dados não muda.
+
+    A versão é lida do banco pelo chamador a cada uso (uma consulta barata), então outros processos
+    que gravem dados novos também invalidam a entrada, sem invalidação explícita.
+    """
+
+    def __init__(self, tamanho: int):
+        self._cache = LRUCache(maxsize=tamanho)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def get(self, chave, versao):
+        with self._lock:
+            entrada = self._cache.get(chave)
+            if entrada is not None and entrada[0] == versao:
+                self.acertos += 1
+                return entrada[1]
+            self.faltas += 1
+            return None
+
+    def set(self, chave, versao, valor):
+        with self._lock:
+            self._cache[chave] = (versao, valor)
+
+    def limpar(self):
+        with self._lock:
+            self._cache.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"entradas": len(self._cache), "acertos": self.acertos, "faltas": self.faltas}
+
+analise_itens = CacheVersionado(ANALISE_ITENS_CACHE_TAMANHO)
@@ -4,9 +4,87 @@ from dotenv import load_dotenv
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
+def _bool(nome: str, padrao: bool) -> bool:
+    """Lê uma variável de ambiente booleana ("1", "true", "sim"...)."""
+    valor = os.getenv(nome)
+    if valor is None:
+        return padrao
+    return valor.strip().lower() in ("1", "true", "t", "yes", "sim", "on")
+
 # Carrega as variáveis de ambiente ou usa um valor padrão
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI")
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Pool de conexões do banco
+# "fila": pool persistente (QueuePool), para servidores de longa duração (uvicorn).
+# "nulo": sem pool (NullPool), cada sessão abre e fecha sua conexão; indicado para funções
+# serverless (Vercel), onde o pooling fica a cargo do PgBouncer do Neon.
+DB_POOL_MODO = os.getenv("DB_POOL_MODO", "nulo" if os.getenv("VERCEL") else "fila")
+DB_POOL_TAMANHO = int(os.getenv("DB_POOL_TAMANHO", "5"))
+DB_POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "10")) # conexões extras além do tamanho em picos
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30")) # em segundos, aguardando uma conexão livre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300")) # em segundos; o Neon encerra conexões ociosas
+DB_POOL_PRE_PING = _bool("DB_POOL_PRE_PING", True)
+# Atrás de PgBouncer em modo transação (endpoints "-pooler" do Neon) não é possível reutilizar
+# prepared statements entre transações: desliga os caches de statements do asyncpg
+DB_PGBOUNCER = _bool("DB_PGBOUNCER", "-pooler" in (DATABASE_URL or ""))
+DB_ECHO = _bool("DB_ECHO", False) # loga todo SQL executado
+
+# Paginação por cursor dos endpoints de listagem
+PAGINACAO_LIMITE_PADRAO = int(os.getenv("PAGINACAO_LIMITE_PADRAO", "50"))
+PAGINACAO_LIMITE_MAXIMO = int(os.getenv("PAGINACAO_LIMITE_MAXIMO", "200"))
+
+# Importação de questões em lote (limite de questões por requisição)
+QUESTOES_LOTE_MAXIMO = int(os.getenv("QUESTOES_LOTE_MAXIMO", "500"))
+# Importação de alunos por CSV (limite de linhas por arquivo; cada uma custa um hash bcrypt)
+ALUNOS_IMPORTACAO_MAXIMO = int(os.getenv("ALUNOS_IMPORTACAO_MAXIMO", "5000"))
+# Exportações em CSV/NDJSON (core.exportacao): linhas buscadas do cursor do banco por vez
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "1000"))
+
+# Geração de questões por IA
+# "gemini": API do Google (requer GOOGLE_API_KEY). "local": gerador determinístico, sem rede,
+# para desenvolvimento, testes e benchmarks.
+IA_PROVEDOR = os.getenv("IA_PROVEDOR", "gemini" if GOOGLE_API_KEY else "local")
+IA_MODELO = os.getenv("IA_MODELO", "gemini-1.5-flash")
+IA_CONCORRENCIA = int(os.getenv("IA_CONCORRENCIA", "4")) # chamadas simultâneas ao provedor por geração
+IA_TENTATIVAS = int(os.getenv("IA_TENTATIVAS", "3"))
+IA_ESPERA_BASE = float(os.getenv("IA_ESPERA_BASE", "0.5")) # em segundos, dobrada a cada nova tentativa
+IA_TIMEOUT = float(os.getenv("IA_TIMEOUT", "30")) # em segundos, por chamada
+IA_CORRECAO_LOTE = int(os.getenv("IA_CORRECAO_LOTE", "20")) # respostas abertas por chamada de correção
+IA_TRECHO_TAMANHO = int(os.getenv("IA_TRECHO_TAMANHO", "4000")) # em caracteres do texto base
+IA_LOCAL_LATENCIA = float(os.getenv("IA_LOCAL_LATENCIA", "0")) # em segundos; simula a rede no provedor local
+# Cache das questões geradas, por conteúdo do trecho: LRU em memória + tabela no banco
+IA_CACHE_LRU_TAMANHO = int(os.getenv("IA_CACHE_LRU_TAMANHO", "1000")) # trechos em memória, por processo
+IA_CACHE_MAXIMO = int(os.getenv("IA_CACHE_MAXIMO", "10000")) # trechos na tabela; os menos acessados saem primeiro
+IA_CACHE_TTL_DIAS = int(os.getenv("IA_CACHE_TTL_DIAS", "30")) # trechos sem acesso há mais tempo são removidos
+
+# Montagem das provas por aluno (core.provas): banco de questões de cada matéria em memória
+BANCO_QUESTOES_CACHE_TAMANHO = int(os.getenv("BANCO_QUESTOES_CACHE_TAMANHO", "500")) # matérias, por processo
+BANCO_QUESTOES_CACHE_TTL = int(os.getenv("BANCO_QUESTOES_CACHE_TTL", "300")) # em segundos; limita a defasagem entre processos
+
+# Análise de itens das avaliações (core.analise): resultados em memória, por processo
+ANALISE_ITENS_CACHE_TAMANHO = int(os.getenv("ANALISE_ITENS_CACHE_TAMANHO", "200")) # avaliações
+
+# Fila de jobs em segundo plano (geração e correção por IA)
+# Com 0 workers (padrão na Vercel, onde não há processo contínuo) os jobs rodam dentro da requisição.
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "0" if os.getenv("VERCEL") else "2"))
+JOBS_TIMEOUT = int(os.getenv("JOBS_TIMEOUT", "600")) # em segundos; jobs "executando" há mais tempo são retomados
+JOBS_TENTATIVAS_MAXIMO = int(os.getenv("JOBS_TENTATIVAS_MAXIMO", "3")) # execuções iniciadas antes de o job virar "erro"
+
+# Instrumentação por requisição (cabeçalho Server-Timing e /metrics, em core.metricas)
+METRICAS_ATIVAS = _bool("METRICAS_ATIVAS", True)
+METRICAS_N_MAIS_UM = int(os.getenv("METRICAS_N_MAIS_UM", "10")) # repetições do mesmo SQL numa requisição logadas como N+1
+METRICAS_CONSULTA_LENTA_MS = float(os.getenv("METRICAS_CONSULTA_LENTA_MS", "200")) # consultas mais lentas são logadas
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN") # /metrics exige "Authorization: Bearer <token>"; sem ele, responde 404
+
+# Cache dos usuários autenticados (evita consultar professores/alunos a cada requisição)
+PRINCIPAL_CACHE_TAMANHO = int(os.getenv("PRINCIPAL_CACHE_TAMANHO", "10000"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "300")) # em segundos
+
+# Hash de senhas (bcrypt), executado em um pool de threads dedicado fora do event loop
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12")) # custo; hashes com outro custo são refeitos no login
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_FILA_MAXIMA = int(os.getenv("HASH_FILA_MAXIMA", "64")) # tarefas aguardando além das em execução
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, ia
+from .config import IA_CONCORRENCIA, IA_CORRECAO_LOTE
+
+NOTA_MAXIMA = 10
+
+def corrigir_multipla_escolha(resposta_aluno: str, resposta_correta: str) -> dict:
+    """Correção local, sem IA: compara a alternativa marcada com a correta."""
+    correta = resposta_aluno.strip().upper() == resposta_correta.strip().upper()
+    return {
+        "correta": correta,
+        "nota": NOTA_MAXIMA if correta else 0,
+        "feedback_ia": "Resposta correta." if correta else f"Resposta correta: {resposta_correta}.",
+    }
+
+def corrigir_envio(aluno_id: int, avaliacao_id: int, respostas, gabarito: dict) -> List[dict]:
+    """Monta as linhas de respostas_alunos de um envio, já corrigindo as de múltipla escolha.
+
+    As abertas ficam com corrigida_em nulo, para a correção em lote por IA.
+    """
+    agora = datetime.now(timezone.utc).replace(tzinfo=None)
+    linhas = []
+    for resposta in respostas:
+        questao = gabarito[resposta.questao_id]
+        linha = {
+            "aluno_id": aluno_id,
+            "avaliacao_id": avaliacao_id,
+            "questao_id": resposta.questao_id,
+            "resposta_aluno": resposta.resposta_aluno,
+            "tempo_resposta": resposta.tempo_resposta,
+            "correta": False,
+            "nota": 0,
+            "corrigida_em": None,
+        }
+        if questao.tipo == "multipla_escolha":
+            linha.update(corrigir_multipla_escolha(resposta.resposta_aluno, questao.resposta_correta), corrigida_em=agora)
+        linhas.append(linha)
+    return linhas
+
+def _lotes(itens: list, tamanho: int):
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+async def corrigir_respostas(db: AsyncSession, avaliacao_id: Optional[int] = None, resposta_ids: Optional[List[int]] = None,
+                             provedor: Optional[ia.ProvedorIA] = None) -> dict:
+    """Corrige as respostas pendentes de uma avaliação (ou as dos ids dados).
+
+    As de múltipla escolha são corrigidas na hora, localmente. As abertas são agrupadas em lotes de
+    IA_CORRECAO_LOTE por chamada ao provedor, com as chamadas em paralelo. Tudo é gravado com um
+    UPDATE em lote, só nas respostas que esta chamada conseguiu reservar (ver crud.salvar_correcoes);
+    respostas de lotes que falharam continuam pendentes para uma nova correção.
+    """
+    pendentes = await crud.get_respostas_a_corrigir(db, avaliacao_id=avaliacao_id, resposta_ids=resposta_ids)
+    correcoes, abertas = [], []
+    for linha in pendentes:
+        if linha.tipo == "multipla_escolha":
+            correcoes.append({"id": linha.id, **corrigir_multipla_escolha(linha.resposta_aluno, linha.resposta_correta)})
+        else:
+            abertas.append({
+                "id": linha.id,
+                "pergunta": linha.pergunta,
+                "resposta_esperada": linha.resposta_correta,
+                "resposta_aluno": linha.resposta_aluno,
+            })
+
+    falhas = 0
+    if abertas:
+        provedor = provedor or ia.obter_provedor()
+        limite = asyncio.Semaphore(IA_CONCORRENCIA)
+        lotes = list(_lotes(abertas, IA_CORRECAO_LOTE))
+        resultados = await asyncio.gather(*(
+            ia.chamar_com_retentativas(
+                limite,
+                lambda lote=lote: provedor.corrigir(lote),
+                lambda texto, lote=lote: ia.interpretar_correcoes(texto, {item["id"] for item in lote})
+            )
+            for lote in lotes
+        ), return_exceptions=True)
+        for resultado in resultados:
+            if isinstance(resultado, BaseException):
+                falhas += 1
+                continue
+            for resposta_id, (correta, nota, feedback) in resultado.items():
+                correcoes.append({"id": resposta_id, "correta": correta, "nota": nota, "feedback_ia": feedback})
+
+    pendentes = {linha.id: linha for linha in pendentes}
+    nao_corrigidas = len(pendentes) - len(correcoes)
+    # Respostas que outra correção simultânea gravou primeiro ficam de fora (e não somam duas vezes)
+    correcoes = await crud.salvar_correcoes(db, correcoes, pendentes)
+    multipla_escolha = sum(1 for correcao in correcoes if pendentes[correcao["id"]].tipo == "multipla_escolha")
+    return {
+        "corrigidas": len(correcoes),
+        "multipla_escolha": multipla_escolha,
+        "abertas": len(correcoes) - multipla_escolha,
+        "pendentes": nao_corrigidas,
+        "lotes_com_falha": falhas,
+    }
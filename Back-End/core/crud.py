@@ -1,197 +1,641 @@
-from sqlalchemy.orm import Session, joinedload
+import sqlalchemy as sa
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import List
 
 from . import models, schemas
-from .security import get_password_hash # Importar a função de hash de senha
+from .cache import chave_conteudo
+from .config import IA_CACHE_MAXIMO, IA_CACHE_TTL_DIAS
+from .security import get_password_hash_async # Importar a função de hash de senha
+
+# Todas as funções recebem uma AsyncSession e devem ser aguardadas (await). Relacionamentos não são
+# carregados de forma preguiçosa em AsyncSession: o que for serializado precisa vir nas opções de
+# carregamento da consulta.
+
+# --- Carregamento de relacionamentos expandidos ---
+# Para cada relacionamento que os schemas de resposta aceitam em ?expand=, a opção de eager
+# loading que o traz com um número fixo de consultas (evita N+1 durante a serialização).
+# Relacionamentos muitos-para-um usam joinedload; coleções usam selectinload (uma consulta
+# "IN" por nível, independente de quantas linhas existam).
+CARREGAMENTO_EXPANSOES = {
+    models.Materia: {
+        "professor": joinedload(models.Materia.professor),
+        "questoes": selectinload(models.Materia.questoes),
+        "inscricoes": selectinload(models.Materia.inscricoes).joinedload(models.Inscricao.aluno),
+        "avaliacoes": selectinload(models.Materia.avaliacoes),
+    },
+    models.Questao: {
+        "respostas_aluno": selectinload(models.Questao.respostas_aluno),
+    },
+    models.Avaliacao: {
+        "respostas_aluno": selectinload(models.Avaliacao.respostas_aluno),
+        "desempenhos": selectinload(models.Avaliacao.desempenhos),
+    },
+}
+
+def _com_expansoes(stmt, model, expand):
+    """Aplica à consulta as opções de carregamento dos relacionamentos pedidos em expand."""
+    opcoes = CARREGAMENTO_EXPANSOES[model]
+    return stmt.options(*(opcoes[nome] for nome in expand))
+
+def _keyset(stmt, coluna_id, apos=None, limite=None):
+    """Ordena por coluna_id e aplica a paginação por cursor (itens com id > apos, até limite)."""
+    if apos is not None:
+        stmt = stmt.where(coluna_id > apos)
+    stmt = stmt.order_by(coluna_id)
+    if limite is not None:
+        stmt = stmt.limit(limite)
+    return stmt
+
+def _inserir(model, valores: dict):
+    """INSERT ... RETURNING da linha completa (com id e defaults do servidor, como created_at).
+
+    Dispensa o db.refresh depois do commit: o objeto volta carregado no mesmo comando. Com
+    expire_on_commit=False (core.database), o commit também não o expira.
+    """
+    return sa.insert(model).values(**valores).returning(model)
+
+def _insert_ou_atualizar(db: AsyncSession, model, chaves, atualizar):
+    """INSERT ... ON CONFLICT (chaves) DO UPDATE no dialeto da sessão (Postgres ou SQLite).
+
+    `atualizar(excluded)` devolve {coluna: expressão} aplicado à linha existente, onde `excluded`
+    é a linha proposta.
+    """
+    stmt = _insert_dialeto(db)(model)
+    return stmt.on_conflict_do_update(index_elements=chaves, set_=atualizar(stmt.excluded))
+
+def _insert_dialeto(db: AsyncSession):
+    """insert() do dialeto da sessão, com suporte a ON CONFLICT."""
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+
+def _agora():
+    # TIMESTAMP sem fuso, em UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 # --- Professor CRUD ---
-def get_professor_by_email(db: Session, email: str):
-    return db.query(models.Professor).filter(models.Professor.email == email).first()
+async def get_professor_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.Professor).where(models.Professor.email == email))
 
-def get_professor_by_id(db: Session, professor_id: int):
-    return db.query(models.Professor).filter(models.Professor.id == professor_id).first()
+async def get_professor_by_id(db: AsyncSession, professor_id: int):
+    return await db.scalar(select(models.Professor).where(models.Professor.id == professor_id))
 
-def create_professor(db: Session, professor: schemas.ProfessorCreate):
-    hashed_password = get_password_hash(professor.senha)
-    db_professor = models.Professor(
+async def create_professor(db: AsyncSession, professor: schemas.ProfessorCreate):
+    hashed_password = await get_password_hash_async(professor.senha)
+    db_professor = await db.scalar(_inserir(models.Professor, dict(
         nome=professor.nome,
         email=professor.email,
         senha_hash=hashed_password
-    )
-    db.add(db_professor)
-    db.commit()
-    db.refresh(db_professor)
+    )))
+    await db.commit()
     return db_professor
 
+async def update_senha_hash(db: AsyncSession, usuario, senha_hash: str):
+    """Regrava o hash da senha de um professor ou aluno (ex.: após mudança do custo do bcrypt)."""
+    usuario.senha_hash = senha_hash
+    await db.commit()
+    return usuario
+
 # --- Aluno CRUD ---
-def get_aluno_by_email(db: Session, email: str):
-    return db.query(models.Aluno).filter(models.Aluno.email == email).first()
+async def get_aluno_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.Aluno).where(models.Aluno.email == email))
 
-def get_aluno_by_ra(db: Session, ra: str):
-    return db.query(models.Aluno).filter(models.Aluno.ra == ra).first()
+async def get_aluno_by_ra(db: AsyncSession, ra: str):
+    return await db.scalar(select(models.Aluno).where(models.Aluno.ra == ra))
 
-def get_aluno_by_id(db: Session, aluno_id: int):
-    return db.query(models.Aluno).filter(models.Aluno.id == aluno_id).first()
+async def get_aluno_by_id(db: AsyncSession, aluno_id: int):
+    return await db.scalar(select(models.Aluno).where(models.Aluno.id == aluno_id))
 
-def create_aluno(db: Session, aluno: schemas.AlunoCreate):
-    hashed_password = get_password_hash(aluno.senha)
-    db_aluno = models.Aluno(
+async def create_aluno(db: AsyncSession, aluno: schemas.AlunoCreate):
+    hashed_password = await get_password_hash_async(aluno.senha)
+    db_aluno = await db.scalar(_inserir(models.Aluno, dict(
         ra=aluno.ra,
         nome=aluno.nome,
         email=aluno.email,
         senha_hash=hashed_password
-    )
-    db.add(db_aluno)
-    db.commit()
-    db.refresh(db_aluno)
+    )))
+    await db.commit()
     return db_aluno
 
+async def get_alunos_conflitantes(db: AsyncSession, ras: List[str], emails: List[str]):
+    """(ra, email) dos alunos já cadastrados com algum dos RAs ou emails, em uma consulta."""
+    return (await db.execute(
+        select(models.Aluno.ra, models.Aluno.email)
+        .where(sa.or_(models.Aluno.ra.in_(ras), models.Aluno.email.in_(emails)))
+    )).all()
+
+async def create_alunos_bulk(db: AsyncSession, alunos: List[dict], materia_id: int = None):
+    """Insere os alunos (com senha_hash já calculado) com um INSERT ... RETURNING de múltiplas linhas
+    e, se materia_id for informado, inscreve todos nela na mesma transação.
+
+    Retorna None se algum RA/email foi cadastrado por outra requisição nesse meio tempo (nada é gravado).
+    """
+    if not alunos:
+        return []
+    try:
+        stmt = sa.insert(models.Aluno).returning(models.Aluno, sort_by_parameter_order=True)
+        db_alunos = (await db.scalars(stmt, alunos)).all()
+        if materia_id is not None:
+            await db.execute(sa.insert(models.Inscricao), [
+                {"aluno_id": db_aluno.id, "materia_id": materia_id} for db_aluno in db_alunos
+            ])
+            await _atualizar_relatorio(db, {materia_id: {"total_alunos": len(db_alunos), "soma_notas": 0, "quantidade_notas": 0}})
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return None
+    return db_alunos
+
 # --- Materia CRUD ---
-def create_materia(db: Session, materia: schemas.MateriaCreate, professor_id: int):
-    db_materia = models.Materia(
+async def create_materia(db: AsyncSession, materia: schemas.MateriaCreate, professor_id: int):
+    db_materia = await db.scalar(_inserir(models.Materia, dict(
         **materia.model_dump(),
         professor_id=professor_id
-    )
-    db.add(db_materia)
-    db.commit()
-    db.refresh(db_materia)
+    )))
+    await db.commit()
     return db_materia
 
-def get_materia_by_id(db: Session, materia_id: int):
-    return db.query(models.Materia).filter(models.Materia.id == materia_id).first()
-
-def get_materias_by_professor(db: Session, professor_id: int):
-    return db.query(models.Materia).filter(models.Materia.professor_id == professor_id).all()
-
-def get_materia_by_senha_acesso(db: Session, senha_acesso: str):
-    return db.query(models.Materia).filter(models.Materia.senha_acesso == senha_acesso).first()
-
-def update_materia(db: Session, materia_id: int, materia_update: schemas.MateriaCreate):
-    db_materia = db.query(models.Materia).filter(models.Materia.id == materia_id).first()
-    if db_materia:
-        for key, value in materia_update.model_dump(exclude_unset=True).items():
-            setattr(db_materia, key, value)
-        db.commit()
-        db.refresh(db_materia)
+async def get_materia_by_id(db: AsyncSession, materia_id: int, expand=frozenset()):
+    stmt = select(models.Materia).where(models.Materia.id == materia_id)
+    return await db.scalar(_com_expansoes(stmt, models.Materia, expand))
+
+async def get_materias_by_professor(db: AsyncSession, professor_id: int, expand=frozenset(), apos=None, limite=None):
+    stmt = select(models.Materia).where(models.Materia.professor_id == professor_id)
+    stmt = _keyset(stmt, models.Materia.id, apos, limite)
+    return (await db.scalars(_com_expansoes(stmt, models.Materia, expand))).all()
+
+async def get_materias_by_aluno(db: AsyncSession, aluno_id: int, expand=frozenset(), apos=None, limite=None):
+    stmt = select(models.Materia)\
+        .join(models.Inscricao, models.Inscricao.materia_id == models.Materia.id)\
+        .where(models.Inscricao.aluno_id == aluno_id)
+    stmt = _keyset(stmt, models.Materia.id, apos, limite)
+    return (await db.scalars(_com_expansoes(stmt, models.Materia, expand))).all()
+
+async def get_materia_by_senha_acesso(db: AsyncSession, senha_acesso: str):
+    return await db.scalar(select(models.Materia).where(models.Materia.senha_acesso == senha_acesso))
+
+async def update_materia(db: AsyncSession, materia_id: int, professor_id: int, materia_update: schemas.MateriaCreate):
+    """UPDATE ... RETURNING direto, restrito às matérias do professor. None se nada foi alterado."""
+    db_materia = await db.scalar(
+        sa.update(models.Materia)
+        .where(models.Materia.id == materia_id, models.Materia.professor_id == professor_id)
+        .values(**materia_update.model_dump(exclude_unset=True))
+        .returning(models.Materia)
+    )
+    if db_materia is not None:
+        # As questões geradas a partir do texto anterior não serão mais encontradas; libera o espaço
+        await db.execute(
+            sa.delete(models.QuestaoGeradaCache)
+            .where(models.QuestaoGeradaCache.materia_id == materia_id,
+                   models.QuestaoGeradaCache.texto_hash != chave_conteudo(db_materia.texto_base))
+        )
+    await db.commit()
     return db_materia
 
-def delete_materia(db: Session, materia_id: int):
-    db_materia = db.query(models.Materia).filter(models.Materia.id == materia_id).first()
-    if db_materia:
-        db.delete(db_materia)
-        db.commit()
-    return db_materia
+async def delete_materia(db: AsyncSession, materia_id: int, professor_id: int):
+    """DELETE direto (o banco remove as dependências via ON DELETE CASCADE). False se nada foi removido."""
+    result = await db.execute(
+        sa.delete(models.Materia)
+        .where(models.Materia.id == materia_id, models.Materia.professor_id == professor_id)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+# --- Autorização ---
+async def get_materia_professor_id(db: AsyncSession, materia_id: int):
+    """Dono da matéria (busca só a coluna, pela chave primária); None se a matéria não existe."""
+    return await db.scalar(select(models.Materia.professor_id).where(models.Materia.id == materia_id))
+
+async def get_acesso_avaliacao(db: AsyncSession, avaliacao_id: int, user_type: str, user_id: int):
+    """Resolve em uma consulta a matéria da avaliação e se o usuário pode acessá-la.
+
+    Professor: dono da matéria. Aluno: inscrito na matéria. Retorna uma linha (materia_id,
+    quantidade_questoes, permitido) ou None se a avaliação não existe.
+    """
+    if user_type == "professor":
+        stmt = select(
+            models.Avaliacao.materia_id,
+            models.Avaliacao.quantidade_questoes,
+            (models.Materia.professor_id == user_id).label("permitido")
+        ).join(models.Materia, models.Materia.id == models.Avaliacao.materia_id)
+    else:
+        stmt = select(
+            models.Avaliacao.materia_id,
+            models.Avaliacao.quantidade_questoes,
+            models.Inscricao.id.is_not(None).label("permitido")
+        ).outerjoin(models.Inscricao, sa.and_(
+            models.Inscricao.materia_id == models.Avaliacao.materia_id,
+            models.Inscricao.aluno_id == user_id
+        ))
+    return (await db.execute(stmt.where(models.Avaliacao.id == avaliacao_id))).first()
 
 # --- Inscricao CRUD ---
-def create_inscricao(db: Session, aluno_id: int, materia_id: int):
+async def create_inscricao(db: AsyncSession, aluno_id: int, materia_id: int):
     db_inscricao = models.Inscricao(aluno_id=aluno_id, materia_id=materia_id)
     try:
         db.add(db_inscricao)
-        db.commit()
-        db.refresh(db_inscricao)
-        return db_inscricao
+        await db.flush()
+        await _atualizar_relatorio(db, {materia_id: {"total_alunos": 1, "soma_notas": 0, "quantidade_notas": 0}})
+        await db.commit()
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         return None # Aluno já inscrito ou erro de integridade
+    # Recarrega com aluno e matéria, serializados em InscricaoResponse
+    return await db.scalar(
+        select(models.Inscricao)
+        .options(joinedload(models.Inscricao.aluno), joinedload(models.Inscricao.materia))
+        .where(models.Inscricao.id == db_inscricao.id)
+        .execution_options(populate_existing=True)
+    )
 
-def get_inscricao(db: Session, aluno_id: int, materia_id: int):
-    return db.query(models.Inscricao).filter(
+async def get_inscricao(db: AsyncSession, aluno_id: int, materia_id: int):
+    return await db.scalar(select(models.Inscricao).where(
         models.Inscricao.aluno_id == aluno_id,
         models.Inscricao.materia_id == materia_id
-    ).first()
-
-def get_inscricoes_by_aluno(db: Session, aluno_id: int):
-    return db.query(models.Inscricao).filter(models.Inscricao.aluno_id == aluno_id).all()
-
-def get_inscricoes_by_materia(db: Session, materia_id: int):
-    return db.query(models.Inscricao).filter(models.Inscricao.materia_id == materia_id).all()
+    ))
+
+async def get_inscricoes_by_aluno(db: AsyncSession, aluno_id: int, apos=None, limite=None):
+    stmt = select(models.Inscricao).where(models.Inscricao.aluno_id == aluno_id)\
+        .options(joinedload(models.Inscricao.materia))
+    return (await db.scalars(_keyset(stmt, models.Inscricao.id, apos, limite))).all()
+
+async def get_inscricoes_by_materia(db: AsyncSession, materia_id: int, professor_id: int = None, apos=None, limite=None):
+    stmt = select(models.Inscricao).where(models.Inscricao.materia_id == materia_id)\
+        .options(joinedload(models.Inscricao.aluno))
+    if professor_id is not None:
+        # Autorização na própria consulta: só retorna linhas se a matéria for do professor
+        stmt = stmt.join(models.Materia, models.Materia.id == models.Inscricao.materia_id)\
+            .where(models.Materia.professor_id == professor_id)
+    return (await db.scalars(_keyset(stmt, models.Inscricao.id, apos, limite))).all()
 
 # --- Questao CRUD ---
-def create_questao(db: Session, questao: schemas.QuestaoCreate):
-    db_questao = models.Questao(**questao.model_dump())
-    db.add(db_questao)
-    db.commit()
-    db.refresh(db_questao)
-    return db_questao
-
-def get_questao_by_id(db: Session, questao_id: int):
-    return db.query(models.Questao).filter(models.Questao.id == questao_id).first()
-
-def get_questoes_by_materia(db: Session, materia_id: int):
-    return db.query(models.Questao).filter(models.Questao.materia_id == materia_id).all()
-
-def delete_questao(db: Session, questao_id: int):
-    db_questao = db.query(models.Questao).filter(models.Questao.id == questao_id).first()
-    if db_questao:
-        db.delete(db_questao)
-        db.commit()
-    return db_questao
+async def create_questoes_bulk(db: AsyncSession, questoes: List[schemas.QuestaoCreate]):
+    """Insere várias questões em uma transação, com um INSERT ... RETURNING de múltiplas linhas."""
+    if not questoes:
+        return []
+    stmt = sa.insert(models.Questao).returning(models.Questao, sort_by_parameter_order=True)
+    db_questoes = (await db.scalars(stmt, [questao.model_dump() for questao in questoes])).all()
+    await db.commit()
+    return db_questoes
+
+async def get_perguntas_existentes(db: AsyncSession, materia_id: int, perguntas: List[str]):
+    """Quais destas perguntas a matéria já tem (ex.: questões geradas que vieram do cache de novo)."""
+    if not perguntas:
+        return set()
+    return set((await db.scalars(
+        select(models.Questao.pergunta)
+        .where(models.Questao.materia_id == materia_id, models.Questao.pergunta.in_(perguntas))
+    )).all())
+
+async def get_questao_by_id(db: AsyncSession, questao_id: int):
+    return await db.scalar(select(models.Questao).where(models.Questao.id == questao_id))
+
+async def get_questoes_by_materia(db: AsyncSession, materia_id: int, expand=frozenset(), apos=None, limite=None):
+    stmt = select(models.Questao).where(models.Questao.materia_id == materia_id)
+    stmt = _keyset(stmt, models.Questao.id, apos, limite)
+    return (await db.scalars(_com_expansoes(stmt, models.Questao, expand))).all()
+
+# --- Cache de questões geradas por IA ---
+async def get_questoes_cache(db: AsyncSession, chaves: List[str]):
+    """Busca os trechos em cache e marca o acesso; retorna {chave: lista de questões}."""
+    if not chaves:
+        return {}
+    linhas = (await db.execute(
+        select(models.QuestaoGeradaCache.chave, models.QuestaoGeradaCache.questoes)
+        .where(models.QuestaoGeradaCache.chave.in_(chaves))
+    )).all()
+    if linhas:
+        await db.execute(
+            sa.update(models.QuestaoGeradaCache)
+            .where(models.QuestaoGeradaCache.chave.in_([linha.chave for linha in linhas]))
+            .values(ultimo_acesso=_agora())
+        )
+        await db.commit()
+    return {linha.chave: linha.questoes for linha in linhas}
+
+async def salvar_questoes_cache(db: AsyncSession, materia_id: int, texto_hash: str, entradas: dict):
+    """Grava (ou substitui) os trechos {chave: questões} e aplica a política de remoção:
+    trechos sem acesso há mais de IA_CACHE_TTL_DIAS e, acima de IA_CACHE_MAXIMO, os menos acessados."""
+    if not entradas:
+        return
+    agora = _agora()
+    await db.execute(
+        _insert_ou_atualizar(
+            db, models.QuestaoGeradaCache, ["chave"],
+            lambda excluded: {coluna: excluded[coluna] for coluna in ("materia_id", "texto_hash", "questoes", "ultimo_acesso")}
+        ),
+        [
+            {"chave": chave, "materia_id": materia_id, "texto_hash": texto_hash, "questoes": questoes, "ultimo_acesso": agora}
+            for chave, questoes in entradas.items()
+        ]
+    )
+    tabela = models.QuestaoGeradaCache
+    await db.execute(sa.delete(tabela).where(tabela.ultimo_acesso < agora - timedelta(days=IA_CACHE_TTL_DIAS)))
+    excedentes = select(tabela.chave).order_by(tabela.ultimo_acesso.desc()).offset(IA_CACHE_MAXIMO)
+    await db.execute(sa.delete(tabela).where(tabela.chave.in_(excedentes)))
+    await db.commit()
 
 # --- Avaliacao CRUD ---
-def create_avaliacao(db: Session, avaliacao: schemas.AvaliacaoCreate):
-    db_avaliacao = models.Avaliacao(**avaliacao.model_dump())
-    db.add(db_avaliacao)
-    db.commit()
-    db.refresh(db_avaliacao)
+async def create_avaliacao(db: AsyncSession, avaliacao: schemas.AvaliacaoCreate):
+    db_avaliacao = await db.scalar(_inserir(models.Avaliacao, avaliacao.model_dump()))
+    await db.commit()
     return db_avaliacao
 
-def get_avaliacao_by_id(db: Session, avaliacao_id: int):
-    return db.query(models.Avaliacao).filter(models.Avaliacao.id == avaliacao_id).first()
-
-def get_avaliacoes_by_materia(db: Session, materia_id: int):
-    return db.query(models.Avaliacao).filter(models.Avaliacao.materia_id == materia_id).all()
-
-def delete_avaliacao(db: Session, avaliacao_id: int):
-    db_avaliacao = db.query(models.Avaliacao).filter(models.Avaliacao.id == avaliacao_id).first()
-    if db_avaliacao:
-        db.delete(db_avaliacao)
-        db.commit()
-    return db_avaliacao
+async def get_avaliacao_by_id(db: AsyncSession, avaliacao_id: int):
+    return await db.scalar(select(models.Avaliacao).where(models.Avaliacao.id == avaliacao_id))
+
+async def get_avaliacoes_by_materia(db: AsyncSession, materia_id: int):
+    return (await db.scalars(select(models.Avaliacao).where(models.Avaliacao.materia_id == materia_id))).all()
+
+# --- ProvaAluno CRUD ---
+async def get_prova_aluno(db: AsyncSession, avaliacao_id: int, aluno_id: int):
+    return await db.scalar(select(models.ProvaAluno).where(
+        models.ProvaAluno.avaliacao_id == avaliacao_id, models.ProvaAluno.aluno_id == aluno_id
+    ))
+
+async def create_prova_aluno(db: AsyncSession, avaliacao_id: int, aluno_id: int, semente: int, questoes: List[int]):
+    """Grava a prova sorteada; se outra requisição já a gravou (aberturas simultâneas), devolve a existente."""
+    db_prova = await db.scalar(
+        _insert_dialeto(db)(models.ProvaAluno)
+        .values(avaliacao_id=avaliacao_id, aluno_id=aluno_id, semente=semente, questoes=questoes)
+        .on_conflict_do_nothing(index_elements=["avaliacao_id", "aluno_id"])
+        .returning(models.ProvaAluno)
+    )
+    if db_prova is None:
+        db_prova = await get_prova_aluno(db, avaliacao_id, aluno_id)
+    await db.commit()
+    return db_prova
 
 # --- RespostaAluno CRUD ---
-def create_resposta_aluno(db: Session, resposta: schemas.RespostaAlunoCreate):
-    db_resposta = models.RespostaAluno(**resposta.model_dump())
-    db.add(db_resposta)
-    db.commit()
-    db.refresh(db_resposta)
+async def get_resposta_by_id(db: AsyncSession, resposta_id: int):
+    return await db.scalar(select(models.RespostaAluno).where(models.RespostaAluno.id == resposta_id))
+
+async def create_resposta_aluno(db: AsyncSession, resposta: schemas.RespostaAlunoCreate, materia_id: int):
+    """None se o aluno já respondeu a questão nesta avaliação (índice único idx_respostas_aluno)."""
+    try:
+        db_resposta = await db.scalar(_inserir(models.RespostaAluno, resposta.model_dump()))
+        # Ainda não corrigida: conta só no total de questões
+        await acumular_desempenho(db, [{
+            "aluno_id": resposta.aluno_id, "avaliacao_id": resposta.avaliacao_id, "materia_id": materia_id,
+            "total_questoes": 1, "acertos": 0, "soma_notas": 0, "tempo_total": resposta.tempo_resposta
+        }])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return None
     return db_resposta
 
-def get_respostas_by_aluno_and_avaliacao(db: Session, aluno_id: int, avaliacao_id: int):
-    return db.query(models.RespostaAluno).filter(
+async def create_respostas_bulk(db: AsyncSession, respostas: List[dict], materia_id: int):
+    """Insere as respostas de um envio com um INSERT ... RETURNING de múltiplas linhas e atualiza o
+    desempenho na mesma transação.
+
+    Retorna None (nada é gravado) se alguma questão já tinha resposta do aluno nesta avaliação: o
+    índice único idx_respostas_aluno decide, então envios simultâneos não gravam em dobro.
+    """
+    if not respostas:
+        return []
+    try:
+        stmt = sa.insert(models.RespostaAluno).returning(models.RespostaAluno, sort_by_parameter_order=True)
+        db_respostas = (await db.scalars(stmt, respostas)).all()
+        await acumular_desempenho(db, [
+            {
+                "aluno_id": resposta["aluno_id"], "avaliacao_id": resposta["avaliacao_id"], "materia_id": materia_id,
+                "total_questoes": 1, "tempo_total": resposta["tempo_resposta"],
+                # Só as já corrigidas (múltipla escolha) contam nos acertos e na nota
+                "acertos": int(bool(resposta["corrigida_em"] and resposta["correta"])),
+                "soma_notas": resposta["nota"] if resposta["corrigida_em"] else 0,
+            }
+            for resposta in respostas
+        ])
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return None
+    return db_respostas
+
+async def get_gabarito(db: AsyncSession, materia_id: int, questao_ids: List[int]):
+    """Tipo e resposta correta das questões dadas que pertencem à matéria, por id."""
+    linhas = (await db.execute(
+        select(models.Questao.id, models.Questao.tipo, models.Questao.resposta_correta)
+        .where(models.Questao.materia_id == materia_id, models.Questao.id.in_(questao_ids))
+    )).all()
+    return {linha.id: linha for linha in linhas}
+
+async def get_respostas_by_aluno_and_avaliacao(db: AsyncSession, aluno_id: int, avaliacao_id: int):
+    return (await db.scalars(select(models.RespostaAluno).where(
         models.RespostaAluno.aluno_id == aluno_id,
         models.RespostaAluno.avaliacao_id == avaliacao_id
-    ).all()
+    ))).all()
+
+async def get_respostas_a_corrigir(db: AsyncSession, avaliacao_id: int = None, resposta_ids: List[int] = None):
+    """Respostas ainda não corrigidas (da avaliação e/ou dos ids dados), junto com a questão."""
+    stmt = select(
+        models.RespostaAluno.id,
+        models.RespostaAluno.aluno_id,
+        models.RespostaAluno.avaliacao_id,
+        models.Questao.materia_id,
+        models.RespostaAluno.resposta_aluno,
+        models.Questao.tipo,
+        models.Questao.pergunta,
+        models.Questao.resposta_correta
+    ).join(models.Questao, models.Questao.id == models.RespostaAluno.questao_id)\
+    .where(models.RespostaAluno.corrigida_em.is_(None))
+    if avaliacao_id is not None:
+        stmt = stmt.where(models.RespostaAluno.avaliacao_id == avaliacao_id)
+    if resposta_ids is not None:
+        stmt = stmt.where(models.RespostaAluno.id.in_(resposta_ids))
+    return (await db.execute(stmt.order_by(models.RespostaAluno.id))).all()
+
+async def salvar_correcoes(db: AsyncSession, correcoes: List[dict], respostas: dict):
+    """Grava as correções [{id, correta, nota, feedback_ia}] com um UPDATE em lote pela chave primária
+    e soma acertos e notas ao desempenho. `respostas` mapeia o id para a linha pendente corrigida
+    (com aluno_id, avaliacao_id e materia_id), como devolvida por get_respostas_a_corrigir.
+
+    Duas correções da mesma avaliação podem rodar ao mesmo tempo e ler as mesmas pendentes: antes de
+    gravar, um UPDATE condicional (corrigida_em IS NULL) reserva as respostas, e só as reservadas
+    aqui são gravadas e somadas ao desempenho. Retorna as correções efetivamente gravadas.
+    """
+    if not correcoes:
+        return []
+    agora = _agora()
+    reservadas = set((await db.scalars(
+        sa.update(models.RespostaAluno)
+        .where(models.RespostaAluno.id.in_([correcao["id"] for correcao in correcoes]),
+               models.RespostaAluno.corrigida_em.is_(None))
+        .values(corrigida_em=agora)
+        .returning(models.RespostaAluno.id)
+    )).all())
+    correcoes = [correcao for correcao in correcoes if correcao["id"] in reservadas]
+    if not correcoes:
+        await db.commit()
+        return []
+    await db.execute(sa.update(models.RespostaAluno), correcoes)
+    await acumular_desempenho(db, [
+        {
+            "aluno_id": respostas[correcao["id"]].aluno_id,
+            "avaliacao_id": respostas[correcao["id"]].avaliacao_id,
+            "materia_id": respostas[correcao["id"]].materia_id,
+            "total_questoes": 0, "tempo_total": 0,
+            "acertos": int(correcao["correta"]), "soma_notas": correcao["nota"],
+        }
+        for correcao in correcoes
+    ])
+    await db.commit()
+    return correcoes
 
 # --- Desempenho CRUD ---
-def create_desempenho(db: Session, desempenho: schemas.DesempenhoCreate):
-    db_desempenho = models.Desempenho(**desempenho.model_dump())
-    db.add(db_desempenho)
-    db.commit()
-    db.refresh(db_desempenho)
-    return db_desempenho
-
-def get_desempenho_by_aluno_and_avaliacao(db: Session, aluno_id: int, avaliacao_id: int):
-    return db.query(models.Desempenho).filter(
+def _contribuicoes(linhas):
+    """Soma as contribuições de respostas ao desempenho, por (aluno, avaliação, matéria).
+
+    Cada linha traz aluno_id, avaliacao_id, materia_id e as parcelas total_questoes, acertos,
+    soma_notas e tempo_total.
+    """
+    somas = {}
+    for linha in linhas:
+        chave = (linha["aluno_id"], linha["avaliacao_id"], linha["materia_id"])
+        soma = somas.setdefault(chave, {"total_questoes": 0, "acertos": 0, "soma_notas": 0, "tempo_total": 0})
+        for campo in soma:
+            soma[campo] += linha[campo] or 0
+    return [
+        {"aluno_id": aluno_id, "avaliacao_id": avaliacao_id, "materia_id": materia_id, **soma,
+         "nota_final": round(soma["soma_notas"] / soma["total_questoes"], 2) if soma["total_questoes"] else 0}
+        for (aluno_id, avaliacao_id, materia_id), soma in somas.items()
+    ]
+
+def _menor(db: AsyncSession, *valores):
+    return (sa.func.least if db.bind.dialect.name == "postgresql" else sa.func.min)(*valores)
+
+def _maior(db: AsyncSession, *valores):
+    return (sa.func.greatest if db.bind.dialect.name == "postgresql" else sa.func.max)(*valores)
+
+async def _atualizar_relatorio(db: AsyncSession, deltas: dict, extremos: dict = None, recalcular=()):
+    """Aplica variações ao relatório agregado das matérias, com um upsert.
+
+    `deltas`: {materia_id: {total_alunos, soma_notas, quantidade_notas}} somados aos atuais.
+    `extremos`: {materia_id: (menor, maior)} das notas novas, combinados com os atuais.
+    `recalcular`: matérias cuja menor/maior nota pode ter saído do intervalo (uma nota extrema
+    mudou para dentro dele); são relidas de desempenho, sem passar pelas inscrições.
+    """
+    if not deltas:
+        return
+    extremos = extremos or {}
+    r = models.RelatorioMateria
+    def somar(excluded):
+        return {
+            "total_alunos": r.total_alunos + excluded.total_alunos,
+            "soma_notas": r.soma_notas + excluded.soma_notas,
+            "quantidade_notas": r.quantidade_notas + excluded.quantidade_notas,
+            "menor_nota": _menor(db, sa.func.coalesce(r.menor_nota, excluded.menor_nota), sa.func.coalesce(excluded.menor_nota, r.menor_nota)),
+            "maior_nota": _maior(db, sa.func.coalesce(r.maior_nota, excluded.maior_nota), sa.func.coalesce(excluded.maior_nota, r.maior_nota)),
+        }
+    await db.execute(_insert_ou_atualizar(db, r, ["materia_id"], somar), [
+        {"materia_id": materia_id, **delta,
+         "menor_nota": extremos.get(materia_id, (None, None))[0], "maior_nota": extremos.get(materia_id, (None, None))[1]}
+        for materia_id, delta in deltas.items()
+    ])
+    for materia_id in recalcular:
+        d = models.Desempenho
+        await db.execute(
+            sa.update(r).where(r.materia_id == materia_id).values(
+                menor_nota=select(sa.func.min(d.nota_final)).where(d.materia_id == materia_id).scalar_subquery(),
+                maior_nota=select(sa.func.max(d.nota_final)).where(d.materia_id == materia_id).scalar_subquery(),
+            )
+        )
+
+async def acumular_desempenho(db: AsyncSession, linhas):
+    """Soma contribuições aos contadores de desempenho com um upsert, sem reler as respostas,
+    e propaga a variação das notas finais para o relatório agregado da matéria.
+
+    nota_final = soma_notas / total_questoes (respostas ainda não corrigidas contam zero). Não faz
+    commit: deve ir na mesma transação que grava as respostas ou as correções.
+    """
+    valores = _contribuicoes(linhas)
+    if not valores:
+        return
+    d = models.Desempenho
+    # Notas anteriores (travadas até o fim da transação no Postgres), para calcular a variação
+    anteriores = {
+        (linha.aluno_id, linha.avaliacao_id): linha.nota_final
+        for linha in (await db.execute(
+            select(d.aluno_id, d.avaliacao_id, d.nota_final)
+            .where(sa.tuple_(d.aluno_id, d.avaliacao_id).in_([(v["aluno_id"], v["avaliacao_id"]) for v in valores]))
+            .with_for_update()
+        )).all()
+    }
+    def somar(excluded):
+        total = d.total_questoes + excluded.total_questoes
+        soma_notas = d.soma_notas + excluded.soma_notas
+        return {
+            "total_questoes": total,
+            "acertos": d.acertos + excluded.acertos,
+            "soma_notas": soma_notas,
+            "tempo_total": d.tempo_total + excluded.tempo_total,
+            # * 1.0 evita a divisão inteira do SQLite
+            "nota_final": sa.func.round(soma_notas * 1.0 / sa.func.nullif(total, 0), 2),
+            "data_conclusao": sa.func.now(),
+        }
+    atuais = (await db.execute(
+        _insert_ou_atualizar(db, d, ["aluno_id", "avaliacao_id"], somar)
+        .returning(d.aluno_id, d.avaliacao_id, d.materia_id, d.nota_final),
+        valores
+    )).all()
+
+    relatorio = await db.execute(
+        select(models.RelatorioMateria.materia_id, models.RelatorioMateria.menor_nota, models.RelatorioMateria.maior_nota)
+        .where(models.RelatorioMateria.materia_id.in_({linha.materia_id for linha in atuais}))
+        .with_for_update()
+    )
+    limites = {linha.materia_id: (linha.menor_nota, linha.maior_nota) for linha in relatorio}
+    deltas, extremos, recalcular = {}, {}, set()
+    for linha in atuais:
+        nova = linha.nota_final or 0
+        anterior = anteriores.get((linha.aluno_id, linha.avaliacao_id))
+        delta = deltas.setdefault(linha.materia_id, {"total_alunos": 0, "soma_notas": 0, "quantidade_notas": 0})
+        delta["soma_notas"] += nova - (anterior or 0)
+        delta["quantidade_notas"] += anterior is None
+        menor, maior = extremos.get(linha.materia_id, (nova, nova))
+        extremos[linha.materia_id] = (min(menor, nova), max(maior, nova))
+        # A nota que era o extremo da turma se moveu para dentro: o novo extremo precisa ser relido
+        menor_turma, maior_turma = limites.get(linha.materia_id, (None, None))
+        if anterior is not None and ((anterior == menor_turma and nova > anterior) or (anterior == maior_turma and nova < anterior)):
+            recalcular.add(linha.materia_id)
+    await _atualizar_relatorio(db, deltas, extremos, recalcular)
+
+async def get_desempenho_by_aluno_and_avaliacao(db: AsyncSession, aluno_id: int, avaliacao_id: int):
+    return await db.scalar(select(models.Desempenho).where(
         models.Desempenho.aluno_id == aluno_id,
         models.Desempenho.avaliacao_id == avaliacao_id
-    ).first()
+    ))
+
+async def get_desempenhos_by_aluno(db: AsyncSession, aluno_id: int):
+    return (await db.scalars(select(models.Desempenho).where(models.Desempenho.aluno_id == aluno_id))).all()
 
 # --- Relatórios para o Professor (baseados em etapa1.txt) ---
-def get_relatorio_geral_turma(db: Session, materia_id: int):
-    return db.query(
+async def get_relatorio_geral_turma(db: AsyncSession, materia_id: int, professor_id: int = None):
+    # Lê a linha pré-agregada de relatorio_materia (mantida nas escritas), sem agregar a turma
+    r = models.RelatorioMateria
+    stmt = select(
         models.Materia.nome.label("materia"),
-        sa.func.count(sa.distinct(models.Inscricao.aluno_id)).label("total_alunos"),
-        sa.func.avg(models.Desempenho.nota_final).label("media_turma"),
-        sa.func.max(models.Desempenho.nota_final).label("maior_nota"),
-        sa.func.min(models.Desempenho.nota_final).label("menor_nota")
-    ).outerjoin(models.Inscricao, models.Materia.id == models.Inscricao.materia_id)\
-    .outerjoin(models.Desempenho, models.Materia.id == models.Desempenho.materia_id)\
-    .filter(models.Materia.id == materia_id)\
-    .group_by(models.Materia.id, models.Materia.nome).first()
-
-def get_desempenho_individual_alunos(db: Session, materia_id: int):
-    return db.query(
+        sa.func.coalesce(r.total_alunos, 0).label("total_alunos"),
+        (r.soma_notas * 1.0 / sa.func.nullif(r.quantidade_notas, 0)).label("media_turma"),
+        r.maior_nota,
+        r.menor_nota
+    ).outerjoin(r, r.materia_id == models.Materia.id)\
+    .where(models.Materia.id == materia_id)
+    if professor_id is not None:
+        stmt = stmt.where(models.Materia.professor_id == professor_id)
+    return (await db.execute(stmt)).first()
+
+# Ordenado pela nota (desc) com o id do desempenho como desempate, para um cursor estável.
+# O 0 vai literal no SQL para a expressão coincidir com a do índice idx_desempenho_materia.
+_NOTA_ORDENACAO = sa.func.coalesce(models.Desempenho.nota_final, sa.literal_column("0"))
+
+def _consulta_desempenho_individual(materia_id: int):
+    return select(
+        models.Desempenho.id.label("desempenho_id"),
         models.Aluno.nome.label("aluno"),
         models.Aluno.ra,
         models.Desempenho.nota_final,
@@ -199,5 +643,163 @@ def get_desempenho_individual_alunos(db: Session, materia_id: int):
         models.Desempenho.total_questoes,
         (sa.cast(models.Desempenho.acertos, sa.DECIMAL) / models.Desempenho.total_questoes * 100).label("percentual_acerto")
     ).join(models.Desempenho, models.Aluno.id == models.Desempenho.aluno_id)\
-    .filter(models.Desempenho.materia_id == materia_id)\
-    .order_by(models.Desempenho.nota_final.desc()).all()
+    .where(models.Desempenho.materia_id == materia_id)
+
+async def get_desempenho_individual_alunos(db: AsyncSession, materia_id: int, professor_id: int = None, apos=None, limite=None):
+    nota = _NOTA_ORDENACAO
+    stmt = _consulta_desempenho_individual(materia_id)
+    if professor_id is not None:
+        stmt = stmt.join(models.Materia, models.Materia.id == models.Desempenho.materia_id)\
+            .where(models.Materia.professor_id == professor_id)
+    if apos is not None:
+        nota_apos, id_apos = apos
+        stmt = stmt.where(sa.or_(
+            nota < nota_apos,
+            sa.and_(nota == nota_apos, models.Desempenho.id < id_apos)
+        ))
+    stmt = stmt.order_by(nota.desc(), models.Desempenho.id.desc())
+    if limite is not None:
+        stmt = stmt.limit(limite)
+    return (await db.execute(stmt)).all()
+
+# --- Análise de itens ---
+async def get_versao_respostas(db: AsyncSession, avaliacao_id: int):
+    """(quantidade, maior id, última correção) das respostas da avaliação: muda quando chegam novas
+    respostas ou quando alguma é corrigida, e serve de versão para o cache da análise."""
+    r = models.RespostaAluno
+    return tuple((await db.execute(
+        select(sa.func.count(), sa.func.max(r.id), sa.func.max(r.corrigida_em)).where(r.avaliacao_id == avaliacao_id)
+    )).one())
+
+async def get_respostas_analise(db: AsyncSession, avaliacao_id: int):
+    """Só as colunas que a análise usa, de todas as respostas da avaliação, em uma consulta.
+
+    A alternativa marcada já vem normalizada, e só nas de múltipla escolha: o texto das respostas
+    abertas não é transferido. A nota vem como float, sem a conversão de Decimal por linha.
+    """
+    r, q = models.RespostaAluno, models.Questao
+    return (await db.execute(
+        select(
+            r.aluno_id,
+            r.questao_id,
+            sa.case((q.tipo == "multipla_escolha", sa.func.upper(sa.func.trim(r.resposta_aluno))), else_=None).label("alternativa"),
+            sa.cast(r.nota, sa.Float).label("nota"),
+            r.tempo_resposta,
+            r.corrigida_em.is_not(None).label("corrigida"),
+        ).join(q, q.id == r.questao_id)
+        .where(r.avaliacao_id == avaliacao_id)
+    )).all()
+
+async def get_questoes_analise(db: AsyncSession, questao_ids: List[int]):
+    q = models.Questao
+    return (await db.execute(
+        select(q.id, q.pergunta, q.tipo, q.opcoes, q.resposta_correta).where(q.id.in_(questao_ids))
+    )).all()
+
+# --- Exportações ---
+# Resultados transmitidos em lotes de `lote` linhas por um cursor do lado do servidor (yield_per),
+# sem materializar a turma inteira: cada função devolve o AsyncResult de db.stream(). No Postgres
+# (asyncpg) o cursor exige uma transação aberta, então a sessão não pode estar em autocommit.
+async def stream_desempenho_materia(db: AsyncSession, materia_id: int, lote: int):
+    stmt = _consulta_desempenho_individual(materia_id)\
+        .order_by(_NOTA_ORDENACAO.desc(), models.Desempenho.id.desc())
+    return await db.stream(stmt.execution_options(yield_per=lote))
+
+async def stream_respostas_materia(db: AsyncSession, materia_id: int, lote: int):
+    r = models.RespostaAluno
+    stmt = select(
+        r.id.label("resposta_id"),
+        r.avaliacao_id,
+        models.Avaliacao.titulo.label("avaliacao"),
+        models.Aluno.ra,
+        models.Aluno.nome.label("aluno"),
+        r.questao_id,
+        r.resposta_aluno,
+        r.correta,
+        r.nota,
+        r.tempo_resposta,
+        r.created_at,
+        r.corrigida_em,
+    ).join(models.Avaliacao, models.Avaliacao.id == r.avaliacao_id)\
+    .join(models.Aluno, models.Aluno.id == r.aluno_id)\
+    .where(models.Avaliacao.materia_id == materia_id)\
+    .order_by(r.avaliacao_id, r.id)
+    return await db.stream(stmt.execution_options(yield_per=lote))
+
+async def stream_inscricoes_materia(db: AsyncSession, materia_id: int, lote: int):
+    stmt = select(
+        models.Aluno.id.label("aluno_id"),
+        models.Aluno.ra,
+        models.Aluno.nome,
+        models.Aluno.email,
+        models.Inscricao.data_inscricao,
+    ).join(models.Inscricao, models.Inscricao.aluno_id == models.Aluno.id)\
+    .where(models.Inscricao.materia_id == materia_id)\
+    .order_by(models.Inscricao.id)
+    return await db.stream(stmt.execution_options(yield_per=lote))
+
+# --- Jobs ---
+async def create_job(db: AsyncSession, tipo: str, parametros: dict, user_type: str, user_id: int):
+    db_job = await db.scalar(_inserir(models.Job, dict(
+        tipo=tipo, parametros=parametros, user_type=user_type, user_id=user_id, status="pendente"
+    )))
+    await db.commit()
+    return db_job
+
+async def get_job(db: AsyncSession, job_id: int, user_type: str, user_id: int):
+    """Job pelo id, apenas se pertencer ao usuário."""
+    return await db.scalar(select(models.Job).where(
+        models.Job.id == job_id, models.Job.user_type == user_type, models.Job.user_id == user_id
+    ))
+
+def _tentativas_esgotadas(tentativas_maximo: int) -> str:
+    return f"Job interrompido: limite de {tentativas_maximo} tentativas atingido"
+
+async def iniciar_job(db: AsyncSession, job_id: int, tentativas_maximo: int):
+    """Reserva o job (pendente -> executando) de forma atômica; None se outro worker já o pegou.
+
+    Um job que já usou as `tentativas_maximo` execuções vai direto para "erro" (também retorna None).
+    """
+    j, agora = models.Job, _agora()
+    esgotado = j.tentativas >= tentativas_maximo
+    db_job = await db.scalar(
+        sa.update(j)
+        .where(j.id == job_id, j.status == "pendente")
+        .values(
+            status=sa.case((esgotado, "erro"), else_="executando"),
+            tentativas=sa.case((esgotado, j.tentativas), else_=j.tentativas + 1),
+            iniciado_em=sa.case((esgotado, j.iniciado_em), else_=agora),
+            erro=sa.case((esgotado, _tentativas_esgotadas(tentativas_maximo)), else_=None),
+            concluido_em=sa.case((esgotado, agora), else_=None),
+        )
+        .returning(j)
+    )
+    await db.commit()
+    return db_job if db_job is not None and db_job.status == "executando" else None
+
+async def finalizar_job(db: AsyncSession, job_id: int, resultado=None, erro: str = None):
+    await db.execute(
+        sa.update(models.Job).where(models.Job.id == job_id)
+        .values(status="erro" if erro else "concluido", resultado=resultado, erro=erro, concluido_em=_agora())
+    )
+    await db.commit()
+
+async def recuperar_jobs(db: AsyncSession, timeout: int, tentativas_maximo: int):
+    """Devolve à fila os jobs interrompidos (executando há mais de `timeout` segundos) e
+    retorna os ids de todos os pendentes, em ordem de criação. Os interrompidos que já usaram
+    as `tentativas_maximo` execuções ficam com status "erro", em vez de voltar à fila."""
+    j, agora = models.Job, _agora()
+    esgotado = j.tentativas >= tentativas_maximo
+    await db.execute(
+        sa.update(j)
+        .where(j.status == "executando", j.iniciado_em < agora - timedelta(seconds=timeout))
+        .values(
+            status=sa.case((esgotado, "erro"), else_="pendente"),
+            erro=sa.case((esgotado, _tentativas_esgotadas(tentativas_maximo)), else_=j.erro),
+            concluido_em=sa.case((esgotado, agora), else_=j.concluido_em),
+        )
+    )
+    await db.commit()
+    return (await db.scalars(
+        select(models.Job.id).where(models.Job.status == "pendente").order_by(models.Job.id)
+    )).all()
@@ -1,17 +1,104 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from core.config import DATABASE_URL
+from uuid import uuid4
 
-# Cria a engine de conexão com o banco de dados
-engine = create_engine(DATABASE_URL, echo=True)
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+from core.config import (
+    DATABASE_URL, DB_POOL_MODO, DB_POOL_TAMANHO, DB_POOL_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_PGBOUNCER, DB_ECHO
+)
+
+# Drivers assíncronos usados pela API para cada banco suportado
+DRIVERS_ASYNC = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def url_async(url: str):
+    """Converte a DATABASE_URL (síncrona) para o driver assíncrono equivalente."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    url = url.set(drivername=DRIVERS_ASYNC[backend])
+    if backend == "postgresql":
+        # O asyncpg não aceita os parâmetros de SSL da libpq (ex.: URLs do Neon com ?sslmode=require)
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode:
+            query["ssl"] = sslmode
+        url = url.set(query=query)
+    return url
+
+def opcoes_engine(url, assincrona: bool) -> dict:
+    """Argumentos de create_engine/create_async_engine conforme a configuração do pool."""
+    opcoes = {"echo": DB_ECHO}
+    if make_url(url).get_backend_name() != "postgresql":
+        return opcoes # SQLite (desenvolvimento/benchmarks) usa o pool padrão do dialeto
+
+    if DB_POOL_MODO == "nulo":
+        opcoes["poolclass"] = NullPool
+    else:
+        opcoes.update(
+            pool_size=DB_POOL_TAMANHO,
+            max_overflow=DB_POOL_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+
+    if assincrona and DB_PGBOUNCER:
+        opcoes["connect_args"] = {
+            "statement_cache_size": 0, # cache de statements do asyncpg
+            "prepared_statement_cache_size": 0, # cache de statements do dialeto do SQLAlchemy
+            # Nomes únicos evitam colisão de prepared statements entre clientes do PgBouncer
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return opcoes
+
+# Cria a engine de conexão com o banco de dados (síncrona, usada por migrações e scripts)
+engine = create_engine(DATABASE_URL, **opcoes_engine(DATABASE_URL, assincrona=False))
 
 # Cria uma fábrica de sessões
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Dependência para obter uma sessão do banco de dados em cada requisição
-def get_db():
-    db = SessionLocal()
-    try:
+# Engine e sessões assíncronas, usadas pela API para não bloquear o event loop.
+# expire_on_commit=False: em AsyncSession, acessar um atributo expirado dispararia I/O implícito, e
+# os objetos criados no crud (INSERT ... RETURNING) continuam válidos depois do commit sem refresh.
+async_engine = create_async_engine(url_async(DATABASE_URL), **opcoes_engine(DATABASE_URL, assincrona=True))
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+class SessaoLeitura(Session):
+    """Session das requisições de leitura: só aceita SELECT."""
+
+@event.listens_for(SessaoLeitura, "do_orm_execute")
+def _somente_select(estado):
+    if not estado.is_select:
+        raise RuntimeError("Escrita em uma sessão somente leitura (requisição GET)")
+
+@event.listens_for(SessaoLeitura, "before_flush")
+def _sem_flush(session, flush_context, instances):
+    raise RuntimeError("Escrita em uma sessão somente leitura (requisição GET)")
+
+# Leituras em modo autocommit: cada SELECT é sua própria transação, sem BEGIN/ROLLBACK de ida e
+# volta ao banco por requisição. Compartilha o pool da engine principal.
+AsyncSessionLeitura = async_sessionmaker(
+    bind=async_engine.execution_options(isolation_level="AUTOCOMMIT"),
+    sync_session_class=SessaoLeitura, autoflush=False, expire_on_commit=False,
+)
+
+# Dependência que fornece a sessão de cada requisição. A sessão só obtém uma conexão do pool na
+# primeira consulta, então requisições recusadas antes disso (ex.: token inválido) não tocam o banco.
+# GET/HEAD usam a sessão somente leitura; os demais métodos, uma transação comum.
+async def get_db(request: Request):
+    fabrica = AsyncSessionLeitura if request.method in ("GET", "HEAD") else AsyncSessionLocal
+    async with fabrica() as db:
+        yield db
+
+# Sessão transacional mesmo em GET, para leituras que eventualmente gravam (ex.: a prova do aluno,
+# sorteada e gravada na primeira abertura). Como toda sessão, só conecta se for usada.
+async def get_db_escrita():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,75 @@
+"""Exportações de uma matéria (desempenho, respostas, inscrições) em CSV ou NDJSON, transmitidas.
+
+O corpo é gerado enquanto o cursor do banco é lido, EXPORTACAO_LOTE linhas por vez (yield_per),
+então a memória usada não cresce com o tamanho da turma. O gerador abre a própria sessão: as
+dependências com yield (get_db) são encerradas antes de a StreamingResponse enviar o corpo.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import StreamingResponse
+
+from . import crud
+from .config import EXPORTACAO_LOTE
+from .database import AsyncSessionLocal
+
+# tipo -> função do crud que devolve o AsyncResult transmitido: fn(db, materia_id, lote)
+EXPORTACOES = {
+    "desempenho": crud.stream_desempenho_materia,
+    "respostas": crud.stream_respostas_materia,
+    "inscricoes": crud.stream_inscricoes_materia,
+}
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+def _json(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+# Planilhas interpretam como fórmula a célula que começa com estes caracteres (CSV injection)
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+def _celula(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor # texto digitado pelo aluno (nome, resposta) é exibido, nunca avaliado
+    return valor
+
+def _csv(linhas) -> str:
+    saida = io.StringIO()
+    csv.writer(saida).writerows([_celula(valor) for valor in linha] for linha in linhas)
+    return saida.getvalue()
+
+async def _transmitir(tipo: str, formato: str, materia_id: int):
+    # Transação comum (não autocommit): o cursor do asyncpg só existe dentro de uma; nada é gravado
+    async with AsyncSessionLocal() as db:
+        resultado = await EXPORTACOES[tipo](db, materia_id, EXPORTACAO_LOTE)
+        colunas = list(resultado.keys())
+        if formato == "csv":
+            yield ("\ufeff" + _csv([colunas])).encode() # BOM: o Excel reconhece o UTF-8
+        async for linhas in resultado.partitions():
+            if formato == "csv":
+                yield _csv(linhas).encode()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(colunas, linha)), default=_json, ensure_ascii=False) + "\n"
+                    for linha in linhas
+                ).encode()
+
+def resposta(tipo: str, formato: str, materia_id: int) -> StreamingResponse:
+    """StreamingResponse com a exportação `tipo` da matéria (o acesso deve ter sido verificado antes)."""
+    return StreamingResponse(
+        _transmitir(tipo, formato, materia_id),
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="materia-{materia_id}-{tipo}.{formato}"'},
+    )
@@ -0,0 +1,345 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+from pydantic import ValidationError
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import schemas, crud, cache
+from .config import (
+    GOOGLE_API_KEY, IA_PROVEDOR, IA_MODELO, IA_CONCORRENCIA, IA_TENTATIVAS,
+    IA_ESPERA_BASE, IA_TIMEOUT, IA_TRECHO_TAMANHO, IA_LOCAL_LATENCIA
+)
+
+class ErroIA(Exception):
+    """A chamada à IA falhou (provedor indisponível ou resposta inválida)."""
+
+class ErroTemporarioIA(ErroIA):
+    """Falha que pode ser resolvida repetindo a chamada (limite de taxa, timeout, resposta malformada)."""
+
+# --- Provedores ---
+class ProvedorIA:
+    """Interface dos provedores de IA. Os métodos devolvem o texto (JSON) da resposta do modelo:
+
+    - gerar: recebe um trecho do texto base; lista de questões no formato de PROMPT_QUESTOES.
+    - corrigir: recebe um lote de respostas abertas; lista de correções no formato de PROMPT_CORRECAO.
+    """
+
+    nome = "base"
+    modelo = ""
+
+    async def gerar(self, trecho: str, quantidade: int, nivel_dificuldade: str) -> str:
+        raise NotImplementedError
+
+    async def corrigir(self, itens: List[dict]) -> str:
+        raise NotImplementedError
+
+# Altere ao mudar o prompt ou a interpretação das respostas: as entradas antigas do cache deixam de valer
+VERSAO_PROMPT = "1"
+
+PROMPT_QUESTOES = """Você é um professor elaborando uma avaliação.
+Com base exclusivamente no texto abaixo, crie {quantidade} questões de múltipla escolha
+de nível "{nivel}". Responda apenas com um JSON no formato:
+[{{"pergunta": "...", "opcoes": {{"A": "...", "B": "...", "C": "...", "D": "..."}}, "resposta_correta": "A"}}]
+
+Texto:
+{trecho}
+"""
+
+PROMPT_CORRECAO = """Você é um professor corrigindo respostas abertas de alunos.
+Para cada item abaixo, compare a resposta do aluno com a resposta esperada e atribua uma nota
+de 0 a 10. Responda apenas com um JSON no formato:
+[{{"id": 1, "correta": true, "nota": 10, "feedback": "..."}}]
+
+Itens:
+{itens}
+"""
+
+class ProvedorGemini(ProvedorIA):
+    """Gera questões com a API Gemini (google-generativeai)."""
+
+    nome = "gemini"
+
+    def __init__(self, api_key: str, modelo: str):
+        if not api_key:
+            raise ErroIA("GOOGLE_API_KEY não configurada")
+        try:
+            import google.generativeai as genai
+            from google.api_core import exceptions as google_exceptions
+        except ImportError as e:
+            raise ErroIA("Pacote google-generativeai não instalado") from e
+        genai.configure(api_key=api_key)
+        self.modelo = modelo
+        self._modelo = genai.GenerativeModel(
+            modelo, generation_config={"response_mime_type": "application/json"}
+        )
+        # Erros do lado do serviço que valem uma nova tentativa
+        self._temporarios = (
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.InternalServerError,
+        )
+
+    async def gerar(self, trecho: str, quantidade: int, nivel_dificuldade: str) -> str:
+        return await self._chamar(PROMPT_QUESTOES.format(quantidade=quantidade, nivel=nivel_dificuldade, trecho=trecho))
+
+    async def corrigir(self, itens: List[dict]) -> str:
+        return await self._chamar(PROMPT_CORRECAO.format(itens=json.dumps(itens, ensure_ascii=False, indent=1)))
+
+    async def _chamar(self, prompt: str) -> str:
+        try:
+            resposta = await self._modelo.generate_content_async(prompt)
+            return resposta.text
+        except self._temporarios as e:
+            raise ErroTemporarioIA(str(e)) from e
+        except ValueError as e:
+            # resposta.text falha quando o conteúdo é bloqueado ou vem vazio
+            raise ErroTemporarioIA(str(e)) from e
+
+class ProvedorLocal(ProvedorIA):
+    """Gerador determinístico, sem rede: monta questões a partir das frases do próprio trecho.
+
+    O mesmo trecho sempre produz as mesmas questões, o que permite testar e medir todo o fluxo
+    (divisão, concorrência, retentativas, interpretação) offline. A latência opcional simula o
+    tempo de resposta de um provedor remoto.
+    """
+
+    nome = "local"
+
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+
+    async def gerar(self, trecho: str, quantidade: int, nivel_dificuldade: str) -> str:
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        frases = [f.strip() for f in re.split(r"(?<=[.!?])\s+", trecho) if len(f.strip()) > 3] or [trecho.strip()]
+        semente = int.from_bytes(hashlib.sha256(trecho.encode()).digest()[:8], "big")
+        aleatorio = random.Random(semente)
+        questoes = []
+        for i in range(quantidade):
+            frase = frases[i % len(frases)]
+            distratores = [f for f in frases if f != frase]
+            aleatorio.shuffle(distratores)
+            alternativas = [frase] + (distratores + ["Nenhuma das anteriores"] * 3)[:3]
+            aleatorio.shuffle(alternativas)
+            letras = "ABCD"
+            questoes.append({
+                "pergunta": f"Qual das afirmações abaixo está presente no texto? ({i + 1})",
+                "opcoes": dict(zip(letras, alternativas)),
+                "resposta_correta": letras[alternativas.index(frase)],
+            })
+        return json.dumps(questoes, ensure_ascii=False)
+
+    async def corrigir(self, itens: List[dict]) -> str:
+        # Nota proporcional às palavras da resposta esperada presentes na resposta do aluno
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        correcoes = []
+        for item in itens:
+            esperadas = set(re.findall(r"\w+", item["resposta_esperada"].lower()))
+            dadas = set(re.findall(r"\w+", item["resposta_aluno"].lower()))
+            proporcao = len(esperadas & dadas) / len(esperadas) if esperadas else 0.0
+            correcoes.append({
+                "id": item["id"],
+                "correta": proporcao >= 0.6,
+                "nota": round(10 * proporcao, 2),
+                "feedback": "Resposta compatível com a esperada." if proporcao >= 0.6
+                            else f"Resposta esperada: {item['resposta_esperada']}.",
+            })
+        return json.dumps(correcoes, ensure_ascii=False)
+
+@lru_cache(maxsize=None)
+def obter_provedor(nome: Optional[str] = None) -> ProvedorIA:
+    """Instancia (uma vez) o provedor configurado em IA_PROVEDOR."""
+    nome = nome or IA_PROVEDOR
+    if nome == "gemini":
+        return ProvedorGemini(GOOGLE_API_KEY, IA_MODELO)
+    if nome == "local":
+        return ProvedorLocal(IA_LOCAL_LATENCIA)
+    raise ErroIA(f"Provedor de IA desconhecido: {nome}")
+
+# --- Divisão do texto e interpretação das respostas ---
+def dividir_texto(texto: str, tamanho: int = IA_TRECHO_TAMANHO) -> List[str]:
+    """Divide o texto em trechos de até `tamanho` caracteres, quebrando em parágrafos e frases."""
+    trechos, atual = [], ""
+    partes = [p for p in re.split(r"\n\s*\n|(?<=[.!?])\s+", texto) if p.strip()]
+    for parte in partes:
+        parte = parte.strip()
+        # Frases maiores que o trecho são cortadas
+        while len(parte) > tamanho:
+            if atual:
+                trechos.append(atual)
+                atual = ""
+            trechos.append(parte[:tamanho])
+            parte = parte[tamanho:]
+        if atual and len(atual) + 1 + len(parte) > tamanho:
+            trechos.append(atual)
+            atual = ""
+        atual = f"{atual} {parte}" if atual else parte
+    if atual:
+        trechos.append(atual)
+    return trechos
+
+def distribuir(total: int, partes: int) -> List[int]:
+    """Reparte `total` questões entre `partes` trechos o mais igualmente possível."""
+    base, resto = divmod(total, partes)
+    return [base + (1 if i < resto else 0) for i in range(partes)]
+
+def interpretar_questoes(texto: str, materia_id: int, nivel_dificuldade: str) -> List[schemas.QuestaoCreate]:
+    """Converte a resposta do provedor em QuestaoCreate, descartando itens inválidos."""
+    # Alguns modelos envolvem o JSON em um bloco ```json ... ```
+    texto = re.sub(r"^\s*```(?:json)?|```\s*$", "", texto.strip())
+    try:
+        dados = json.loads(texto)
+    except json.JSONDecodeError as e:
+        raise ErroTemporarioIA("Resposta da IA não é um JSON válido") from e
+    if isinstance(dados, dict):
+        dados = dados.get("questoes", [])
+    if not isinstance(dados, list):
+        raise ErroTemporarioIA("Resposta da IA não contém uma lista de questões")
+    questoes = []
+    for item in dados:
+        if not isinstance(item, dict):
+            continue
+        try:
+            questao = schemas.QuestaoCreate(
+                materia_id=materia_id,
+                pergunta=item["pergunta"],
+                tipo="multipla_escolha",
+                opcoes=item.get("opcoes"),
+                resposta_correta=str(item["resposta_correta"]).strip().upper(),
+                nivel_dificuldade=nivel_dificuldade,
+            )
+        except (KeyError, ValidationError):
+            continue
+        if questao.opcoes and questao.resposta_correta not in questao.opcoes:
+            continue
+        questoes.append(questao)
+    return questoes
+
+def interpretar_correcoes(texto: str, ids: set) -> dict:
+    """Converte a resposta de correção em {id: (correta, nota, feedback)}, com nota entre 0 e 10.
+    Itens inválidos ou de ids que não estavam no lote são descartados."""
+    texto = re.sub(r"^\s*```(?:json)?|```\s*$", "", texto.strip())
+    try:
+        dados = json.loads(texto)
+    except json.JSONDecodeError as e:
+        raise ErroTemporarioIA("Resposta da IA não é um JSON válido") from e
+    if not isinstance(dados, list):
+        raise ErroTemporarioIA("Resposta da IA não contém uma lista de correções")
+    correcoes = {}
+    for item in dados:
+        try:
+            resposta_id = int(item["id"])
+            nota = min(10.0, max(0.0, float(item["nota"])))
+        except (TypeError, KeyError, ValueError):
+            continue
+        if resposta_id in ids:
+            correcoes[resposta_id] = (bool(item.get("correta", nota >= 6)), nota, str(item.get("feedback") or ""))
+    return correcoes
+
+# --- Chamadas ---
+async def chamar_com_retentativas(limite: asyncio.Semaphore, chamada, interpretar):
+    """Executa `chamada()` (corrotina do provedor) sob o semáforo e com timeout, e aplica
+    `interpretar` ao texto; falhas temporárias são repetidas com espera exponencial."""
+    for tentativa in range(IA_TENTATIVAS):
+        try:
+            async with limite:
+                texto = await asyncio.wait_for(chamada(), IA_TIMEOUT)
+            return interpretar(texto)
+        except (ErroTemporarioIA, asyncio.TimeoutError):
+            if tentativa == IA_TENTATIVAS - 1:
+                raise ErroIA(f"Falha na chamada à IA após {IA_TENTATIVAS} tentativas")
+            # Espera fora do semáforo, com jitter para não sincronizar as retentativas
+            await asyncio.sleep(IA_ESPERA_BASE * 2 ** tentativa * (0.5 + random.random()))
+
+# --- Geração ---
+async def _gerar_trecho(provedor: ProvedorIA, limite: asyncio.Semaphore, trecho: str, quantidade: int,
+                        materia_id: int, nivel_dificuldade: str) -> List[schemas.QuestaoCreate]:
+    return await chamar_com_retentativas(
+        limite,
+        lambda: provedor.gerar(trecho, quantidade, nivel_dificuldade),
+        lambda texto: interpretar_questoes(texto, materia_id, nivel_dificuldade)
+    )
+
+def chave_trecho(provedor: ProvedorIA, trecho: str, nivel_dificuldade: str, tipo: str = "multipla_escolha") -> str:
+    """Endereço do conteúdo de um trecho no cache de questões geradas."""
+    return cache.chave_conteudo(provedor.nome, provedor.modelo, VERSAO_PROMPT, tipo, nivel_dificuldade, trecho)
+
+async def _buscar_cache(db: Optional[AsyncSession], pedidos: dict, materia_id: int, texto_hash: str) -> dict:
+    """Procura {chave: quantidade} na memória e depois no banco; só vale a entrada com questões suficientes."""
+    encontrados, faltantes = {}, []
+    for chave, quantidade in pedidos.items():
+        questoes = cache.questoes.get(chave)
+        if questoes is not None and len(questoes) >= quantidade:
+            encontrados[chave] = questoes
+        else:
+            faltantes.append(chave)
+    acertos_memoria = len(encontrados)
+    if faltantes and db is not None:
+        for chave, questoes in (await crud.get_questoes_cache(db, faltantes)).items():
+            if len(questoes) >= pedidos[chave]:
+                encontrados[chave] = questoes
+                cache.questoes.set(chave, materia_id, texto_hash, questoes)
+    cache.questoes.registrar(
+        acertos_memoria=acertos_memoria,
+        acertos_banco=len(encontrados) - acertos_memoria,
+        faltas=len(pedidos) - len(encontrados)
+    )
+    return encontrados
+
+async def gerar_questoes(materia_id: int, texto_base: str, quantidade: int, nivel_dificuldade: str = "medio",
+                         provedor: Optional[ProvedorIA] = None, concorrencia: int = IA_CONCORRENCIA,
+                         db: Optional[AsyncSession] = None, usar_cache: bool = True) -> List[schemas.QuestaoCreate]:
+    """Gera `quantidade` questões sobre o texto base.
+
+    O texto é dividido em trechos e cada trecho vira uma chamada ao provedor; as chamadas correm
+    em paralelo, no máximo `concorrencia` por vez. Trechos já gerados antes (mesmo conteúdo,
+    nível, provedor e versão do prompt) vêm do cache em memória ou, com `db`, da tabela, sem
+    chamar o provedor; com usar_cache=False todos os trechos são gerados de novo (e substituem o
+    que estava no cache). Pode retornar menos questões que o pedido se o provedor devolver itens
+    inválidos.
+    """
+    provedor = provedor or obter_provedor()
+    trechos = dividir_texto(texto_base) or [texto_base]
+    if len(trechos) > quantidade:
+        # Mais trechos que questões: usa trechos espalhados por todo o texto
+        trechos = [trechos[i * len(trechos) // quantidade] for i in range(quantidade)]
+    plano = [
+        (chave_trecho(provedor, trecho, nivel_dificuldade), trecho, n)
+        for trecho, n in zip(trechos, distribuir(quantidade, len(trechos)))
+    ]
+    texto_hash = cache.chave_conteudo(texto_base)
+    em_cache = await _buscar_cache(db, {chave: n for chave, _, n in plano}, materia_id, texto_hash) if usar_cache else {}
+
+    faltantes = [(chave, trecho, n) for chave, trecho, n in plano if chave not in em_cache]
+    limite = asyncio.Semaphore(concorrencia)
+    resultados = await asyncio.gather(*(
+        _gerar_trecho(provedor, limite, trecho, n, materia_id, nivel_dificuldade)
+        for _, trecho, n in faltantes
+    ), return_exceptions=True)
+
+    # Guarda o que foi gerado mesmo se algum trecho falhou, para não pagar por ele de novo
+    gerados = {}
+    for (chave, _, _), resultado in zip(faltantes, resultados):
+        if isinstance(resultado, BaseException):
+            continue
+        gerados[chave] = [questao.model_dump(exclude={"materia_id"}) for questao in resultado]
+        cache.questoes.set(chave, materia_id, texto_hash, gerados[chave])
+    if db is not None:
+        await crud.salvar_questoes_cache(db, materia_id, texto_hash, gerados)
+    for resultado in resultados:
+        if isinstance(resultado, BaseException):
+            raise resultado
+
+    em_cache.update(gerados)
+    return [
+        schemas.QuestaoCreate(materia_id=materia_id, **questao)
+        for chave, _, n in plano for questao in em_cache[chave][:n]
+    ][:quantidade]
@@ -0,0 +1,111 @@
+"""Importação de alunos em lote a partir de um CSV com as colunas ra, nome, email e senha.
+
+As linhas são validadas uma a uma; as repetidas no próprio arquivo e as que colidem com alunos já
+cadastrados (uma consulta para o lote inteiro) são recusadas. As senhas das demais são convertidas
+em hash em paralelo no pool de hash, e os alunos são inseridos com um único INSERT de múltiplas
+linhas, já inscritos na matéria informada, na mesma transação. Linhas recusadas voltam em `erros`
+sem impedir a importação das outras.
+"""
+import csv
+import io
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cache, crud, schemas
+from .config import ALUNOS_IMPORTACAO_MAXIMO
+from .security import get_password_hashes_async
+
+COLUNAS = ("ra", "nome", "email", "senha")
+
+class ArquivoInvalido(Exception):
+    """O arquivo como um todo não pode ser importado (codificação, cabeçalho, tamanho)."""
+
+def _erro(linha: int, erro: str) -> schemas.ErroImportacaoAluno:
+    return schemas.ErroImportacaoAluno(linha=linha, erro=erro)
+
+def ler_csv(conteudo: bytes) -> Tuple[List[Tuple[int, schemas.AlunoCreate]], List[schemas.ErroImportacaoAluno]]:
+    """Valida as linhas do CSV; devolve ([(linha, AlunoCreate)], erros). Aceita "," ou ";" como separador."""
+    try:
+        texto = conteudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ArquivoInvalido("O arquivo deve estar codificado em UTF-8")
+    cabecalho = texto.split("\n", 1)[0]
+    try:
+        dialeto = csv.Sniffer().sniff(cabecalho, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(io.StringIO(texto), dialect=dialeto)
+    colunas = {(coluna or "").strip().lower() for coluna in leitor.fieldnames or ()}
+    faltando = [coluna for coluna in COLUNAS if coluna not in colunas]
+    if faltando:
+        raise ArquivoInvalido(f"Colunas obrigatórias ausentes no cabeçalho: {', '.join(faltando)}")
+
+    validas, erros = [], []
+    for registro in leitor:
+        linha = leitor.line_num
+        valores = {
+            (chave or "").strip().lower(): valor.strip()
+            for chave, valor in registro.items() if isinstance(valor, str)
+        }
+        if not any(valores.values()):
+            continue # linha em branco
+        if len(validas) + len(erros) >= ALUNOS_IMPORTACAO_MAXIMO:
+            raise ArquivoInvalido(f"Máximo de {ALUNOS_IMPORTACAO_MAXIMO} alunos por importação")
+        vazios = [coluna for coluna in COLUNAS if not valores.get(coluna)]
+        if vazios:
+            erros.append(_erro(linha, f"Campos vazios: {', '.join(vazios)}"))
+            continue
+        try:
+            validas.append((linha, schemas.AlunoCreate(**{coluna: valores[coluna] for coluna in COLUNAS})))
+        except ValidationError as exc:
+            erros.append(_erro(linha, "; ".join(f"{erro['loc'][0]}: {erro['msg']}" for erro in exc.errors())))
+    return validas, erros
+
+async def importar_alunos(db: AsyncSession, conteudo: bytes, materia_id: Optional[int] = None) -> Optional[schemas.ImportacaoAlunosResponse]:
+    """Importa os alunos do CSV; None se outra requisição cadastrou um dos RAs/emails durante a importação."""
+    validas, erros = ler_csv(conteudo)
+
+    # Repetidos no próprio arquivo: vale a primeira ocorrência
+    ras, emails, unicas = {}, {}, []
+    for linha, aluno in validas:
+        if aluno.ra in ras:
+            erros.append(_erro(linha, f"RA repetido no arquivo (linha {ras[aluno.ra]})"))
+        elif aluno.email in emails:
+            erros.append(_erro(linha, f"Email repetido no arquivo (linha {emails[aluno.email]})"))
+        else:
+            ras[aluno.ra] = emails[aluno.email] = linha
+            unicas.append((linha, aluno))
+
+    # Já cadastrados: uma consulta para o lote inteiro
+    ras_cadastrados, emails_cadastrados = set(), set()
+    if unicas:
+        for ra, email in await crud.get_alunos_conflitantes(db, list(ras), list(emails)):
+            ras_cadastrados.add(ra)
+            emails_cadastrados.add(email)
+    novas = []
+    for linha, aluno in unicas:
+        if aluno.email in emails_cadastrados:
+            erros.append(_erro(linha, "Email já registrado"))
+        elif aluno.ra in ras_cadastrados:
+            erros.append(_erro(linha, "RA já registrado"))
+        else:
+            novas.append(aluno)
+
+    # Encerra a transação das consultas: a conexão volta ao pool enquanto os hashes são calculados
+    await db.commit()
+    hashes = await get_password_hashes_async([aluno.senha for aluno in novas])
+    db_alunos = await crud.create_alunos_bulk(db, [
+        {"ra": aluno.ra, "nome": aluno.nome, "email": aluno.email, "senha_hash": senha_hash}
+        for aluno, senha_hash in zip(novas, hashes)
+    ], materia_id=materia_id)
+    if db_alunos is None:
+        return None
+    for db_aluno in db_alunos:
+        cache.principais.invalidar("aluno", db_aluno.email)
+    return schemas.ImportacaoAlunosResponse(
+        criados=len(db_alunos),
+        inscritos=len(db_alunos) if materia_id is not None else 0,
+        erros=sorted(erros, key=lambda erro: erro.linha),
+    )
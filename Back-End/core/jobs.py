@@ -0,0 +1,134 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas, crud, ia, correcao, cache
+from .config import JOBS_WORKERS, JOBS_TIMEOUT, JOBS_TENTATIVAS_MAXIMO
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# --- Tarefas ---
+TAREFAS = {}
+
+def tarefa(tipo: str):
+    """Registra a função que executa os jobs de um tipo: async fn(db, **parametros) -> resultado (JSON)."""
+    def registrar(fn):
+        TAREFAS[tipo] = fn
+        return fn
+    return registrar
+
+@tarefa("gerar_questoes")
+async def _gerar_questoes(db: AsyncSession, materia_id: int, num_questoes: int, nivel_dificuldade: str = "medio",
+                          regenerar: bool = False):
+    db_materia = await crud.get_materia_by_id(db, materia_id=materia_id)
+    if db_materia is None:
+        raise ValueError("Matéria não encontrada")
+    questoes = await ia.gerar_questoes(
+        materia_id, db_materia.texto_base, num_questoes, nivel_dificuldade=nivel_dificuldade, db=db,
+        usar_cache=not regenerar
+    )
+    # Um acerto no cache devolve as mesmas questões de uma geração anterior: as que a matéria já
+    # tem (mesma pergunta) não são inseridas de novo
+    existentes = await crud.get_perguntas_existentes(db, materia_id, [questao.pergunta for questao in questoes])
+    novas = []
+    for questao in questoes:
+        if questao.pergunta not in existentes:
+            existentes.add(questao.pergunta)
+            novas.append(questao)
+    db_questoes = await crud.create_questoes_bulk(db, questoes=novas)
+    if db_questoes:
+        cache.banco_questoes.invalidar(materia_id)
+    return {
+        "questoes": [schemas.QuestaoResumo.model_validate(q).model_dump(mode="json") for q in db_questoes],
+        "repetidas": len(questoes) - len(novas),
+    }
+
+@tarefa("corrigir_resposta")
+async def _corrigir_resposta(db: AsyncSession, resposta_id: int):
+    await correcao.corrigir_respostas(db, resposta_ids=[resposta_id])
+    db_resposta = await crud.get_resposta_by_id(db, resposta_id=resposta_id)
+    if db_resposta is None:
+        raise ValueError("Resposta não encontrada")
+    if db_resposta.corrigida_em is None:
+        raise ValueError("Não foi possível corrigir a resposta")
+    return schemas.RespostaAlunoResponse.model_validate(db_resposta).model_dump(mode="json")
+
+@tarefa("corrigir_avaliacao")
+async def _corrigir_avaliacao(db: AsyncSession, avaliacao_id: int):
+    return await correcao.corrigir_respostas(db, avaliacao_id=avaliacao_id)
+
+# --- Fila ---
+class FilaJobs:
+    """Fila de jobs em processo: asyncio.Queue de ids servida por `workers` tasks.
+
+    O estado de cada job fica na tabela jobs, então nada se perde se o processo reiniciar: ao
+    iniciar, os jobs pendentes (e os que ficaram "executando" por mais de JOBS_TIMEOUT) voltam para
+    a fila, até JOBS_TENTATIVAS_MAXIMO execuções; depois disso o job fica com status "erro". A reserva
+    pendente -> executando é um UPDATE condicional, de modo que vários processos podem dividir a
+    mesma tabela sem executar um job duas vezes. Sem workers, enfileirar executa o job na hora,
+    dentro da requisição.
+    """
+
+    def __init__(self):
+        self._fila = asyncio.Queue()
+        self._workers = []
+
+    @property
+    def ativa(self) -> bool:
+        return bool(self._workers)
+
+    async def iniciar(self, workers: int = JOBS_WORKERS):
+        if workers <= 0:
+            return
+        self._fila = asyncio.Queue()
+        async with AsyncSessionLocal() as db:
+            for job_id in await crud.recuperar_jobs(db, JOBS_TIMEOUT, JOBS_TENTATIVAS_MAXIMO):
+                self._fila.put_nowait(job_id)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+
+    async def parar(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def enfileirar(self, db: AsyncSession, tipo: str, parametros: dict, user_type: str, user_id: int) -> models.Job:
+        db_job = await crud.create_job(db, tipo, parametros, user_type, user_id)
+        if self.ativa:
+            self._fila.put_nowait(db_job.id)
+        else:
+            await self.executar(db_job.id)
+            await db.refresh(db_job)
+        return db_job
+
+    async def executar(self, job_id: int):
+        """Executa um job com sua própria sessão e grava o resultado ou o erro."""
+        async with AsyncSessionLocal() as db:
+            db_job = await crud.iniciar_job(db, job_id, JOBS_TENTATIVAS_MAXIMO)
+            if db_job is None:
+                return # já executado, em execução em outro worker ou sem tentativas restantes
+            try:
+                resultado = await TAREFAS[db_job.tipo](db, **db_job.parametros)
+            except Exception as e:
+                logger.exception("Job %s (%s) falhou", job_id, db_job.tipo)
+                await db.rollback()
+                await crud.finalizar_job(db, job_id, erro=str(e) or e.__class__.__name__)
+            else:
+                await crud.finalizar_job(db, job_id, resultado=resultado)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._fila.get()
+            try:
+                await self.executar(job_id)
+            except Exception:
+                logger.exception("Erro ao executar o job %s", job_id)
+            finally:
+                self._fila.task_done()
+
+    def metricas(self) -> dict:
+        return {"workers": len(self._workers), "fila": self._fila.qsize()}
+
+fila = FilaJobs()
@@ -0,0 +1,253 @@
+"""Instrumentação por requisição: consultas SQL, tempo de banco, do endpoint e da serialização.
+
+O middleware abre uma medição por requisição numa ContextVar, que acompanha a requisição também
+dentro do greenlet em que o SQLAlchemy assíncrono executa os eventos da engine. Os eventos contam
+as consultas e seus tempos; RotaMedida separa o tempo do endpoint do tempo de serialização da
+resposta. No início da resposta a medição vira o cabeçalho Server-Timing; ao fim, é acumulada por
+rota no registro, exposto em formato Prometheus por /metrics.
+"""
+import functools
+import inspect
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from threading import Lock
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from .config import METRICAS_N_MAIS_UM, METRICAS_CONSULTA_LENTA_MS
+
+logger = logging.getLogger(__name__)
+
+# Limites (em segundos) do histograma de duração das requisições
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Medicao:
+    """Acumulado de uma requisição."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.mais_lenta = 0.0
+        self.sql_mais_lenta = None
+        self.formatos = Counter() # execuções por formato de SQL, para detectar N+1
+        self.tempo_endpoint = None
+        self.fim_endpoint = None
+        self.tempo_serializacao = None
+
+    def server_timing(self, agora: float) -> str:
+        partes = [
+            f'db;dur={self.tempo_db * 1000:.1f};desc="consultas: {self.consultas}"',
+            f"db_max;dur={self.mais_lenta * 1000:.1f}",
+        ]
+        if self.tempo_endpoint is not None:
+            partes.append(f"endpoint;dur={self.tempo_endpoint * 1000:.1f}")
+        if self.tempo_serializacao is not None:
+            partes.append(f"serializacao;dur={self.tempo_serializacao * 1000:.1f}")
+        partes.append(f"total;dur={(agora - self.inicio) * 1000:.1f}")
+        return ", ".join(partes)
+
+_medicao: ContextVar = ContextVar("medicao", default=None)
+
+_PARAMETROS = re.compile(r"\$\d+|%\(\w+\)s|:\w+|\?")
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+def formato(statement: str) -> str:
+    """SQL sem os parâmetros: listas IN de qualquer tamanho e estilos de placeholder viram (?)."""
+    statement = _PARAMETROS.sub("?", statement)
+    return _ESPACOS.sub(" ", _LISTAS.sub("(?)", statement)).strip()
+
+# --- Eventos da engine ---
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if _medicao.get() is not None:
+        context._metricas_inicio = time.perf_counter()
+
+def _depois(conn, cursor, statement, parameters, context, executemany):
+    medicao = _medicao.get()
+    inicio = getattr(context, "_metricas_inicio", None)
+    if medicao is None or inicio is None:
+        return
+    duracao = time.perf_counter() - inicio
+    medicao.consultas += 1
+    medicao.tempo_db += duracao
+    medicao.formatos[formato(statement)] += 1
+    if duracao > medicao.mais_lenta:
+        medicao.mais_lenta = duracao
+        medicao.sql_mais_lenta = statement
+
+def instrumentar(engine_sync):
+    """Registra os eventos de medição na engine (síncrona; em AsyncEngine, use .sync_engine)."""
+    if not event.contains(engine_sync, "before_cursor_execute", _antes):
+        event.listen(engine_sync, "before_cursor_execute", _antes)
+        event.listen(engine_sync, "after_cursor_execute", _depois)
+
+# --- Rotas ---
+def _medir_endpoint(endpoint):
+    def registrar(inicio):
+        medicao = _medicao.get()
+        if medicao is not None:
+            medicao.fim_endpoint = time.perf_counter()
+            medicao.tempo_endpoint = medicao.fim_endpoint - inicio
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                registrar(inicio)
+    else:
+        @functools.wraps(endpoint)
+        def medido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                registrar(inicio)
+    return medido
+
+class RotaMedida(APIRoute):
+    """APIRoute que mede o tempo do endpoint; o que vai dele até o início da resposta é serialização.
+
+    A assinatura do endpoint é preservada (functools.wraps), então as dependências e o
+    response_model são resolvidos como na rota original.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _medir_endpoint(endpoint), **kwargs)
+
+# --- Registro ---
+class RegistroMetricas:
+    """Totais por (método, rota) desde o início do processo, em formato Prometheus."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._status = Counter()
+        self._rotas = defaultdict(lambda: {
+            "requisicoes": 0,
+            "segundos": 0.0,
+            "buckets": [0] * len(BUCKETS),
+            "consultas": 0,
+            "db_segundos": 0.0,
+            "endpoint_segundos": 0.0,
+            "serializacao_segundos": 0.0,
+            "consulta_mais_lenta_segundos": 0.0,
+            "n_mais_um": 0,
+        })
+
+    def registrar(self, metodo: str, rota: str, status: int, medicao: Medicao, duracao: float):
+        suspeitos = {sql: n for sql, n in medicao.formatos.items() if n > METRICAS_N_MAIS_UM}
+        for sql, n in suspeitos.items():
+            logger.warning("Possível N+1 em %s %s: %d execuções de %s", metodo, rota, n, sql[:300])
+        if medicao.mais_lenta * 1000 > METRICAS_CONSULTA_LENTA_MS:
+            logger.warning(
+                "Consulta lenta em %s %s (%.1f ms): %s",
+                metodo, rota, medicao.mais_lenta * 1000, _ESPACOS.sub(" ", medicao.sql_mais_lenta)[:300]
+            )
+        with self._lock:
+            self._status[(metodo, rota, status)] += 1
+            r = self._rotas[(metodo, rota)]
+            r["requisicoes"] += 1
+            r["segundos"] += duracao
+            indice = bisect_left(BUCKETS, duracao)
+            if indice < len(BUCKETS):
+                r["buckets"][indice] += 1
+            r["consultas"] += medicao.consultas
+            r["db_segundos"] += medicao.tempo_db
+            r["endpoint_segundos"] += medicao.tempo_endpoint or 0.0
+            r["serializacao_segundos"] += medicao.tempo_serializacao or 0.0
+            r["consulta_mais_lenta_segundos"] = max(r["consulta_mais_lenta_segundos"], medicao.mais_lenta)
+            r["n_mais_um"] += len(suspeitos)
+
+    def prometheus(self, componentes: dict = None) -> str:
+        """Texto no formato de exposição do Prometheus; componentes: {nome: dict de métricas numéricas}."""
+        linhas = []
+        def familia(nome, tipo, ajuda):
+            linhas.append(f"# HELP simulai_{nome} {ajuda}")
+            linhas.append(f"# TYPE simulai_{nome} {tipo}")
+
+        with self._lock:
+            status = dict(self._status)
+            rotas = {chave: {**r, "buckets": list(r["buckets"])} for chave, r in self._rotas.items()}
+
+        familia("requisicoes_total", "counter", "Requisições atendidas.")
+        for (metodo, rota, codigo), n in sorted(status.items()):
+            linhas.append(f'simulai_requisicoes_total{{metodo="{metodo}",rota="{rota}",status="{codigo}"}} {n}')
+
+        familia("requisicao_segundos", "histogram", "Duração das requisições.")
+        for (metodo, rota), r in sorted(rotas.items()):
+            rotulos = f'metodo="{metodo}",rota="{rota}"'
+            acumulado = 0
+            for limite, n in zip(BUCKETS, r["buckets"]):
+                acumulado += n
+                linhas.append(f'simulai_requisicao_segundos_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f'simulai_requisicao_segundos_bucket{{{rotulos},le="+Inf"}} {r["requisicoes"]}')
+            linhas.append(f"simulai_requisicao_segundos_sum{{{rotulos}}} {r['segundos']}")
+            linhas.append(f"simulai_requisicao_segundos_count{{{rotulos}}} {r['requisicoes']}")
+
+        for campo, tipo, ajuda in (
+            ("consultas", "counter", "Consultas SQL executadas."),
+            ("db_segundos", "counter", "Tempo gasto no banco."),
+            ("endpoint_segundos", "counter", "Tempo dentro dos endpoints."),
+            ("serializacao_segundos", "counter", "Tempo entre o fim do endpoint e o início da resposta."),
+            ("consulta_mais_lenta_segundos", "gauge", "Consulta SQL mais lenta já observada."),
+            ("n_mais_um", "counter", f"Requisições com o mesmo SQL repetido mais de {METRICAS_N_MAIS_UM} vezes."),
+        ):
+            nome = campo if tipo == "gauge" else f"{campo}_total"
+            familia(nome, tipo, ajuda)
+            for (metodo, rota), r in sorted(rotas.items()):
+                linhas.append(f'simulai_{nome}{{metodo="{metodo}",rota="{rota}"}} {r[campo]}')
+
+        for componente, valores in (componentes or {}).items():
+            for chave, valor in valores.items():
+                if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                    familia(f"{componente}_{chave}", "gauge", f"{componente}: {chave}.")
+                    linhas.append(f"simulai_{componente}_{chave} {valor}")
+        return "\n".join(linhas) + "\n"
+
+registro = RegistroMetricas()
+
+# --- Middleware ---
+class MiddlewareMetricas:
+    """Middleware ASGI que mede cada requisição HTTP e adiciona o cabeçalho Server-Timing."""
+
+    def __init__(self, app, registro: RegistroMetricas = registro):
+        self.app = app
+        self.registro = registro
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                agora = time.perf_counter()
+                status = mensagem["status"]
+                if medicao.fim_endpoint is not None:
+                    medicao.tempo_serializacao = agora - medicao.fim_endpoint
+                MutableHeaders(scope=mensagem).append("Server-Timing", medicao.server_timing(agora))
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicao.reset(token)
+            # Rótulo pelo molde da rota (/materias/{materia_id}), não pelo caminho, para não explodir a cardinalidade
+            rota = scope.get("route")
+            self.registro.registrar(
+                scope["method"], getattr(rota, "path", "nao_encontrada"), status,
+                medicao, time.perf_counter() - medicao.inicio
+            )
@@ -1,13 +1,16 @@
 from sqlalchemy import (
-    Column, String, Integer, Text, ForeignKey, TIMESTAMP,
-    DECIMAL, BOOLEAN, JSON, UniqueConstraint
+    Column, String, Integer, BigInteger, Text, ForeignKey, TIMESTAMP,
+    DECIMAL, BOOLEAN, JSON, UniqueConstraint, Index
 )
 from sqlalchemy.orm import relationship, declarative_base
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from sqlalchemy.dialects.postgresql import JSONB
 
 Base = declarative_base()
 
+# JSONB no Postgres; JSON nos demais bancos (SQLite, em desenvolvimento e nos testes)
+JSONB_PORTAVEL = JSON().with_variant(JSONB(), "postgresql")
+
 class Professor(Base):
     __tablename__ = 'professores'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -34,6 +37,11 @@ class Materia(Base):
     avaliacoes = relationship("Avaliacao", back_populates="materia", cascade="all, delete-orphan")
     questoes = relationship("Questao", back_populates="materia", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('idx_materias_professor', 'professor_id', 'id'),
+        Index('idx_materias_senha_acesso', 'senha_acesso', unique=True), # entrada de alunos na matéria
+    )
+
 class Aluno(Base):
     __tablename__ = 'alunos'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -57,7 +65,12 @@ class Inscricao(Base):
     aluno = relationship("Aluno", back_populates="inscricoes")
     materia = relationship("Materia", back_populates="inscricoes")
     
-    __table_args__ = (UniqueConstraint('aluno_id', 'materia_id', name='_aluno_materia_uc'),)
+    __table_args__ = (
+        UniqueConstraint('aluno_id', 'materia_id', name='_aluno_materia_uc'),
+        # (filtro, id): servem também a ordenação da paginação por cursor
+        Index('idx_inscricoes_aluno', 'aluno_id', 'id'),
+        Index('idx_inscricoes_materia', 'materia_id', 'id'),
+    )
 
 class Questao(Base):
     __tablename__ = 'questoes'
@@ -65,7 +78,7 @@ class Questao(Base):
     materia_id = Column(Integer, ForeignKey('materias.id', ondelete='CASCADE'), nullable=False)
     pergunta = Column(Text, nullable=False)
     tipo = Column(String(20), default='multipla_escolha')
-    opcoes = Column(JSONB)
+    opcoes = Column(JSONB_PORTAVEL)
     resposta_correta = Column(String(10), nullable=False)
     nivel_dificuldade = Column(String(20), default='medio')
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -73,6 +86,49 @@ class Questao(Base):
     materia = relationship("Materia", back_populates="questoes")
     respostas_aluno = relationship("RespostaAluno", back_populates="questao", cascade="all, delete-orphan")
 
+    __table_args__ = (Index('idx_questoes_materia', 'materia_id', 'id'),)
+
+class QuestaoGeradaCache(Base):
+    """Questões geradas por IA para um trecho de texto base, endereçadas pelo conteúdo."""
+    __tablename__ = 'questoes_geradas_cache'
+    chave = Column(String(64), primary_key=True) # sha256 de (provedor, versão do prompt, tipo, nível, trecho)
+    materia_id = Column(Integer, ForeignKey('materias.id', ondelete='CASCADE'), index=True)
+    texto_hash = Column(String(64), nullable=False) # sha256 do texto base completo que originou o trecho
+    questoes = Column(JSONB_PORTAVEL, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    ultimo_acesso = Column(TIMESTAMP, nullable=False, index=True) # ordena a remoção dos menos acessados
+
+class RelatorioMateria(Base):
+    """Agregados da turma por matéria, mantidos a cada inscrição e escrita de desempenho.
+
+    Reconstruível a partir das tabelas de origem com `python -m core.relatorios`.
+    """
+    __tablename__ = 'relatorio_materia'
+    materia_id = Column(Integer, ForeignKey('materias.id', ondelete='CASCADE'), primary_key=True)
+    total_alunos = Column(Integer, nullable=False, default=0) # inscrições
+    soma_notas = Column(DECIMAL(12, 2), nullable=False, default=0) # soma de desempenho.nota_final
+    quantidade_notas = Column(Integer, nullable=False, default=0) # linhas de desempenho
+    menor_nota = Column(DECIMAL(5, 2))
+    maior_nota = Column(DECIMAL(5, 2))
+
+class Job(Base):
+    """Tarefa em segundo plano (geração de questões, correção), executada pela fila de core.jobs."""
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tipo = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default='pendente') # pendente, executando, concluido, erro
+    parametros = Column(JSONB_PORTAVEL, nullable=False)
+    resultado = Column(JSONB_PORTAVEL)
+    erro = Column(Text)
+    user_type = Column(String(20), nullable=False) # quem criou o job: 'aluno' ou 'professor'
+    user_id = Column(Integer, nullable=False)
+    tentativas = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    iniciado_em = Column(TIMESTAMP)
+    concluido_em = Column(TIMESTAMP)
+
+    __table_args__ = (Index('idx_jobs_status', 'status'),)
+
 class Avaliacao(Base):
     __tablename__ = 'avaliacoes'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -88,6 +144,17 @@ class Avaliacao(Base):
     respostas_aluno = relationship("RespostaAluno", back_populates="avaliacao", cascade="all, delete-orphan")
     desempenhos = relationship("Desempenho", back_populates="avaliacao", cascade="all, delete-orphan")
 
+    __table_args__ = (Index('idx_avaliacoes_materia', 'materia_id'),)
+
+class ProvaAluno(Base):
+    """Questões sorteadas para um aluno em uma avaliação, na ordem em que ele as recebe (core.provas)."""
+    __tablename__ = 'provas_alunos'
+    avaliacao_id = Column(Integer, ForeignKey('avaliacoes.id', ondelete='CASCADE'), primary_key=True)
+    aluno_id = Column(Integer, ForeignKey('alunos.id', ondelete='CASCADE'), primary_key=True)
+    semente = Column(BigInteger, nullable=False)
+    questoes = Column(JSONB_PORTAVEL, nullable=False) # ids das questões, já na ordem embaralhada
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
 class RespostaAluno(Base):
     __tablename__ = 'respostas_alunos'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -100,11 +167,21 @@ class RespostaAluno(Base):
     feedback_ia = Column(Text)
     tempo_resposta = Column(Integer) # em segundos
     created_at = Column(TIMESTAMP, server_default=func.now())
+    corrigida_em = Column(TIMESTAMP) # nulo enquanto a resposta não foi corrigida
     
     aluno = relationship("Aluno", back_populates="respostas")
     questao = relationship("Questao", back_populates="respostas_aluno")
     avaliacao = relationship("Avaliacao", back_populates="respostas_aluno")
 
+    __table_args__ = (
+        # Uma resposta por questão em cada avaliação: envios simultâneos não duplicam respostas
+        Index('idx_respostas_aluno', 'aluno_id', 'avaliacao_id', 'questao_id', unique=True),
+        Index('idx_respostas_avaliacao', 'avaliacao_id'),
+        Index('idx_respostas_questao', 'questao_id'), # ON DELETE CASCADE das questões
+        Index('idx_respostas_pendentes', 'avaliacao_id',
+              postgresql_where=text('corrigida_em IS NULL'), sqlite_where=text('corrigida_em IS NULL')),
+    )
+
 class Desempenho(Base):
     __tablename__ = 'desempenho'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -113,9 +190,17 @@ class Desempenho(Base):
     materia_id = Column(Integer, ForeignKey('materias.id', ondelete='CASCADE'), nullable=False)
     total_questoes = Column(Integer, default=0)
     acertos = Column(Integer, default=0)
-    nota_final = Column(DECIMAL(5, 2), default=0)
+    nota_final = Column(DECIMAL(5, 2), default=0) # soma_notas / total_questoes
+    soma_notas = Column(DECIMAL(8, 2), nullable=False, default=0) # das respostas já corrigidas
     tempo_total = Column(Integer, default=0) # em segundos
     data_conclusao = Column(TIMESTAMP, server_default=func.now())
 
+    __table_args__ = (
+        UniqueConstraint('aluno_id', 'avaliacao_id', name='_aluno_avaliacao_uc'), # atende também as buscas por aluno
+        Index('idx_desempenho_avaliacao', 'avaliacao_id'),
+        # Ranking da turma: mesma expressão de ordenação de crud.get_desempenho_individual_alunos
+        Index('idx_desempenho_materia', materia_id, func.coalesce(nota_final, text('0')).desc(), id.desc()),
+    )
+
     aluno = relationship("Aluno", back_populates="desempenhos")
     avaliacao = relationship("Avaliacao", back_populates="desempenhos")
\ No newline at end of file
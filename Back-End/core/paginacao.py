@@ -0,0 +1,84 @@
+import base64
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from . import schemas
+from .config import PAGINACAO_LIMITE_PADRAO, PAGINACAO_LIMITE_MAXIMO
+
+# Paginação por cursor (keyset): o cursor guarda a chave de ordenação do último item da página,
+# e a próxima página é buscada com "WHERE chave > cursor ORDER BY chave LIMIT n", que usa o índice
+# e não degrada com a profundidade da página como OFFSET.
+
+@dataclass
+class ParametrosPagina:
+    apos: Optional[tuple]  # chave de ordenação do último item já entregue (None = primeira página)
+    limite: int
+
+    @property
+    def limite_consulta(self):
+        """Busca um item a mais que o limite, para saber se existe uma próxima página."""
+        return self.limite + 1
+
+    def chave(self, *tipos):
+        """Converte a chave do cursor para os tipos esperados pela consulta (None na primeira página).
+
+        Chaves de uma só coluna são devolvidas como valor simples; as compostas, como tupla.
+        """
+        if self.apos is None:
+            return None
+        if len(self.apos) != len(tipos):
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+        try:
+            valores = tuple(tipo(valor) for tipo, valor in zip(tipos, self.apos))
+        except (TypeError, ValueError, ArithmeticError):
+            raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+        return valores[0] if len(valores) == 1 else valores
+
+def codificar_cursor(*chave) -> str:
+    """Codifica a chave de ordenação em um cursor opaco."""
+    return base64.urlsafe_b64encode(json.dumps(chave, default=str).encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str) -> tuple:
+    """Decodifica um cursor gerado por codificar_cursor."""
+    try:
+        chave = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+    if not isinstance(chave, list) or not chave:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+    return tuple(chave)
+
+def parametros_pagina(
+    cursor: Optional[str] = Query(None, description="Valor de next_cursor da página anterior"),
+    limite: int = Query(PAGINACAO_LIMITE_PADRAO, ge=1, le=PAGINACAO_LIMITE_MAXIMO),
+) -> ParametrosPagina:
+    """Dependência que lê ?cursor= e ?limite= dos endpoints paginados."""
+    return ParametrosPagina(apos=decodificar_cursor(cursor) if cursor else None, limite=limite)
+
+def montar_pagina(linhas, pagina: ParametrosPagina, chave, serializar=lambda linha: linha):
+    """Monta a página a partir de linhas buscadas com pagina.limite_consulta.
+
+    chave(linha) devolve a tupla de ordenação usada no cursor; serializar(linha) o item entregue.
+    """
+    linhas, next_cursor = _cortar(linhas, pagina, chave)
+    return schemas.Pagina(items=[serializar(linha) for linha in linhas], next_cursor=next_cursor)
+
+def montar_pagina_json(linhas, pagina: ParametrosPagina, chave, serializar=lambda linha: linha) -> bytes:
+    """Como montar_pagina, mas serializar(linha) devolve o item já em JSON (bytes); devolve o corpo
+    da resposta pronto, sem passar pela validação do response_model."""
+    linhas, next_cursor = _cortar(linhas, pagina, chave)
+    return b"".join((
+        b'{"items":[', b",".join(serializar(linha) for linha in linhas),
+        b'],"next_cursor":', json.dumps(next_cursor).encode(), b"}",
+    ))
+
+def _cortar(linhas, pagina: ParametrosPagina, chave):
+    linhas = list(linhas)
+    next_cursor = None
+    if len(linhas) > pagina.limite:
+        linhas = linhas[:pagina.limite]
+        next_cursor = codificar_cursor(*chave(linhas[-1]))
+    return linhas, next_cursor
@@ -0,0 +1,69 @@
+"""Montagem das provas: cada aluno recebe, por avaliação, as suas questões em ordem aleatória.
+
+O sorteio é determinístico a partir de uma semente derivada de (avaliação, aluno): escolhe
+quantidade_questoes questões do banco da matéria e as embaralha. Na primeira abertura (ou no
+primeiro envio, se o aluno responder sem abrir) a prova é gravada (semente e ids já na ordem, em
+provas_alunos); as seguintes só a leem, sem novo sorteio e sem mudar se o banco de questões mudar
+depois. Enquanto o banco tiver menos questões que o pedido, o sorteio é feito mas não gravado: a
+prova não fica incompleta para sempre por ter sido aberta antes de as questões existirem. O banco
+de cada matéria fica em memória (cache.banco_questoes) já serializado em JSON e sem o gabarito,
+então muitos alunos abrindo a mesma prova custam uma carga (e uma validação do Pydantic por
+questão) por matéria.
+"""
+import hashlib
+import random
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import cache, crud, schemas
+from .database import AsyncSessionLeitura
+
+def semente(avaliacao_id: int, aluno_id: int) -> int:
+    """Semente do sorteio (63 bits, cabe em BIGINT)."""
+    digest = hashlib.sha256(f"{avaliacao_id}:{aluno_id}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+def sortear(questao_ids, quantidade: Optional[int], semente: int) -> List[int]:
+    """Escolhe `quantidade` questões (todas, se None ou maior que o banco) já em ordem aleatória."""
+    questao_ids = sorted(questao_ids) # independente da ordem em que o banco foi carregado
+    if quantidade is None or quantidade > len(questao_ids):
+        quantidade = len(questao_ids)
+    return random.Random(semente).sample(questao_ids, quantidade)
+
+async def _carregar_banco(materia_id: int) -> dict:
+    # Sessão própria: a carga é compartilhada entre requisições e não pode depender da sessão de uma delas
+    async with AsyncSessionLeitura() as db:
+        questoes = await crud.get_questoes_by_materia(db, materia_id=materia_id)
+    return {
+        questao.id: schemas.QuestaoProva.model_validate(questao).model_dump_json().encode()
+        for questao in questoes
+    }
+
+async def banco_questoes(materia_id: int) -> dict:
+    """{id: JSON (bytes) de QuestaoProva} das questões da matéria, em ordem de id."""
+    return await cache.banco_questoes.obter(materia_id, _carregar_banco)
+
+async def questoes_sorteadas(db: AsyncSession, db_escrita: AsyncSession, avaliacao_id: int, aluno_id: int,
+                             materia_id: int, quantidade: Optional[int]) -> List[int]:
+    """Ids das questões do aluno na avaliação, na ordem dele; sorteia e grava a prova na primeira vez."""
+    prova = await crud.get_prova_aluno(db, avaliacao_id, aluno_id)
+    if prova is not None:
+        return prova.questoes
+    banco = await banco_questoes(materia_id)
+    semente_prova = semente(avaliacao_id, aluno_id)
+    questoes = sortear(banco, quantidade, semente_prova)
+    if len(banco) < (quantidade or 1):
+        return questoes # incompleta: sorteada de novo na próxima abertura
+    return (await crud.create_prova_aluno(db_escrita, avaliacao_id, aluno_id, semente_prova, questoes)).questoes
+
+async def questoes_da_prova(db: AsyncSession, db_escrita: AsyncSession, avaliacao_id: int, aluno_id: int,
+                            materia_id: int, quantidade: Optional[int]) -> List[bytes]:
+    """JSON das questões do aluno na avaliação, na ordem dele."""
+    questoes = await questoes_sorteadas(db, db_escrita, avaliacao_id, aluno_id, materia_id, quantidade)
+    banco = await banco_questoes(materia_id)
+    if any(questao_id not in banco for questao_id in questoes):
+        # Banco em memória defasado (prova gravada por outro processo) ou questão removida depois
+        cache.banco_questoes.invalidar(materia_id)
+        banco = await banco_questoes(materia_id)
+    return [banco[questao_id] for questao_id in questoes if questao_id in banco]
@@ -0,0 +1,64 @@
+"""Reconstrução do relatório agregado das turmas (tabela relatorio_materia).
+
+Os agregados são mantidos de forma incremental nas escritas (core.crud); remoções em cascata
+(aluno, avaliação) não passam por lá. Este comando os recalcula a partir das tabelas de origem,
+agregando inscrições e desempenhos separadamente:
+
+    cd Back-End
+    python -m core.relatorios              # todas as matérias
+    python -m core.relatorios --materia 3  # só uma
+"""
+import argparse
+import asyncio
+
+import sqlalchemy as sa
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import AsyncSessionLocal, async_engine
+
+async def reconstruir(db: AsyncSession, materia_id: int = None) -> int:
+    """Recalcula relatorio_materia (de uma matéria ou de todas) e retorna quantas linhas gravou."""
+    m, i, d, r = models.Materia, models.Inscricao, models.Desempenho, models.RelatorioMateria
+    inscricoes = select(i.materia_id, sa.func.count().label("total")).group_by(i.materia_id).subquery()
+    notas = select(
+        d.materia_id,
+        sa.func.coalesce(sa.func.sum(d.nota_final), 0).label("soma"),
+        sa.func.count().label("quantidade"),
+        sa.func.min(d.nota_final).label("menor"),
+        sa.func.max(d.nota_final).label("maior")
+    ).group_by(d.materia_id).subquery()
+    stmt = select(
+        m.id,
+        sa.func.coalesce(inscricoes.c.total, 0),
+        sa.func.coalesce(notas.c.soma, 0),
+        sa.func.coalesce(notas.c.quantidade, 0),
+        notas.c.menor,
+        notas.c.maior
+    ).outerjoin(inscricoes, inscricoes.c.materia_id == m.id)\
+     .outerjoin(notas, notas.c.materia_id == m.id)
+    exclusao = sa.delete(r)
+    if materia_id is not None:
+        stmt = stmt.where(m.id == materia_id)
+        exclusao = exclusao.where(r.materia_id == materia_id)
+    # Substitui as linhas em uma transação: quem lê vê o relatório antigo ou o novo
+    await db.execute(exclusao)
+    resultado = await db.execute(
+        sa.insert(r).from_select(
+            ["materia_id", "total_alunos", "soma_notas", "quantidade_notas", "menor_nota", "maior_nota"], stmt
+        )
+    )
+    await db.commit()
+    return resultado.rowcount
+
+async def _main(materia_id):
+    async with AsyncSessionLocal() as db:
+        linhas = await reconstruir(db, materia_id)
+    await async_engine.dispose()
+    print(f"{linhas} matéria(s) reconstruída(s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--materia", type=int, help="id da matéria (padrão: todas)")
+    asyncio.run(_main(parser.parse_args().materia))
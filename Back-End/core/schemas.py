@@ -1,11 +1,17 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, ClassVar, FrozenSet, Generic, TypeVar
 from datetime import datetime
 
 # Shared
 class Message(BaseModel):
     message: str
 
+T = TypeVar("T")
+
+class Pagina(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None # None quando não há próxima página
+
 # Professores
 class ProfessorBase(BaseModel):
     nome: str
@@ -37,6 +43,15 @@ class AlunoResponse(AlunoBase):
     class Config:
         from_attributes = True
 
+class ErroImportacaoAluno(BaseModel):
+    linha: int # linha do CSV (a 1 é o cabeçalho)
+    erro: str
+
+class ImportacaoAlunosResponse(BaseModel):
+    criados: int
+    inscritos: int # na matéria informada (0 se nenhuma)
+    erros: List[ErroImportacaoAluno]
+
 # Matérias
 class MateriaBase(BaseModel):
     nome: str
@@ -48,19 +63,29 @@ class MateriaBase(BaseModel):
 class MateriaCreate(MateriaBase):
     pass
 
-class MateriaResponse(MateriaBase):
+class MateriaResumo(MateriaBase):
     id: int
     professor_id: int
     created_at: datetime
-    # Relacionamentos
-    professor: Optional[ProfessorResponse] = None # Para incluir dados do professor
-    questoes: List["QuestaoResponse"] = [] # Forward Ref
-    inscricoes: List["InscricaoResponse"] = [] # Forward Ref
-    avaliacoes: List["AvaliacaoResponse"] = [] # Forward Ref
 
     class Config:
         from_attributes = True
 
+class MateriaResponse(MateriaResumo):
+    # Relacionamentos, incluídos apenas quando pedidos via ?expand=
+    EXPANSOES: ClassVar[FrozenSet[str]] = frozenset({"professor", "questoes", "inscricoes", "avaliacoes"})
+    professor: Optional[ProfessorResponse] = None # Para incluir dados do professor
+    questoes: Optional[List["QuestaoResumo"]] = None # Forward Ref
+    inscricoes: Optional[List["InscricaoAlunoResponse"]] = None # Forward Ref (sem a matéria, que é o próprio objeto pai)
+    avaliacoes: Optional[List["AvaliacaoResumo"]] = None # Forward Ref
+
+class MateriaAlunoResponse(MateriaResumo):
+    """Matéria como o aluno inscrito a vê: questões sem o gabarito e sem as inscrições dos colegas."""
+    EXPANSOES: ClassVar[FrozenSet[str]] = frozenset({"professor", "questoes", "avaliacoes"})
+    professor: Optional[ProfessorResponse] = None
+    questoes: Optional[List["QuestaoProva"]] = None # Forward Ref
+    avaliacoes: Optional[List["AvaliacaoResumo"]] = None # Forward Ref
+
 # Inscrições (Relacionamento Aluno-Matéria)
 class InscricaoBase(BaseModel):
     aluno_id: int
@@ -73,7 +98,15 @@ class InscricaoResponse(InscricaoBase):
     id: int
     data_inscricao: datetime
     aluno: Optional[AlunoResponse] = None
-    materia: Optional[MateriaResponse] = None
+    materia: Optional[MateriaResumo] = None
+
+    class Config:
+        from_attributes = True
+
+class InscricaoAlunoResponse(InscricaoBase):
+    id: int
+    data_inscricao: datetime
+    aluno: Optional[AlunoResponse] = None
 
     class Config:
         from_attributes = True
@@ -90,11 +123,26 @@ class QuestaoBase(BaseModel):
 class QuestaoCreate(QuestaoBase):
     pass
 
-class QuestaoResponse(QuestaoBase):
+class QuestaoResumo(QuestaoBase):
     id: int
     created_at: datetime
     # materia: Optional[MateriaResponse] = None # Evitar recursão excessiva
-    respostas_aluno: List["RespostaAlunoResponse"] = [] # Forward Ref
+
+    class Config:
+        from_attributes = True
+
+class QuestaoResponse(QuestaoResumo):
+    EXPANSOES: ClassVar[FrozenSet[str]] = frozenset({"respostas_aluno"})
+    respostas_aluno: Optional[List["RespostaAlunoResponse"]] = None # Forward Ref
+
+class QuestaoProva(BaseModel):
+    """Questão como o aluno a recebe na prova: sem o gabarito."""
+    id: int
+    materia_id: int
+    pergunta: str
+    tipo: Optional[str] = None
+    opcoes: Optional[dict] = None
+    nivel_dificuldade: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -111,33 +159,37 @@ class AvaliacaoBase(BaseModel):
 class AvaliacaoCreate(AvaliacaoBase):
     pass
 
-class AvaliacaoResponse(AvaliacaoBase):
+class AvaliacaoResumo(AvaliacaoBase):
     id: int
     created_at: datetime
     # materia: Optional[MateriaResponse] = None # Evitar recursão excessiva
-    respostas_aluno: List["RespostaAlunoResponse"] = [] # Forward Ref
-    desempenhos: List["DesempenhoResponse"] = [] # Forward Ref
 
     class Config:
         from_attributes = True
 
+class AvaliacaoResponse(AvaliacaoResumo):
+    EXPANSOES: ClassVar[FrozenSet[str]] = frozenset({"respostas_aluno", "desempenhos"})
+    respostas_aluno: Optional[List["RespostaAlunoResponse"]] = None # Forward Ref
+    desempenhos: Optional[List["DesempenhoResponse"]] = None # Forward Ref
+
 # Respostas dos Alunos
 class RespostaAlunoBase(BaseModel):
     aluno_id: int
     questao_id: int
     avaliacao_id: int
     resposta_aluno: str
-    correta: Optional[bool] = False
-    nota: Optional[float] = 0.0
-    feedback_ia: Optional[str] = None
     tempo_resposta: Optional[int] = None # em segundos
 
 class RespostaAlunoCreate(RespostaAlunoBase):
-    pass
+    pass # correta, nota e feedback vêm só da correção, nunca do cliente
 
 class RespostaAlunoResponse(RespostaAlunoBase):
     id: int
+    correta: Optional[bool] = False
+    nota: Optional[float] = 0.0
+    feedback_ia: Optional[str] = None
     created_at: datetime
+    corrigida_em: Optional[datetime] = None
     # aluno: Optional[AlunoResponse] = None # Evitar recursão
     # questao: Optional[QuestaoResponse] = None
     # avaliacao: Optional[AvaliacaoResponse] = None
@@ -145,6 +197,23 @@ class RespostaAlunoResponse(RespostaAlunoBase):
     class Config:
         from_attributes = True
 
+# Envio da avaliação inteira
+class RespostaEnvio(BaseModel):
+    questao_id: int
+    resposta_aluno: str
+    tempo_resposta: Optional[int] = None # em segundos
+
+class SubmissaoAvaliacao(BaseModel):
+    respostas: List[RespostaEnvio]
+
+class ResultadoSubmissao(BaseModel):
+    avaliacao_id: int
+    total_questoes: int
+    acertos: int # entre as já corrigidas
+    nota_final: Optional[float] = None # soma das notas corrigidas / total de questões (0 a 10)
+    pendentes_correcao: int # respostas abertas aguardando a correção por IA
+    respostas: List[RespostaAlunoResponse]
+
 # Desempenho (Resumo por Avaliação)
 class DesempenhoBase(BaseModel):
     aluno_id: int
@@ -170,12 +239,39 @@ class DesempenhoResponse(DesempenhoBase):
 
 # Forward references for relationships to avoid circular imports during definition
 MateriaResponse.model_rebuild()
+MateriaAlunoResponse.model_rebuild()
 QuestaoResponse.model_rebuild()
 AvaliacaoResponse.model_rebuild()
 InscricaoResponse.model_rebuild()
 RespostaAlunoResponse.model_rebuild()
 DesempenhoResponse.model_rebuild()
 
+def expandir(schema, obj, expand: FrozenSet[str] = frozenset()):
+    """Serializa obj no schema incluindo apenas os relacionamentos pedidos em expand.
+
+    Os relacionamentos não pedidos nem são lidos do objeto ORM (logo não disparam lazy loading)
+    e ficam "unset", sendo omitidos pelas rotas declaradas com response_model_exclude_unset=True.
+    """
+    campos = {
+        nome: getattr(obj, nome) for nome in schema.model_fields
+        if nome not in schema.EXPANSOES or nome in expand
+    }
+    return schema.model_validate(campos, from_attributes=True)
+
+# Jobs em segundo plano
+class JobResponse(BaseModel):
+    id: int
+    tipo: str
+    status: str # pendente, executando, concluido, erro
+    resultado: Optional[Any] = None
+    erro: Optional[str] = None
+    created_at: Optional[datetime] = None
+    iniciado_em: Optional[datetime] = None
+    concluido_em: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # JWT
 class Token(BaseModel):
     access_token: str
@@ -184,6 +280,7 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
     user_type: Optional[str] = None # 'aluno' ou 'professor'
+    id: Optional[int] = None # id do professor/aluno
 
 # Report Schemas
 class RelatorioGeralTurma(BaseModel):
@@ -206,3 +303,22 @@ class DesempenhoIndividualAluno(BaseModel):
 
     class Config:
         from_attributes = True
+
+class AnaliseItem(BaseModel):
+    questao_id: int
+    pergunta: str
+    tipo: Optional[str] = None
+    resposta_correta: str
+    respostas: int
+    corrigidas: int # as abertas ainda sem correção não entram nos índices
+    indice_dificuldade: Optional[float] = None # proporção média de acerto (0 a 1; maior = mais fácil)
+    discriminacao: Optional[float] = None # ponto-bisserial entre o item e o restante da prova
+    tempo_medio: Optional[float] = None # em segundos
+    alternativas: Optional[Dict[str, int]] = None # múltipla escolha: respostas por alternativa
+    outras_respostas: Optional[int] = None # múltipla escolha: respostas fora das alternativas
+
+class AnaliseItensAvaliacao(BaseModel):
+    avaliacao_id: int
+    alunos: int
+    respostas: int
+    itens: List[AnaliseItem]
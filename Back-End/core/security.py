@@ -1,4 +1,8 @@
 import os
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
@@ -6,11 +10,85 @@ from jose import JWTError, jwt
 from pydantic import BaseModel
 from typing import Optional
 
+from .config import BCRYPT_ROUNDS, HASH_WORKERS, HASH_FILA_MAXIMA
+
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
 # --- Configuração de Senha ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Com "rounds" fixo, hashes gerados com outro custo são marcados para atualização (verify_and_update)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class PoolHashCheio(Exception):
+    """A fila do pool de hash atingiu o limite; a requisição deve ser recusada (503)."""
+
+class PoolHash:
+    """Executa o bcrypt em threads dedicadas, fora do event loop, com fila de espera limitada.
+
+    O bcrypt libera o GIL, então as threads calculam hashes em paralelo enquanto o event loop
+    continua atendendo outras requisições. Quando há mais de workers + fila_maxima tarefas
+    pendentes, novas submissões falham imediatamente com PoolHashCheio.
+    """
+
+    def __init__(self, workers: int, fila_maxima: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._vagas = threading.BoundedSemaphore(workers + fila_maxima)
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.fila_maxima = fila_maxima
+        self.pendentes = 0
+        self.concluidas = 0
+        self.rejeitadas = 0
+        self.tempo_espera_total = 0.0 # segundos na fila
+        self.tempo_execucao_total = 0.0 # segundos calculando hashes
+
+    def submeter(self, fn, *args):
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self.rejeitadas += 1
+            raise PoolHashCheio()
+        with self._lock:
+            self.pendentes += 1
+        enfileirada_em = time.perf_counter()
+
+        def tarefa():
+            inicio = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                fim = time.perf_counter()
+                with self._lock:
+                    self.pendentes -= 1
+                    self.concluidas += 1
+                    self.tempo_espera_total += inicio - enfileirada_em
+                    self.tempo_execucao_total += fim - inicio
+                self._vagas.release()
+
+        try:
+            return self._executor.submit(tarefa)
+        except BaseException:
+            with self._lock:
+                self.pendentes -= 1
+            self._vagas.release()
+            raise
+
+    async def executar_async(self, fn, *args):
+        """Executa no pool sem bloquear o event loop."""
+        return await asyncio.wrap_future(self.submeter(fn, *args))
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "fila_maxima": self.fila_maxima,
+                "pendentes": self.pendentes,
+                "concluidas": self.concluidas,
+                "rejeitadas": self.rejeitadas,
+                "tempo_espera_total": self.tempo_espera_total,
+                "tempo_execucao_total": self.tempo_execucao_total,
+            }
+
+pool_hash = PoolHash(HASH_WORKERS, HASH_FILA_MAXIMA)
 
 # --- Configuração do JWT ---
 SECRET_KEY = os.getenv("SECRET_KEY")  # Carrega a chave secreta do ambiente
@@ -20,13 +98,28 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 class TokenData(BaseModel):
     email: Optional[str] = None
 
-def verify_password(plain_password, hashed_password):
-    """Verifica se a senha fornecida corresponde ao hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+async def get_password_hash_async(password):
+    """Gera o hash da senha no pool de hash, sem bloquear o event loop."""
+    return await pool_hash.executar_async(pwd_context.hash, password)
+
+async def get_password_hashes_async(passwords):
+    """Hashes de várias senhas (importação em lote), em paralelo no pool de hash.
+
+    No máximo pool_hash.workers hashes do lote ficam no pool ao mesmo tempo, então os logins
+    concorrentes esperam por poucas tarefas do lote e a fila limitada não é estourada.
+    """
+    vagas = asyncio.Semaphore(pool_hash.workers)
+    async def gerar(password):
+        async with vagas:
+            return await pool_hash.executar_async(pwd_context.hash, password)
+    return await asyncio.gather(*(gerar(password) for password in passwords))
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """Verifica a senha e, se o hash usa um custo diferente de BCRYPT_ROUNDS, devolve um novo hash.
 
-def get_password_hash(password):
-    """Gera o hash de uma senha."""
-    return pwd_context.hash(password)
+    Retorna (valida, novo_hash), com novo_hash None quando o hash atual não precisa ser refeito.
+    """
+    return await pool_hash.executar_async(pwd_context.verify_and_update, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Cria um token de acesso JWT."""
@@ -1,52 +1,79 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, UploadFile, File, status
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import List, Annotated, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Annotated, Literal, Optional, Union
 from datetime import timedelta
+from contextlib import asynccontextmanager
+from decimal import Decimal
+import hashlib
+import hmac
 
-from . import models, schemas, crud, security
-from .database import SessionLocal, engine
+from core import models, schemas, crud, security, cache, jobs, correcao, metricas, provas, importacao, exportacao, analise
+from core.paginacao import ParametrosPagina, parametros_pagina, montar_pagina, montar_pagina_json
+from core.database import async_engine, get_db, get_db_escrita
+from core.config import QUESTOES_LOTE_MAXIMO, METRICAS_ATIVAS, METRICAS_TOKEN
 
 # models.Base.metadata.create_all(bind=engine) # Removido, pois estamos usando Alembic para migrações
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Workers da fila de jobs (geração e correção por IA) e retomada dos jobs pendentes
+    await jobs.fila.iniciar()
+    yield
+    await jobs.fila.parar()
+
+app = FastAPI(lifespan=lifespan)
+
+if METRICAS_ATIVAS:
+    # Consultas, tempo de banco, do endpoint e da serialização por requisição (Server-Timing e /metrics)
+    app.router.route_class = metricas.RotaMedida
+    app.add_middleware(metricas.MiddlewareMetricas)
+    metricas.instrumentar(async_engine.sync_engine)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Dependency to get a DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@app.exception_handler(security.PoolHashCheio)
+async def pool_hash_cheio_handler(request: Request, exc: security.PoolHashCheio):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Servidor ocupado, tente novamente em instantes"},
+        headers={"Retry-After": "1"},
+    )
 
 # --- Autenticação e Autorização ---
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+async def get_token_data(token: Annotated[str, Depends(oauth2_scheme)]):
     try:
         payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM])
         email: str = payload.get("sub")
         user_type: str = payload.get("user_type") # Get user_type from token
-        if email is None or user_type is None:
+        if email is None or user_type not in ("professor", "aluno"):
             raise credentials_exception
-        token_data = schemas.TokenData(email=email, user_type=user_type) # Use schemas.TokenData
+        # "id" não existe em tokens emitidos antes de o claim ser adicionado
+        return schemas.TokenData(email=email, user_type=user_type, id=payload.get("id"))
     except security.JWTError:
         raise credentials_exception
 
+async def get_current_user(token_data: Annotated[schemas.TokenData, Depends(get_token_data)], db: AsyncSession = Depends(get_db)):
+    # Usuário em cache: reanexa à sessão sem consultar o banco
+    cached = cache.principais.get(token_data.user_type, token_data.email)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+
     if token_data.user_type == "professor":
-        user = crud.get_professor_by_email(db, email=token_data.email)
-    elif token_data.user_type == "aluno":
-        user = crud.get_aluno_by_email(db, email=token_data.email)
+        user = await crud.get_professor_by_email(db, email=token_data.email)
     else:
-        raise credentials_exception # Invalid user_type
-    
+        user = await crud.get_aluno_by_email(db, email=token_data.email)
+
     if user is None:
         raise credentials_exception # User not found
+    cache.principais.set(token_data.user_type, token_data.email, user)
     return user
 
 async def get_current_professor(current_user: Annotated[models.Professor, Depends(get_current_user)]):
@@ -59,25 +86,100 @@ async def get_current_aluno(current_user: Annotated[models.Aluno, Depends(get_cu
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas alunos podem acessar este recurso")
     return current_user
 
+# Para os endpoints que só precisam do id do usuário: lido direto do token, sem acessar o banco
+async def get_current_user_id(token_data: Annotated[schemas.TokenData, Depends(get_token_data)], db: AsyncSession = Depends(get_db)):
+    if token_data.id is None:
+        return (await get_current_user(token_data, db)).id
+    return token_data.id
+
+async def get_current_professor_id(
+    token_data: Annotated[schemas.TokenData, Depends(get_token_data)],
+    user_id: Annotated[int, Depends(get_current_user_id)]
+):
+    if token_data.user_type != "professor":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas professores podem acessar este recurso")
+    return user_id
+
+async def get_current_aluno_id(
+    token_data: Annotated[schemas.TokenData, Depends(get_token_data)],
+    user_id: Annotated[int, Depends(get_current_user_id)]
+):
+    if token_data.user_type != "aluno":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Apenas alunos podem acessar este recurso")
+    return user_id
+
+def parametro_expand(schema):
+    """Cria a dependência que lê ?expand=a,b e valida os nomes contra os relacionamentos do schema."""
+    def _expand(expand: Optional[str] = Query(None, description=f"Relacionamentos a incluir: {', '.join(sorted(schema.EXPANSOES))}")):
+        if not expand:
+            return frozenset()
+        pedidos = frozenset(nome.strip() for nome in expand.split(",") if nome.strip())
+        invalidos = pedidos - schema.EXPANSOES
+        if invalidos:
+            raise HTTPException(status_code=400, detail=f"Expansão inválida: {', '.join(sorted(invalidos))}")
+        return pedidos
+    return _expand
+
+async def verificar_dono_materia(db: AsyncSession, materia_id: int, professor_id: int, detalhe: str):
+    """Uma consulta indexada pela chave primária: 404 se a matéria não existe, 403 se não é do professor."""
+    dono = await crud.get_materia_professor_id(db, materia_id)
+    if dono is None:
+        raise HTTPException(status_code=404, detail="Matéria não encontrada")
+    if dono != professor_id:
+        raise HTTPException(status_code=403, detail=detalhe)
+
+async def verificar_acesso_avaliacao(db: AsyncSession, avaliacao_id: int, user_type: str, user_id: int, detalhe: str):
+    """Uma consulta: 404 se a avaliação não existe, 403 sem acesso; retorna (materia_id, quantidade_questoes)."""
+    acesso = await crud.get_acesso_avaliacao(db, avaliacao_id, user_type, user_id)
+    if acesso is None:
+        raise HTTPException(status_code=404, detail="Avaliação não encontrada")
+    if not acesso.permitido:
+        raise HTTPException(status_code=403, detail=detalhe)
+    return acesso
+
+async def verificar_questoes_da_prova(db: AsyncSession, avaliacao_id: int, aluno_id: int, acesso, questao_ids):
+    """400 se alguma questão não está entre as sorteadas para o aluno (a prova é sorteada agora se ele
+    ainda não a abriu: a semente é fixa, então é o mesmo conjunto que ele receberia)."""
+    sorteadas = await provas.questoes_sorteadas(
+        db, db, avaliacao_id, aluno_id, acesso.materia_id, acesso.quantidade_questoes
+    )
+    if not set(questao_ids) <= set(sorteadas):
+        raise HTTPException(status_code=400, detail="Há questões que não pertencem a esta avaliação")
+
+def resposta_com_etag(request: Request, corpo: bytes) -> Response:
+    """Resposta JSON já serializada com ETag; 304 sem corpo se o cliente enviou o mesmo ETag em If-None-Match."""
+    etag = f'"{hashlib.blake2b(corpo, digest_size=16).hexdigest()}"'
+    # no-cache: o cliente pode guardar, mas revalida a cada abertura (o acesso é conferido sempre)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    enviados = {valor.strip().removeprefix("W/") for valor in request.headers.get("if-none-match", "").split(",")}
+    if etag in enviados or "*" in enviados:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(corpo, media_type="application/json", headers=headers)
+
 # --- Endpoints de Autenticação ---
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
-    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)
 ):
-    user = crud.get_professor_by_email(db, email=form_data.username)
+    user = await crud.get_professor_by_email(db, email=form_data.username)
     user_type = "professor"
     if not user:
-        user = crud.get_aluno_by_email(db, email=form_data.username)
+        user = await crud.get_aluno_by_email(db, email=form_data.username)
         user_type = "aluno"
         if not user:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email ou senha incorretos")
 
-    if not security.verify_password(form_data.password, user.senha_hash):
+    senha_valida, novo_hash = await security.verify_and_update_password(form_data.password, user.senha_hash)
+    if not senha_valida:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email ou senha incorretos")
+    if novo_hash:
+        # O custo do bcrypt mudou desde que a senha foi gravada: regrava com o custo atual
+        await crud.update_senha_hash(db, user, novo_hash)
+        cache.principais.invalidar(user_type, user.email)
     
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        data={"sub": user.email, "user_type": user_type}, expires_delta=access_token_expires
+        data={"sub": user.email, "user_type": user_type, "id": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -86,246 +188,456 @@ async def read_users_me(current_user: Annotated[Union[models.Professor, models.A
     return current_user
 
 @app.post("/professores/register", response_model=schemas.ProfessorResponse)
-def register_professor(professor: schemas.ProfessorCreate, db: Session = Depends(get_db)):
-    db_professor = crud.get_professor_by_email(db, email=professor.email)
+async def register_professor(professor: schemas.ProfessorCreate, db: AsyncSession = Depends(get_db)):
+    db_professor = await crud.get_professor_by_email(db, email=professor.email)
     if db_professor:
         raise HTTPException(status_code=400, detail="Email já registrado")
-    return crud.create_professor(db=db, professor=professor)
+    db_professor = await crud.create_professor(db=db, professor=professor)
+    cache.principais.invalidar("professor", db_professor.email)
+    return db_professor
 
 @app.post("/alunos/register", response_model=schemas.AlunoResponse)
-def register_aluno(aluno: schemas.AlunoCreate, db: Session = Depends(get_db)):
-    db_aluno = crud.get_aluno_by_email(db, email=aluno.email)
+async def register_aluno(aluno: schemas.AlunoCreate, db: AsyncSession = Depends(get_db)):
+    db_aluno = await crud.get_aluno_by_email(db, email=aluno.email)
     if db_aluno:
         raise HTTPException(status_code=400, detail="Email já registrado")
-    db_aluno = crud.get_aluno_by_ra(db, ra=aluno.ra)
+    db_aluno = await crud.get_aluno_by_ra(db, ra=aluno.ra)
     if db_aluno:
         raise HTTPException(status_code=400, detail="RA já registrado")
-    return crud.create_aluno(db=db, aluno=aluno)
+    db_aluno = await crud.create_aluno(db=db, aluno=aluno)
+    cache.principais.invalidar("aluno", db_aluno.email)
+    return db_aluno
+
+@app.post("/alunos/importar", response_model=schemas.ImportacaoAlunosResponse)
+async def importar_alunos(
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    arquivo: UploadFile = File(..., description="CSV com as colunas ra, nome, email e senha"),
+    materia_id: Optional[int] = Query(None, description="Inscreve os alunos importados nesta matéria"),
+    db: AsyncSession = Depends(get_db)
+):
+    if materia_id is not None:
+        await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para inscrever alunos nesta matéria")
+    try:
+        resultado = await importacao.importar_alunos(db, await arquivo.read(), materia_id=materia_id)
+    except importacao.ArquivoInvalido as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if resultado is None:
+        raise HTTPException(status_code=409, detail="Alguns alunos foram cadastrados durante a importação; envie o arquivo novamente")
+    return resultado
 
 # --- Endpoints para Professores ---
-@app.post("/materias/", response_model=schemas.MateriaResponse)
-def create_materia_for_professor(
+@app.post("/materias/", response_model=schemas.MateriaResponse, response_model_exclude_unset=True)
+async def create_materia_for_professor(
     materia: schemas.MateriaCreate,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.create_materia(db=db, materia=materia, professor_id=current_professor.id)
+    if await crud.get_materia_by_senha_acesso(db, senha_acesso=materia.senha_acesso):
+        raise HTTPException(status_code=400, detail="Senha de acesso já usada por outra matéria")
+    db_materia = await crud.create_materia(db=db, materia=materia, professor_id=professor_id)
+    return schemas.expandir(schemas.MateriaResponse, db_materia)
 
-@app.get("/professores/me/materias", response_model=List[schemas.MateriaResponse])
-def get_my_materias(
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+@app.get("/professores/me/materias", response_model=schemas.Pagina[schemas.MateriaResponse], response_model_exclude_unset=True)
+async def get_my_materias(
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    expand: Annotated[frozenset, Depends(parametro_expand(schemas.MateriaResponse))],
+    pagina: Annotated[ParametrosPagina, Depends(parametros_pagina)],
+    db: AsyncSession = Depends(get_db)
 ):
-    return crud.get_materias_by_professor(db=db, professor_id=current_professor.id)
+    materias = await crud.get_materias_by_professor(
+        db=db, professor_id=professor_id, expand=expand,
+        apos=pagina.chave(int), limite=pagina.limite_consulta
+    )
+    return montar_pagina(
+        materias, pagina, chave=lambda materia: (materia.id,),
+        serializar=lambda materia: schemas.expandir(schemas.MateriaResponse, materia, expand)
+    )
 
-@app.get("/materias/{materia_id}", response_model=schemas.MateriaResponse)
-def get_materia(materia_id: int, db: Session = Depends(get_db)):
-    db_materia = crud.get_materia_by_id(db, materia_id=materia_id)
+@app.get(
+    "/materias/{materia_id}",
+    response_model=Union[schemas.MateriaResponse, schemas.MateriaAlunoResponse], response_model_exclude_unset=True
+)
+async def get_materia(
+    materia_id: int,
+    token_data: Annotated[schemas.TokenData, Depends(get_token_data)],
+    user_id: Annotated[int, Depends(get_current_user_id)],
+    expand: Annotated[frozenset, Depends(parametro_expand(schemas.MateriaResponse))],
+    db: AsyncSession = Depends(get_db)
+):
+    # O aluno não vê o gabarito nem os colegas inscritos
+    schema = schemas.MateriaResponse if token_data.user_type == "professor" else schemas.MateriaAlunoResponse
+    if expand - schema.EXPANSOES:
+        raise HTTPException(status_code=403, detail=f"Alunos não podem expandir: {', '.join(sorted(expand - schema.EXPANSOES))}")
+    db_materia = await crud.get_materia_by_id(db, materia_id=materia_id, expand=expand)
     if db_materia is None:
         raise HTTPException(status_code=404, detail="Matéria não encontrada")
-    return db_materia
+    if token_data.user_type == "professor":
+        if db_materia.professor_id != user_id:
+            raise HTTPException(status_code=403, detail="Você não tem permissão para ver esta matéria")
+    elif await crud.get_inscricao(db, aluno_id=user_id, materia_id=materia_id) is None:
+        raise HTTPException(status_code=403, detail="Você não está inscrito nesta matéria")
+    return schemas.expandir(schema, db_materia, expand)
 
-@app.put("/materias/{materia_id}", response_model=schemas.MateriaResponse)
-def update_materia(
+@app.put("/materias/{materia_id}", response_model=schemas.MateriaResponse, response_model_exclude_unset=True)
+async def update_materia(
     materia_id: int,
     materia_update: schemas.MateriaCreate,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_id(db, materia_id=materia_id)
+    outra = await crud.get_materia_by_senha_acesso(db, senha_acesso=materia_update.senha_acesso)
+    if outra is not None and outra.id != materia_id:
+        raise HTTPException(status_code=400, detail="Senha de acesso já usada por outra matéria")
+    db_materia = await crud.update_materia(
+        db=db, materia_id=materia_id, professor_id=professor_id, materia_update=materia_update
+    )
     if db_materia is None:
-        raise HTTPException(status_code=404, detail="Matéria não encontrada")
-    if db_materia.professor_id != current_professor.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para editar esta matéria")
-    return crud.update_materia(db=db, materia_id=materia_id, materia_update=materia_update)
+        # Nenhuma linha alterada: descobre se a matéria não existe ou é de outro professor
+        await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para editar esta matéria")
+    # A tabela já foi limpa em crud.update_materia; aqui, a camada em memória
+    cache.questoes.invalidar_materia(materia_id, cache.chave_conteudo(db_materia.texto_base))
+    return schemas.expandir(schemas.MateriaResponse, db_materia)
 
 @app.delete("/materias/{materia_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_materia(
+async def delete_materia(
     materia_id: int,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_id(db, materia_id=materia_id)
-    if db_materia is None:
-        raise HTTPException(status_code=404, detail="Matéria não encontrada")
-    if db_materia.professor_id != current_professor.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para deletar esta matéria")
-    crud.delete_materia(db=db, materia_id=materia_id)
+    if not await crud.delete_materia(db=db, materia_id=materia_id, professor_id=professor_id):
+        await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para deletar esta matéria")
+    cache.banco_questoes.invalidar(materia_id)
     return
 
-@app.get("/materias/{materia_id}/alunos", response_model=List[schemas.AlunoResponse])
-def get_alunos_matriculados_em_materia(
+@app.get("/materias/{materia_id}/alunos", response_model=schemas.Pagina[schemas.AlunoResponse])
+async def get_alunos_matriculados_em_materia(
     materia_id: int,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    pagina: Annotated[ParametrosPagina, Depends(parametros_pagina)],
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_id(db, materia_id=materia_id)
-    if db_materia is None:
-        raise HTTPException(status_code=404, detail="Matéria não encontrada")
-    if db_materia.professor_id != current_professor.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para ver os alunos desta matéria")
-    
-    inscricoes = crud.get_inscricoes_by_materia(db, materia_id=materia_id)
-    # Explicitly convert SQLAlchemy Aluno models to schemas.AlunoResponse
-    alunos = [schemas.AlunoResponse.model_validate(inscricao.aluno) for inscricao in inscricoes]
-    return alunos
+    # A posse da matéria é verificada na própria consulta; a lista vazia pode ser falta de permissão
+    inscricoes = await crud.get_inscricoes_by_materia(
+        db, materia_id=materia_id, professor_id=professor_id, apos=pagina.chave(int), limite=pagina.limite_consulta
+    )
+    if not inscricoes:
+        await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para ver os alunos desta matéria")
+    # O cursor segue a ordem das inscrições; cada item é o aluno inscrito
+    return montar_pagina(
+        inscricoes, pagina, chave=lambda inscricao: (inscricao.id,),
+        serializar=lambda inscricao: schemas.AlunoResponse.model_validate(inscricao.aluno)
+    )
+
+@app.post("/materias/{materia_id}/questoes/bulk", response_model=List[schemas.QuestaoResponse], response_model_exclude_unset=True)
+async def create_questoes_bulk(
+    materia_id: int,
+    questoes: List[schemas.QuestaoCreate],
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
+):
+    if len(questoes) > QUESTOES_LOTE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Máximo de {QUESTOES_LOTE_MAXIMO} questões por importação")
+    if any(questao.materia_id != materia_id for questao in questoes):
+        raise HTTPException(status_code=400, detail="Todas as questões devem pertencer à matéria informada")
+    await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para adicionar questões a esta matéria")
+    db_questoes = await crud.create_questoes_bulk(db, questoes=questoes)
+    cache.banco_questoes.invalidar(materia_id)
+    return [schemas.expandir(schemas.QuestaoResponse, questao) for questao in db_questoes]
 
 # --- Endpoints para Alunos ---
 @app.post("/materias/join", response_model=schemas.InscricaoResponse)
-def join_materia(
+async def join_materia(
     senha_acesso: str,
-    current_aluno: Annotated[models.Aluno, Depends(get_current_aluno)],
-    db: Session = Depends(get_db)
+    aluno_id: Annotated[int, Depends(get_current_aluno_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_senha_acesso(db, senha_acesso=senha_acesso)
+    db_materia = await crud.get_materia_by_senha_acesso(db, senha_acesso=senha_acesso)
     if db_materia is None:
         raise HTTPException(status_code=404, detail="Matéria não encontrada ou senha de acesso incorreta")
     
-    if crud.get_inscricao(db, aluno_id=current_aluno.id, materia_id=db_materia.id):
-        raise HTTPException(status_code=409, detail="Aluno já inscrito nesta matéria")
-    
-    inscricao = crud.create_inscricao(db=db, aluno_id=current_aluno.id, materia_id=db_materia.id)
+    # A restrição única (aluno_id, materia_id) detecta a inscrição repetida, sem consulta prévia
+    inscricao = await crud.create_inscricao(db=db, aluno_id=aluno_id, materia_id=db_materia.id)
     if inscricao is None:
-         raise HTTPException(status_code=500, detail="Erro ao realizar inscrição na matéria")
+        raise HTTPException(status_code=409, detail="Aluno já inscrito nesta matéria")
     return inscricao
 
-@app.get("/alunos/me/materias", response_model=List[schemas.MateriaResponse])
-def get_my_enrolled_materias(
-    current_aluno: Annotated[models.Aluno, Depends(get_current_aluno)],
-    db: Session = Depends(get_db)
+@app.get("/alunos/me/materias", response_model=schemas.Pagina[schemas.MateriaAlunoResponse], response_model_exclude_unset=True)
+async def get_my_enrolled_materias(
+    aluno_id: Annotated[int, Depends(get_current_aluno_id)],
+    expand: Annotated[frozenset, Depends(parametro_expand(schemas.MateriaAlunoResponse))],
+    pagina: Annotated[ParametrosPagina, Depends(parametros_pagina)],
+    db: AsyncSession = Depends(get_db)
 ):
-    inscricoes = crud.get_inscricoes_by_aluno(db, aluno_id=current_aluno.id)
-    # Explicitly convert SQLAlchemy Materia models to schemas.MateriaResponse
-    materias_inscritas = [schemas.MateriaResponse.model_validate(inscricao.materia) for inscricao in inscricoes]
-    return materias_inscritas
+    materias = await crud.get_materias_by_aluno(
+        db=db, aluno_id=aluno_id, expand=expand,
+        apos=pagina.chave(int), limite=pagina.limite_consulta
+    )
+    return montar_pagina(
+        materias, pagina, chave=lambda materia: (materia.id,),
+        serializar=lambda materia: schemas.expandir(schemas.MateriaAlunoResponse, materia, expand)
+    )
 
-# --- Placeholder para IA (Gerar e Corrigir Questões) ---
-@app.post("/ai/generate_questoes/{materia_id}", response_model=List[schemas.QuestaoResponse])
+# --- IA (Gerar e Corrigir Questões) ---
+@app.post("/ai/generate_questoes/{materia_id}", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def generate_questoes_ai(
     materia_id: int,
-    num_questoes: int = 5,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    num_questoes: int = Query(5, ge=1, le=QUESTOES_LOTE_MAXIMO),
+    nivel_dificuldade: str = "medio",
+    regenerar: bool = Query(False, description="Gera de novo, ignorando as questões já geradas para este texto"),
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_id(db, materia_id=materia_id)
-    if not db_materia:
-        raise HTTPException(status_code=404, detail="Matéria não encontrada")
-    if db_materia.professor_id != current_professor.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para gerar questões para esta matéria")
-    
-    # Lógica para chamar a IA para gerar questões baseadas em db_materia.texto_base
-    # Placeholder: Retorna algumas questões de exemplo
-    questoes_geradas = []
-    for i in range(num_questoes):
-        questao_data = schemas.QuestaoCreate(
-            materia_id=materia_id,
-            pergunta=f"Questão {i+1} gerada pela IA sobre {db_materia.nome}?",
-            tipo="multipla_escolha",
-            opcoes={"A": "Opção A", "B": "Opção B", "C": "Opção C", "D": "Opção D"},
-            resposta_correta="A",
-            nivel_dificuldade="medio"
-        )
-        db_questao = crud.create_questao(db, questao=questao_data)
-        questoes_geradas.append(db_questao)
-    return questoes_geradas
+    await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para gerar questões para esta matéria")
+    # A geração roda na fila de jobs; o andamento e as questões criadas ficam em /jobs/{id}
+    return await jobs.fila.enfileirar(
+        db, "gerar_questoes",
+        {"materia_id": materia_id, "num_questoes": num_questoes, "nivel_dificuldade": nivel_dificuldade,
+         "regenerar": regenerar},
+        user_type="professor", user_id=professor_id
+    )
 
-@app.post("/ai/correct_resposta/{resposta_id}", response_model=schemas.RespostaAlunoResponse)
+@app.post("/ai/correct_resposta/{resposta_id}", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def correct_resposta_ai(
     resposta_id: int,
-    current_aluno: Annotated[models.Aluno, Depends(get_current_aluno)],
-    db: Session = Depends(get_db)
+    aluno_id: Annotated[int, Depends(get_current_aluno_id)],
+    db: AsyncSession = Depends(get_db)
+):
+    db_resposta = await crud.get_resposta_by_id(db, resposta_id=resposta_id)
+    if db_resposta is None:
+        raise HTTPException(status_code=404, detail="Resposta não encontrada")
+    if db_resposta.aluno_id != aluno_id:
+        raise HTTPException(status_code=403, detail="Você não pode corrigir respostas de outro aluno")
+    return await jobs.fila.enfileirar(
+        db, "corrigir_resposta", {"resposta_id": resposta_id}, user_type="aluno", user_id=aluno_id
+    )
+
+@app.post("/avaliacoes/{avaliacao_id}/corrigir", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def corrigir_avaliacao(
+    avaliacao_id: int,
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    # Lógica para chamar a IA para corrigir a resposta
-    # Placeholder: Marca como correta e adiciona feedback
-    # TODO: Implementar lógica de correção da IA real
-    pass # Remova este pass e adicione a implementação real aqui
+    await verificar_acesso_avaliacao(db, avaliacao_id, "professor", professor_id, "Você não tem permissão para corrigir esta avaliação")
+    # Corrige todas as respostas pendentes da avaliação de uma vez (ver core/correcao.py)
+    return await jobs.fila.enfileirar(
+        db, "corrigir_avaliacao", {"avaliacao_id": avaliacao_id}, user_type="professor", user_id=professor_id
+    )
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobResponse)
+async def get_job(
+    job_id: int,
+    token_data: Annotated[schemas.TokenData, Depends(get_token_data)],
+    user_id: Annotated[int, Depends(get_current_user_id)],
+    db: AsyncSession = Depends(get_db)
+):
+    # Jobs de outros usuários também respondem 404, sem revelar que existem
+    db_job = await crud.get_job(db, job_id=job_id, user_type=token_data.user_type, user_id=user_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return db_job
 
 # --- Endpoints para Avaliações e Respostas ---
-@app.post("/avaliacoes/", response_model=schemas.AvaliacaoResponse)
-def create_avaliacao(
+@app.post("/avaliacoes/", response_model=schemas.AvaliacaoResponse, response_model_exclude_unset=True)
+async def create_avaliacao(
     avaliacao: schemas.AvaliacaoCreate,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_id(db, materia_id=avaliacao.materia_id)
-    if not db_materia or db_materia.professor_id != current_professor.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para criar avaliações para esta matéria")
-    return crud.create_avaliacao(db=db, avaliacao=avaliacao)
+    await verificar_dono_materia(db, avaliacao.materia_id, professor_id, "Você não tem permissão para criar avaliações para esta matéria")
+    db_avaliacao = await crud.create_avaliacao(db=db, avaliacao=avaliacao)
+    return schemas.expandir(schemas.AvaliacaoResponse, db_avaliacao)
 
-@app.get("/avaliacoes/{avaliacao_id}/questoes", response_model=List[schemas.QuestaoResponse])
-def get_questoes_for_avaliacao(
+@app.get(
+    "/avaliacoes/{avaliacao_id}/questoes",
+    response_model=schemas.Pagina[Union[schemas.QuestaoResponse, schemas.QuestaoProva]], response_model_exclude_unset=True,
+    responses={304: {"description": "A prova do aluno não mudou desde o ETag enviado em If-None-Match"}},
+)
+async def get_questoes_for_avaliacao(
     avaliacao_id: int,
-    current_user: Annotated[Union[models.Professor, models.Aluno], Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    request: Request,
+    token_data: Annotated[schemas.TokenData, Depends(get_token_data)],
+    user_id: Annotated[int, Depends(get_current_user_id)],
+    expand: Annotated[frozenset, Depends(parametro_expand(schemas.QuestaoResponse))],
+    pagina: Annotated[ParametrosPagina, Depends(parametros_pagina)],
+    db: AsyncSession = Depends(get_db),
+    db_escrita: AsyncSession = Depends(get_db_escrita)
 ):
-    db_avaliacao = crud.get_avaliacao_by_id(db, avaliacao_id=avaliacao_id)
-    if not db_avaliacao:
-        raise HTTPException(status_code=404, detail="Avaliação não encontrada")
-    
     # Verificar se o usuário tem permissão (professor da matéria ou aluno inscrito)
-    if isinstance(current_user, models.Professor) and db_avaliacao.materia.professor_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para ver estas questões")
-    
-    if isinstance(current_user, models.Aluno) and not crud.get_inscricao(db, aluno_id=current_user.id, materia_id=db_avaliacao.materia_id):
-        raise HTTPException(status_code=403, detail="Você não está inscrito nesta matéria para ver esta avaliação")
-    
-    return crud.get_questoes_by_materia(db, materia_id=db_avaliacao.materia_id)
+    acesso = await verificar_acesso_avaliacao(
+        db, avaliacao_id, token_data.user_type, user_id,
+        "Você não tem permissão para ver estas questões" if token_data.user_type == "professor"
+        else "Você não está inscrito nesta matéria para ver esta avaliação"
+    )
+
+    if token_data.user_type == "aluno":
+        # As respostas de todos os alunos só podem ser expandidas pelo professor
+        if expand:
+            raise HTTPException(status_code=403, detail="Apenas professores podem expandir as respostas das questões")
+        # A prova do aluno: quantidade_questoes questões sorteadas, na ordem dele, sem o gabarito
+        # e já serializadas (core/provas.py). O cursor é a posição da última questão entregue.
+        questoes = await provas.questoes_da_prova(
+            db, db_escrita, avaliacao_id, user_id, acesso.materia_id, acesso.quantidade_questoes
+        )
+        inicio = max(pagina.chave(int) or 0, 0)
+        return resposta_com_etag(request, montar_pagina_json(
+            enumerate(questoes[inicio:inicio + pagina.limite_consulta], start=inicio + 1), pagina,
+            chave=lambda linha: (linha[0],), serializar=lambda linha: linha[1]
+        ))
+
+    # O professor vê o banco de questões completo da matéria
+    questoes = await crud.get_questoes_by_materia(
+        db, materia_id=acesso.materia_id, expand=expand,
+        apos=pagina.chave(int), limite=pagina.limite_consulta
+    )
+    return montar_pagina(
+        questoes, pagina, chave=lambda questao: (questao.id,),
+        serializar=lambda questao: schemas.expandir(schemas.QuestaoResponse, questao, expand)
+    )
 
 @app.post("/avaliacoes/{avaliacao_id}/submit_resposta", response_model=schemas.RespostaAlunoResponse)
-def submit_resposta_avaliacao(
+async def submit_resposta_avaliacao(
     avaliacao_id: int,
     resposta: schemas.RespostaAlunoCreate,
-    current_aluno: Annotated[models.Aluno, Depends(get_current_aluno)],
-    db: Session = Depends(get_db)
+    aluno_id: Annotated[int, Depends(get_current_aluno_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    if resposta.aluno_id != current_aluno.id:
+    if resposta.aluno_id != aluno_id:
         raise HTTPException(status_code=403, detail="Você não pode submeter respostas por outro aluno")
+    if resposta.avaliacao_id != avaliacao_id:
+        raise HTTPException(status_code=400, detail="A resposta não pertence a esta avaliação")
     
-    db_avaliacao = crud.get_avaliacao_by_id(db, avaliacao_id=avaliacao_id)
-    if not db_avaliacao:
-        raise HTTPException(status_code=404, detail="Avaliação não encontrada")
-
-    if not crud.get_inscricao(db, aluno_id=current_aluno.id, materia_id=db_avaliacao.materia_id):
-        raise HTTPException(status_code=403, detail="Você não está inscrito nesta matéria")
+    acesso = await verificar_acesso_avaliacao(db, avaliacao_id, "aluno", aluno_id, "Você não está inscrito nesta matéria")
+    await verificar_questoes_da_prova(db, avaliacao_id, aluno_id, acesso, [resposta.questao_id])
     
-    # Placeholder para IA de correção
-    # A IA corrigiria a resposta e preencheria 'correta', 'nota', 'feedback_ia'
-    # Por enquanto, apenas cria a resposta com valores padrão
-    db_resposta = crud.create_resposta_aluno(db=db, resposta=resposta)
+    # A resposta fica pendente de correção (POST /ai/correct_resposta ou /avaliacoes/{id}/corrigir)
+    db_resposta = await crud.create_resposta_aluno(db=db, resposta=resposta, materia_id=acesso.materia_id)
+    if db_resposta is None:
+        raise HTTPException(status_code=409, detail="Você já respondeu esta questão nesta avaliação")
     return db_resposta
 
+@app.post("/avaliacoes/{avaliacao_id}/submit", response_model=schemas.ResultadoSubmissao)
+async def submit_avaliacao(
+    avaliacao_id: int,
+    submissao: schemas.SubmissaoAvaliacao,
+    aluno_id: Annotated[int, Depends(get_current_aluno_id)],
+    db: AsyncSession = Depends(get_db)
+):
+    # Todas as respostas em uma requisição: valida uma vez, insere em um único comando e devolve o
+    # resultado da múltipla escolha, corrigida na hora. As abertas ficam para POST /avaliacoes/{id}/corrigir
+    questao_ids = [resposta.questao_id for resposta in submissao.respostas]
+    if not questao_ids:
+        raise HTTPException(status_code=400, detail="Nenhuma resposta enviada")
+    if len(questao_ids) > QUESTOES_LOTE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Máximo de {QUESTOES_LOTE_MAXIMO} respostas por envio")
+    if len(set(questao_ids)) != len(questao_ids):
+        raise HTTPException(status_code=400, detail="Questão respondida mais de uma vez")
+
+    acesso = await verificar_acesso_avaliacao(db, avaliacao_id, "aluno", aluno_id, "Você não está inscrito nesta matéria")
+    materia_id = acesso.materia_id
+    # Só as questões sorteadas para o aluno valem, tenha ele aberto a prova ou não
+    await verificar_questoes_da_prova(db, avaliacao_id, aluno_id, acesso, questao_ids)
+    gabarito = await crud.get_gabarito(db, materia_id, questao_ids)
+    if len(gabarito) != len(questao_ids):
+        raise HTTPException(status_code=400, detail="Há questões que não pertencem a esta avaliação")
+
+    # O índice único (aluno, avaliação, questão) recusa o envio repetido, inclusive simultâneo
+    db_respostas = await crud.create_respostas_bulk(
+        db, correcao.corrigir_envio(aluno_id, avaliacao_id, submissao.respostas, gabarito), materia_id=materia_id
+    )
+    if db_respostas is None:
+        raise HTTPException(status_code=409, detail="Você já enviou respostas para esta avaliação")
+    corrigidas = [resposta for resposta in db_respostas if resposta.corrigida_em is not None]
+    return schemas.ResultadoSubmissao(
+        avaliacao_id=avaliacao_id,
+        total_questoes=len(db_respostas),
+        acertos=sum(1 for resposta in corrigidas if resposta.correta),
+        # Mesma conta do desempenho: as pendentes de correção contam zero
+        nota_final=round(sum(float(resposta.nota) for resposta in corrigidas) / len(db_respostas), 2),
+        pendentes_correcao=len(db_respostas) - len(corrigidas),
+        respostas=[schemas.RespostaAlunoResponse.model_validate(resposta) for resposta in db_respostas]
+    )
+
 @app.get("/alunos/me/desempenho", response_model=List[schemas.DesempenhoResponse])
-def get_my_desempenho(
-    current_aluno: Annotated[models.Aluno, Depends(get_current_aluno)],
-    db: Session = Depends(get_db)
+async def get_my_desempenho(
+    aluno_id: Annotated[int, Depends(get_current_aluno_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    return current_aluno.desempenhos # Assumindo que o relationship 'desempenhos' está carregado
+    return await crud.get_desempenhos_by_aluno(db, aluno_id=aluno_id)
 
 @app.get("/materias/{materia_id}/relatorio-geral", response_model=schemas.RelatorioGeralTurma)
-def get_relatorio_geral_turma(
+async def get_relatorio_geral_turma(
     materia_id: int,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_id(db, materia_id=materia_id)
-    if not db_materia or db_materia.professor_id != current_professor.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para ver este relatório")
-    
-    relatorio = crud.get_relatorio_geral_turma(db, materia_id)
+    relatorio = await crud.get_relatorio_geral_turma(db, materia_id, professor_id=professor_id)
     if relatorio is None:
+        await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para ver este relatório")
         raise HTTPException(status_code=404, detail="Relatório não encontrado ou matéria sem dados")
     
     return relatorio # Pydantic's from_attributes will handle mapping the Row object
 
-@app.get("/materias/{materia_id}/desempenho-individual", response_model=List[schemas.DesempenhoIndividualAluno])
-def get_desempenho_individual_alunos(
+@app.get("/materias/{materia_id}/desempenho-individual", response_model=schemas.Pagina[schemas.DesempenhoIndividualAluno])
+async def get_desempenho_individual_alunos(
     materia_id: int,
-    current_professor: Annotated[models.Professor, Depends(get_current_professor)],
-    db: Session = Depends(get_db)
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    pagina: Annotated[ParametrosPagina, Depends(parametros_pagina)],
+    db: AsyncSession = Depends(get_db)
 ):
-    db_materia = crud.get_materia_by_id(db, materia_id=materia_id)
-    if not db_materia or db_materia.professor_id != current_professor.id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para ver este relatório")
-    
-    desempenho_alunos = crud.get_desempenho_individual_alunos(db, materia_id)
-    return desempenho_alunos # Pydantic's from_attributes will handle mapping the Row objects
+    desempenho_alunos = await crud.get_desempenho_individual_alunos(
+        db, materia_id, professor_id=professor_id, apos=pagina.chave(Decimal, int), limite=pagina.limite_consulta
+    )
+    if not desempenho_alunos:
+        await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para ver este relatório")
+    # O cursor é (nota, id do desempenho), a mesma chave da ordenação
+    return montar_pagina(
+        desempenho_alunos, pagina,
+        chave=lambda linha: (linha.nota_final or 0, linha.desempenho_id),
+        serializar=schemas.DesempenhoIndividualAluno.model_validate
+    )
+
+@app.get("/avaliacoes/{avaliacao_id}/analise-itens", response_model=schemas.AnaliseItensAvaliacao)
+async def get_analise_itens_avaliacao(
+    avaliacao_id: int,
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    db: AsyncSession = Depends(get_db)
+):
+    await verificar_acesso_avaliacao(db, avaliacao_id, "professor", professor_id, "Você não tem permissão para ver este relatório")
+    return await analise.analisar_avaliacao(db, avaliacao_id)
+
+@app.get(
+    "/materias/{materia_id}/exportar/{tipo}",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in exportacao.FORMATOS.values()}}},
+)
+async def exportar_dados_materia(
+    materia_id: int,
+    tipo: Literal["desempenho", "respostas", "inscricoes"],
+    professor_id: Annotated[int, Depends(get_current_professor_id)],
+    formato: Literal["csv", "ndjson"] = Query("csv"),
+    db: AsyncSession = Depends(get_db)
+):
+    # Transmitido sem materializar o resultado: a memória não cresce com o tamanho da turma
+    await verificar_dono_materia(db, materia_id, professor_id, "Você não tem permissão para exportar os dados desta matéria")
+    return exportacao.resposta(tipo, formato, materia_id)
+
+# --- Observabilidade ---
+if METRICAS_ATIVAS:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def get_metricas(request: Request):
+        # Fechado por padrão: sem METRICAS_TOKEN a rota não é exposta
+        if not METRICAS_TOKEN:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+        enviado = request.headers.get("Authorization", "").encode()
+        if not hmac.compare_digest(enviado, f"Bearer {METRICAS_TOKEN}".encode()):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+        return PlainTextResponse(
+            metricas.registro.prometheus({
+                "cache_questoes": cache.questoes.metricas(),
+                "pool_hash": security.pool_hash.metricas(),
+                "fila_jobs": jobs.fila.metricas(),
+                "banco_questoes": cache.banco_questoes.metricas(),
+                "analise_itens": cache.analise_itens.metricas(),
+            }),
+            media_type="text/plain; version=0.0.4",
+        )
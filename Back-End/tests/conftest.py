@@ -0,0 +1,85 @@
+"""Configuração dos testes: API real sobre um SQLite temporário, sem rede nem workers de jobs.
+
+As variáveis de ambiente são definidas antes de importar a app, porque core.config e
+core.database as leem na importação.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_banco = Path(tempfile.mkdtemp()) / "testes.sqlite"
+os.environ["DATABASE_URL"] = f"sqlite:///{_banco}"
+os.environ.setdefault("SECRET_KEY", "segredo-dos-testes")
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["JOBS_WORKERS"] = "0"
+os.environ["IA_PROVEDOR"] = "local"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from core import cache, database, models, security  # noqa: E402
+from main import app  # noqa: E402
+
+@pytest.fixture
+def banco():
+    """Tabelas recriadas e caches em memória limpos a cada teste; devolve uma Session síncrona."""
+    models.Base.metadata.drop_all(database.engine)
+    models.Base.metadata.create_all(database.engine)
+    cache.principais.limpar()
+    cache.questoes.limpar()
+    cache.banco_questoes.limpar()
+    cache.analise_itens.limpar()
+    with Session(database.engine) as sessao:
+        yield sessao
+
+@pytest.fixture
+def cliente(banco):
+    # Sem o "with": o lifespan (workers da fila de jobs) não é iniciado
+    return TestClient(app)
+
+@pytest.fixture
+def consultas():
+    """Lista que recebe cada SQL executado pela engine da API enquanto o teste roda."""
+    executadas = []
+    def registrar(conn, cursor, statement, *args):
+        executadas.append(statement)
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", registrar)
+    yield executadas
+    event.remove(database.async_engine.sync_engine, "before_cursor_execute", registrar)
+
+def headers(user_type: str, usuario) -> dict:
+    token = security.create_access_token({"sub": usuario.email, "user_type": user_type, "id": usuario.id})
+    return {"Authorization": f"Bearer {token}"}
+
+def criar_professor(sessao, n: int = 1):
+    professor = models.Professor(nome=f"Professor {n}", email=f"professor{n}@teste.com", senha_hash="x")
+    sessao.add(professor)
+    sessao.commit()
+    return professor
+
+def criar_aluno(sessao, n: int):
+    aluno = models.Aluno(ra=f"RA{n}", nome=f"Aluno {n}", email=f"aluno{n}@teste.com", senha_hash="x")
+    sessao.add(aluno)
+    sessao.flush()
+    return aluno
+
+def criar_materia(sessao, professor, n: int, questoes: int = 3, alunos=(), quantidade_questoes=None):
+    """Matéria com questões de múltipla escolha, uma avaliação e os alunos inscritos."""
+    materia = models.Materia(professor_id=professor.id, nome=f"Matéria {n}", senha_acesso=f"senha-{n}", texto_base="texto")
+    sessao.add(materia)
+    sessao.flush()
+    sessao.add_all([
+        models.Questao(materia_id=materia.id, pergunta=f"Pergunta {q}?", opcoes={"A": "a", "B": "b"}, resposta_correta="A")
+        for q in range(questoes)
+    ])
+    avaliacao = models.Avaliacao(materia_id=materia.id, titulo="Prova", quantidade_questoes=quantidade_questoes or questoes)
+    sessao.add(avaliacao)
+    sessao.add_all([models.Inscricao(aluno_id=aluno.id, materia_id=materia.id) for aluno in alunos])
+    sessao.commit()
+    return materia, avaliacao
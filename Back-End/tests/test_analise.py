@@ -0,0 +1,88 @@
+"""Análise de itens: índices de uma matriz pequena conferidos à mão e cache invalidado por novas correções."""
+from collections import namedtuple
+from statistics import correlation
+
+import pytest
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import analise, cache, models
+
+Linha = namedtuple("Linha", "aluno_id questao_id alternativa nota tempo_resposta corrigida")
+Questao = namedtuple("Questao", "id pergunta tipo opcoes resposta_correta")
+
+OPCOES = {"A": "a", "B": "b", "C": "c", "D": "d"}
+QUESTOES = [
+    Questao(1, "Q1", "multipla_escolha", OPCOES, "A"),
+    Questao(2, "Q2", "multipla_escolha", OPCOES, "B"),
+    Questao(3, "Q3", "aberta", None, "texto"),
+    Questao(4, "Q4", "multipla_escolha", OPCOES, "A"),
+]
+# Alunos 1 a 4; a aberta do aluno 3 ainda não foi corrigida e a questão 4 todos acertaram
+LINHAS = [
+    Linha(1, 1, "A", 10, 30, True), Linha(1, 2, "B", 10, 20, True), Linha(1, 3, None, 8, 60, True), Linha(1, 4, "A", 10, None, True),
+    Linha(2, 1, "A", 10, 40, True), Linha(2, 2, "A", 0, 20, True), Linha(2, 3, None, 5, 90, True), Linha(2, 4, "A", 10, None, True),
+    Linha(3, 1, "B", 0, 50, True), Linha(3, 2, "B", 10, 20, True), Linha(3, 3, None, 0, 30, False), Linha(3, 4, "A", 10, None, True),
+    Linha(4, 1, "C", 0, 60, True), Linha(4, 2, "Z", 0, 20, True), Linha(4, 3, None, 2, None, True), Linha(4, 4, "A", 10, None, True),
+]
+
+def _restante(aluno_id, questao_id):
+    """Soma das notas normalizadas do aluno nas demais questões (corrigidas)."""
+    return sum(l.nota / 10 for l in LINHAS if l.aluno_id == aluno_id and l.questao_id != questao_id and l.corrigida)
+
+def test_indices_de_uma_matriz_conhecida():
+    resultado = analise.calcular(7, LINHAS, QUESTOES)
+    assert (resultado.avaliacao_id, resultado.alunos, resultado.respostas) == (7, 4, 16)
+    itens = {item.questao_id: item for item in resultado.itens}
+
+    for questao_id in (1, 2, 3):
+        respondidas = [l for l in LINHAS if l.questao_id == questao_id and l.corrigida]
+        assert itens[questao_id].indice_dificuldade == 0.5
+        esperado = correlation([l.nota / 10 for l in respondidas], [_restante(l.aluno_id, questao_id) for l in respondidas])
+        assert itens[questao_id].discriminacao == pytest.approx(esperado, abs=1e-4)
+    # Na aberta, nota e restante da prova crescem juntos (0,8/2,0; 0,5/1,0; 0,2/0,0)
+    assert itens[3].discriminacao == 1.0
+    # Todos acertaram: sem variância, não discrimina
+    assert (itens[4].indice_dificuldade, itens[4].discriminacao) == (1.0, None)
+
+    assert (itens[1].alternativas, itens[1].outras_respostas) == ({"A": 2, "B": 1, "C": 1, "D": 0}, 0)
+    assert (itens[2].alternativas, itens[2].outras_respostas) == ({"A": 1, "B": 2, "C": 0, "D": 0}, 1)
+    assert (itens[3].alternativas, itens[3].outras_respostas) == (None, None)
+    assert (itens[3].respostas, itens[3].corrigidas) == (4, 3)
+    assert [itens[q].tempo_medio for q in (1, 2, 3, 4)] == [45.0, 20.0, 60.0, None]
+
+def test_sem_respostas():
+    assert analise.calcular(7, [], QUESTOES).itens == []
+
+def test_cache_invalidado_pela_correcao(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    materia, avaliacao = criar_materia(banco, professor, 1, questoes=1, alunos=[aluno], quantidade_questoes=2)
+    banco.add(models.Questao(materia_id=materia.id, tipo="aberta", pergunta="O que a fotossíntese produz?",
+                             resposta_correta="glicose e oxigênio"))
+    banco.commit()
+    cabecalhos = headers("aluno", aluno)
+    questoes = cliente.get(f"/avaliacoes/{avaliacao.id}/questoes", headers=cabecalhos).json()["items"]
+    envio = {"respostas": [
+        {"questao_id": questao["id"], "resposta_aluno": "A" if questao["tipo"] == "multipla_escolha" else "glicose e oxigênio"}
+        for questao in questoes
+    ]}
+    assert cliente.post(f"/avaliacoes/{avaliacao.id}/submit", json=envio, headers=cabecalhos).status_code == 200
+
+    url = f"/avaliacoes/{avaliacao.id}/analise-itens"
+    cabecalhos = headers("professor", professor)
+    def aberta():
+        resposta = cliente.get(url, headers=cabecalhos)
+        assert resposta.status_code == 200, resposta.text
+        return next(item for item in resposta.json()["itens"] if item["tipo"] == "aberta")
+    def contadores():
+        metricas = cache.analise_itens.metricas()
+        return metricas["acertos"], metricas["faltas"]
+
+    inicio = contadores()
+    assert (aberta()["corrigidas"], aberta()["indice_dificuldade"]) == (0, None)
+    # A segunda leitura veio do cache
+    assert contadores() == (inicio[0] + 1, inicio[1] + 1)
+
+    assert cliente.post(f"/avaliacoes/{avaliacao.id}/corrigir", headers=cabecalhos).json()["status"] == "concluido"
+    assert (aberta()["corrigidas"], aberta()["indice_dificuldade"]) == (1, 1.0)
+    assert contadores() == (inicio[0] + 2, inicio[1] + 2)
@@ -0,0 +1,60 @@
+"""Autenticação: usuário do token em cache e rehash da senha no login."""
+from conftest import criar_professor
+from core import cache, models, security
+
+def _leituras_de(consultas, tabela):
+    return [sql for sql in consultas if sql.lstrip().upper().startswith("SELECT") and f"FROM {tabela}" in sql]
+
+def test_usuario_em_cache_e_reanexado_sem_consulta(banco, cliente, consultas):
+    professor = criar_professor(banco)
+    # Token sem o claim "id": até as rotas que só precisam do id carregam o usuário
+    cabecalhos = {"Authorization": f"Bearer {security.create_access_token({'sub': professor.email, 'user_type': 'professor'})}"}
+
+    resposta = cliente.get("/users/me", headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    assert len(_leituras_de(consultas, "professores")) == 1
+
+    consultas.clear()
+    resposta = cliente.get("/users/me", headers=cabecalhos)
+    assert (resposta.status_code, resposta.json()["email"]) == (200, professor.email)
+    assert _leituras_de(consultas, "professores") == []
+
+    # Reanexado a uma sessão de escrita (merge load=False), serve a uma rota que grava
+    consultas.clear()
+    materia = {"nome": "Biologia", "senha_acesso": "bio", "texto_base": "texto"}
+    resposta = cliente.post("/materias/", json=materia, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    assert _leituras_de(consultas, "professores") == []
+    banco.expire_all()
+    assert banco.query(models.Materia).one().professor_id == professor.id
+    assert banco.get(models.Professor, professor.id).nome == professor.nome
+
+def test_login_refaz_hash_com_outro_custo(banco, cliente):
+    professor = criar_professor(banco)
+    # Hash gravado com um custo diferente do atual (BCRYPT_ROUNDS=4 nos testes)
+    professor.senha_hash = security.pwd_context.hash("senha-certa", rounds=5)
+    banco.commit()
+    antigo = professor.senha_hash
+    cabecalhos = {"Authorization": f"Bearer {security.create_access_token({'sub': professor.email, 'user_type': 'professor'})}"}
+    assert cliente.get("/users/me", headers=cabecalhos).status_code == 200
+    assert cache.principais.get("professor", professor.email) is not None
+
+    def login(senha):
+        return cliente.post("/token", data={"username": professor.email, "password": senha})
+
+    assert login("senha-errada").status_code == 400
+    banco.expire_all()
+    assert professor.senha_hash == antigo
+
+    assert login("senha-certa").status_code == 200
+    banco.expire_all()
+    novo = professor.senha_hash
+    assert novo.startswith("$2b$04$") and novo != antigo
+    assert security.pwd_context.verify("senha-certa", novo)
+    # O usuário em cache tinha o hash antigo
+    assert cache.principais.get("professor", professor.email) is None
+
+    # Já no custo atual: o próximo login não regrava
+    assert login("senha-certa").status_code == 200
+    banco.expire_all()
+    assert professor.senha_hash == novo
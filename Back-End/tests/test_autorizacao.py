@@ -0,0 +1,52 @@
+"""Autorização na própria consulta: o dono recebe a resposta, outro usuário 403 e um id inexistente 404."""
+import pytest
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+
+MATERIA = {"nome": "Matéria", "senha_acesso": "nova-senha", "texto_base": "texto"}
+INEXISTENTE = 999
+
+# (método, rota, corpo, status para o dono); a matéria não tem alunos nem desempenhos, então as
+# listagens vêm vazias e só a consulta de posse separa "vazio" de "sem permissão"
+ROTAS_PROFESSOR = [
+    ("PUT", "/materias/{materia}", MATERIA, 200),
+    ("DELETE", "/materias/{materia}", None, 204),
+    ("GET", "/materias/{materia}/alunos", None, 200),
+    ("GET", "/materias/{materia}/relatorio-geral", None, 200),
+    ("GET", "/materias/{materia}/desempenho-individual", None, 200),
+    ("GET", "/avaliacoes/{avaliacao}/analise-itens", None, 200),
+    ("POST", "/avaliacoes/{avaliacao}/corrigir", None, 202),
+]
+
+@pytest.mark.parametrize("metodo, rota, corpo, status_dono", ROTAS_PROFESSOR, ids=[f"{m} {r}" for m, r, _, _ in ROTAS_PROFESSOR])
+def test_rotas_do_professor(banco, cliente, metodo, rota, corpo, status_dono):
+    dono, outro = criar_professor(banco), criar_professor(banco, 2)
+    materia, avaliacao = criar_materia(banco, dono, 1)
+    def chamar(professor, materia_id, avaliacao_id):
+        url = rota.format(materia=materia_id, avaliacao=avaliacao_id)
+        return cliente.request(metodo, url, json=corpo, headers=headers("professor", professor))
+
+    assert chamar(outro, materia.id, avaliacao.id).status_code == 403
+    resposta = chamar(dono, INEXISTENTE, INEXISTENTE)
+    assert resposta.status_code == 404
+    assert resposta.json()["detail"] in ("Matéria não encontrada", "Avaliação não encontrada")
+    resposta = chamar(dono, materia.id, avaliacao.id)
+    assert resposta.status_code == status_dono, resposta.text
+    if metodo == "GET" and "items" in resposta.json():
+        assert resposta.json()["items"] == []
+
+@pytest.mark.parametrize("metodo, rota, corpo", [
+    ("GET", "/avaliacoes/{avaliacao}/questoes", None),
+    ("POST", "/avaliacoes/{avaliacao}/submit", {"respostas": [{"questao_id": 1, "resposta_aluno": "A"}]}),
+])
+def test_rotas_do_aluno(banco, cliente, metodo, rota, corpo):
+    professor = criar_professor(banco)
+    inscrito, estranho = criar_aluno(banco, 1), criar_aluno(banco, 2)
+    _, avaliacao = criar_materia(banco, professor, 1, alunos=[inscrito])
+    def chamar(aluno, avaliacao_id):
+        return cliente.request(metodo, rota.format(avaliacao=avaliacao_id), json=corpo, headers=headers("aluno", aluno))
+
+    assert chamar(estranho, avaliacao.id).status_code == 403
+    resposta = chamar(inscrito, INEXISTENTE)
+    assert (resposta.status_code, resposta.json()["detail"]) == (404, "Avaliação não encontrada")
+    assert chamar(inscrito, avaliacao.id).status_code == 200
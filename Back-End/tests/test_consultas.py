@@ -0,0 +1,40 @@
+"""Número de consultas das listagens de matérias: constante, independente de quantas existam."""
+import pytest
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import models
+
+PERFIS = ["", "professor", "questoes", "inscricoes", "avaliacoes", "professor,questoes,inscricoes,avaliacoes"]
+
+def _semear(sessao, professor, inicio: int, fim: int):
+    """Matérias [inicio, fim) com questões, alunos inscritos e respostas."""
+    for n in range(inicio, fim):
+        alunos = [criar_aluno(sessao, n * 10 + k) for k in range(3)]
+        materia, avaliacao = criar_materia(sessao, professor, n, alunos=alunos)
+        questao = sessao.query(models.Questao).filter_by(materia_id=materia.id).first()
+        sessao.add_all([
+            models.RespostaAluno(aluno_id=aluno.id, questao_id=questao.id, avaliacao_id=avaliacao.id, resposta_aluno="A")
+            for aluno in alunos
+        ])
+        sessao.commit()
+
+def _contar(cliente, consultas, rota, cabecalhos):
+    consultas.clear()
+    resposta = cliente.get(rota, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    return len(consultas), len(resposta.json()["items"])
+
+@pytest.mark.parametrize("expand", PERFIS)
+def test_materias_do_professor_com_consultas_constantes(banco, cliente, consultas, expand):
+    professor = criar_professor(banco)
+    rota = f"/professores/me/materias?expand={expand}" if expand else "/professores/me/materias"
+
+    _semear(banco, professor, 0, 2)
+    poucas, itens = _contar(cliente, consultas, rota, headers("professor", professor))
+    assert itens == 2
+
+    _semear(banco, professor, 2, 20)
+    muitas, itens = _contar(cliente, consultas, rota, headers("professor", professor))
+    assert itens == 20
+
+    assert poucas == muitas
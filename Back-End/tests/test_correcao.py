@@ -0,0 +1,38 @@
+"""Correção das respostas pendentes: duas correções simultâneas não somam a mesma resposta duas vezes."""
+import asyncio
+
+from conftest import criar_aluno, criar_materia, criar_professor
+from core import correcao, crud, database, models
+
+def test_correcoes_simultaneas_somam_uma_vez(banco):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    materia, avaliacao = criar_materia(banco, professor, 1, alunos=[aluno])
+    banco.add_all([
+        models.RespostaAluno(aluno_id=aluno.id, questao_id=questao.id, avaliacao_id=avaliacao.id, resposta_aluno="A")
+        for questao in banco.query(models.Questao).filter_by(materia_id=materia.id)
+    ])
+    banco.commit()
+
+    async def cenario():
+        async with database.AsyncSessionLocal() as primeira, database.AsyncSessionLocal() as segunda:
+            # A segunda correção lê as pendentes antes de a primeira gravar
+            pendentes = await crud.get_respostas_a_corrigir(segunda, avaliacao_id=avaliacao.id)
+            await segunda.commit()
+            resultado = await correcao.corrigir_respostas(primeira, avaliacao_id=avaliacao.id)
+            atrasadas = await crud.salvar_correcoes(
+                segunda,
+                [{"id": linha.id, **correcao.corrigir_multipla_escolha(linha.resposta_aluno, linha.resposta_correta)}
+                 for linha in pendentes],
+                {linha.id: linha for linha in pendentes}
+            )
+        await database.async_engine.dispose()
+        return resultado, atrasadas
+
+    resultado, atrasadas = asyncio.run(cenario())
+    assert (resultado["corrigidas"], resultado["multipla_escolha"], resultado["pendentes"]) == (3, 3, 0)
+    assert atrasadas == []
+    desempenho = banco.query(models.Desempenho).one()
+    assert (desempenho.acertos, float(desempenho.soma_notas)) == (3, 30.0)
+    relatorio = banco.query(models.RelatorioMateria).filter_by(materia_id=materia.id).one()
+    assert float(relatorio.maior_nota) <= 10
@@ -0,0 +1,74 @@
+"""Desempenho incremental: os contadores somados a cada envio e correção batem com uma recontagem das respostas."""
+import pytest
+import sqlalchemy as sa
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import models
+
+RESPOSTAS = {"multipla_escolha": ["A", "B"], "aberta": ["glicose"]}
+TEMPOS = [5, 7, 11]
+
+def _recontagem(sessao, aluno_id, avaliacao_id):
+    """(total_questoes, acertos, soma_notas, tempo_total) recontados de respostas_alunos."""
+    r = models.RespostaAluno
+    corrigida = r.corrigida_em.is_not(None)
+    total, acertos, soma, tempo = sessao.execute(
+        sa.select(
+            sa.func.count(),
+            sa.func.sum(sa.case((corrigida & r.correta, 1), else_=0)),
+            sa.func.sum(sa.case((corrigida, r.nota), else_=0)),
+            sa.func.sum(r.tempo_resposta),
+        ).where(r.aluno_id == aluno_id, r.avaliacao_id == avaliacao_id)
+    ).one()
+    return total, acertos, round(float(soma), 2), tempo
+
+def _desempenho(sessao, aluno_id, avaliacao_id):
+    sessao.expire_all()
+    return sessao.execute(sa.select(models.Desempenho).where(
+        models.Desempenho.aluno_id == aluno_id, models.Desempenho.avaliacao_id == avaliacao_id
+    )).scalar_one()
+
+def _conferir(sessao, aluno_id, avaliacao_id, soma_notas, nota_final):
+    desempenho = _desempenho(sessao, aluno_id, avaliacao_id)
+    contadores = (desempenho.total_questoes, desempenho.acertos, float(desempenho.soma_notas), desempenho.tempo_total)
+    assert contadores == _recontagem(sessao, aluno_id, avaliacao_id)
+    assert (float(desempenho.soma_notas), float(desempenho.nota_final)) == (soma_notas, nota_final)
+    assert float(desempenho.nota_final) == round(float(desempenho.soma_notas) / desempenho.total_questoes, 2)
+    return desempenho
+
+@pytest.mark.parametrize("envio, antes", [
+    ("lote", (10.0, 3.33)),   # múltipla escolha corrigida no envio, a aberta conta zero
+    ("unico", (0.0, 0.0)),    # tudo pendente até a correção
+])
+def test_desempenho_acompanha_envio_e_correcao(banco, cliente, envio, antes):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    materia, avaliacao = criar_materia(banco, professor, 1, questoes=2, alunos=[aluno], quantidade_questoes=3)
+    banco.add(models.Questao(materia_id=materia.id, tipo="aberta", pergunta="O que a fotossíntese produz?",
+                             resposta_correta="glicose e oxigênio"))
+    banco.commit()
+    cabecalhos = headers("aluno", aluno)
+    questoes = cliente.get(f"/avaliacoes/{avaliacao.id}/questoes", headers=cabecalhos).json()["items"]
+    respostas = {tipo: iter(valores) for tipo, valores in RESPOSTAS.items()}
+    respostas = [
+        {"questao_id": questao["id"], "resposta_aluno": next(respostas[questao["tipo"]]), "tempo_resposta": tempo}
+        for questao, tempo in zip(questoes, TEMPOS)
+    ]
+
+    if envio == "lote":
+        resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/submit", json={"respostas": respostas}, headers=cabecalhos)
+        assert resposta.status_code == 200, resposta.text
+        # O resultado do envio usa a mesma conta do desempenho
+        assert resposta.json()["nota_final"] == antes[1]
+    else:
+        for item in respostas:
+            resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/submit_resposta", headers=cabecalhos,
+                                    json={**item, "aluno_id": aluno.id, "avaliacao_id": avaliacao.id})
+            assert resposta.status_code == 200, resposta.text
+    assert _conferir(banco, aluno.id, avaliacao.id, *antes).total_questoes == 3
+
+    resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/corrigir", headers=headers("professor", professor))
+    assert resposta.json()["status"] == "concluido", resposta.text
+    # 10 (A) + 0 (B) + 3,33 (uma de três palavras esperadas) sobre as três questões
+    desempenho = _conferir(banco, aluno.id, avaliacao.id, 13.33, 4.44)
+    assert (desempenho.acertos, desempenho.tempo_total) == (1, sum(TEMPOS))
@@ -0,0 +1,19 @@
+"""Exportações da matéria em CSV: texto dos alunos não vira fórmula na planilha."""
+import csv
+import io
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+
+def test_csv_escapa_formulas(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    aluno.nome = '=HYPERLINK("http://exemplo.com","clique")'
+    materia, _ = criar_materia(banco, professor, 1, alunos=[aluno, criar_aluno(banco, 2)])
+
+    resposta = cliente.get(f"/materias/{materia.id}/exportar/inscricoes?formato=csv", headers=headers("professor", professor))
+    assert resposta.status_code == 200, resposta.text
+    linhas = list(csv.reader(io.StringIO(resposta.text.lstrip("\ufeff"))))
+    celulas = [celula for linha in linhas[1:] for celula in linha]
+    assert "'" + aluno.nome in celulas
+    assert "Aluno 2" in celulas
+    assert not any(celula.startswith(("=", "+", "-", "@")) for celula in celulas)
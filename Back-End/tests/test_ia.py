@@ -0,0 +1,83 @@
+"""Geração de questões por IA: divisão do texto em trechos, chamadas em paralelo, retentativas e falha parcial."""
+import asyncio
+
+import pytest
+
+from core import cache, ia
+
+PARAGRAFOS = [f"Parágrafo {p}: " + "conteúdo " * 400 + "fim." for p in range(3)] # ~3.600 caracteres cada
+TEXTO = "\n\n".join(PARAGRAFOS)
+
+class ProvedorTeste(ia.ProvedorLocal):
+    """Provedor local instrumentado: registra as chamadas e falha nos trechos pedidos.
+
+    `falhas` mapeia o início do trecho para quantas chamadas falham antes de dar certo (None: sempre).
+    """
+
+    nome = "teste"
+
+    def __init__(self, falhas=None):
+        super().__init__(latencia=0.01)
+        self.falhas = dict(falhas or {})
+        self.chamadas = []
+        self.simultaneas = self.maximo_simultaneas = 0
+
+    async def gerar(self, trecho, quantidade, nivel_dificuldade):
+        inicio = trecho.split(":")[0]
+        self.chamadas.append((inicio, quantidade))
+        self.simultaneas += 1
+        self.maximo_simultaneas = max(self.maximo_simultaneas, self.simultaneas)
+        try:
+            restantes = self.falhas.get(inicio, 0)
+            if restantes is None or restantes > 0:
+                if restantes:
+                    self.falhas[inicio] -= 1
+                await asyncio.sleep(self.latencia)
+                return "isto não é JSON" # resposta malformada: falha temporária
+            return await super().gerar(trecho, quantidade, nivel_dificuldade)
+        finally:
+            self.simultaneas -= 1
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(ia, "IA_ESPERA_BASE", 0)
+    cache.questoes.limpar()
+    yield
+    cache.questoes.limpar()
+
+def _gerar(provedor, quantidade, concorrencia=2):
+    return asyncio.run(ia.gerar_questoes(1, TEXTO, quantidade, provedor=provedor, concorrencia=concorrencia))
+
+def test_divisao_e_distribuicao():
+    assert ia.dividir_texto(TEXTO) == PARAGRAFOS
+    assert ia.dividir_texto("Uma frase. Outra frase. Mais uma.", tamanho=24) == ["Uma frase. Outra frase.", "Mais uma."]
+    assert ia.dividir_texto("x" * 10, tamanho=4) == ["xxxx", "xxxx", "xx"]
+    assert ia.distribuir(7, 3) == [3, 2, 2]
+
+def test_um_trecho_por_chamada_em_paralelo():
+    provedor = ProvedorTeste()
+    questoes = _gerar(provedor, 7)
+    assert len(questoes) == 7
+    assert sorted(provedor.chamadas) == [("Parágrafo 0", 3), ("Parágrafo 1", 2), ("Parágrafo 2", 2)]
+    assert provedor.maximo_simultaneas == 2
+    # Menos questões que trechos: um trecho por questão, espalhados pelo texto
+    provedor = ProvedorTeste()
+    cache.questoes.limpar()
+    assert len(_gerar(provedor, 2)) == 2
+    assert sorted(provedor.chamadas) == [("Parágrafo 0", 1), ("Parágrafo 1", 1)]
+
+def test_falha_temporaria_e_repetida():
+    provedor = ProvedorTeste(falhas={"Parágrafo 1": ia.IA_TENTATIVAS - 1})
+    assert len(_gerar(provedor, 6)) == 6
+    assert [inicio for inicio, _ in provedor.chamadas].count("Parágrafo 1") == ia.IA_TENTATIVAS
+
+def test_falha_parcial_guarda_os_trechos_gerados():
+    provedor = ProvedorTeste(falhas={"Parágrafo 2": None})
+    with pytest.raises(ia.ErroIA, match=f"após {ia.IA_TENTATIVAS} tentativas"):
+        _gerar(provedor, 6)
+    assert [inicio for inicio, _ in provedor.chamadas].count("Parágrafo 2") == ia.IA_TENTATIVAS
+
+    # Na nova tentativa, só o trecho que falhou volta ao provedor
+    provedor = ProvedorTeste()
+    assert len(_gerar(provedor, 6)) == 6
+    assert provedor.chamadas == [("Parágrafo 2", 2)]
@@ -0,0 +1,83 @@
+"""Importação de alunos por CSV: separador e cabeçalho, linhas recusadas, limite de linhas e inscrição na matéria."""
+import pytest
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import importacao, models
+
+def _importar(cliente, professor, conteudo: bytes, materia_id=None):
+    return cliente.post(
+        "/alunos/importar", params={"materia_id": materia_id} if materia_id else {},
+        files={"arquivo": ("alunos.csv", conteudo, "text/csv")}, headers=headers("professor", professor)
+    )
+
+@pytest.mark.parametrize("separador", [",", ";", "\t"])
+def test_importacao_com_inscricao(banco, cliente, separador):
+    professor = criar_professor(banco)
+    cadastrado = criar_aluno(banco, 1)
+    banco.commit()
+    materia, _ = criar_materia(banco, professor, 1)
+    resposta = cliente.post("/materias/join", params={"senha_acesso": materia.senha_acesso}, headers=headers("aluno", cadastrado))
+    assert resposta.status_code == 200, resposta.text
+
+    # Cabeçalho em outra ordem e com maiúsculas; BOM do Excel no início
+    linhas = [
+        ["Email", "RA", "Nome", "Senha"],
+        ["novo1@teste.com", "N1", "Novo 1", "senha1"],
+        ["novo2@teste.com", "N2", "Novo 2", "senha2"],
+        ["outro@teste.com", "N1", "RA repetido", "senha"],        # linha 4
+        ["novo2@teste.com", "N3", "Email repetido", "senha"],     # linha 5
+        ["x@teste.com", "RA1", "RA cadastrado", "senha"],         # linha 6
+        ["aluno1@teste.com", "N4", "Email cadastrado", "senha"],  # linha 7
+        ["", "", "", ""],                                         # em branco: ignorada
+        ["vazio@teste.com", "N5", "", "senha"],                   # linha 9
+        ["nao-e-email", "N6", "Email inválido", "senha"],         # linha 10
+    ]
+    conteudo = "\ufeff" + "\n".join(separador.join(linha) for linha in linhas) + "\n"
+    resposta = _importar(cliente, professor, conteudo.encode(), materia.id)
+    assert resposta.status_code == 200, resposta.text
+    resultado = resposta.json()
+    assert (resultado["criados"], resultado["inscritos"]) == (2, 2)
+    erros = {erro["linha"]: erro["erro"] for erro in resultado["erros"]}
+    assert list(erros) == [4, 5, 6, 7, 9, 10]
+    assert erros[4] == "RA repetido no arquivo (linha 2)"
+    assert erros[5] == "Email repetido no arquivo (linha 3)"
+    assert (erros[6], erros[7]) == ("RA já registrado", "Email já registrado")
+    assert erros[9] == "Campos vazios: nome"
+    assert erros[10].startswith("email:")
+
+    banco.expire_all()
+    novos = banco.query(models.Aluno).filter(models.Aluno.ra.in_(["N1", "N2"])).order_by(models.Aluno.ra).all()
+    assert [(aluno.nome, aluno.email) for aluno in novos] == [("Novo 1", "novo1@teste.com"), ("Novo 2", "novo2@teste.com")]
+    assert all(aluno.senha_hash.startswith("$2") for aluno in novos)
+    assert banco.query(models.Inscricao).filter_by(materia_id=materia.id).count() == 3
+    assert banco.get(models.RelatorioMateria, materia.id).total_alunos == 3
+
+def test_importacao_sem_materia_nao_inscreve(banco, cliente):
+    professor = criar_professor(banco)
+    resposta = _importar(cliente, professor, b"ra,nome,email,senha\nN1,Novo 1,novo1@teste.com,senha1\n")
+    assert resposta.status_code == 200, resposta.text
+    assert (resposta.json()["criados"], resposta.json()["inscritos"]) == (1, 0)
+    assert banco.query(models.Inscricao).count() == 0
+
+@pytest.mark.parametrize("conteudo, detalhe", [
+    (b"ra,nome,senha\nN1,Novo 1,senha1\n", "Colunas obrigatórias ausentes no cabeçalho: email"),
+    (b"N1,Novo 1,novo1@teste.com,senha1\n", "Colunas obrigatórias ausentes no cabeçalho: ra, nome, email, senha"),
+    ("ra,nome,email,senha\nN1,João,joao@teste.com,senha\n".encode("latin-1"), "O arquivo deve estar codificado em UTF-8"),
+])
+def test_arquivo_invalido(banco, cliente, conteudo, detalhe):
+    professor = criar_professor(banco)
+    resposta = _importar(cliente, professor, conteudo)
+    assert resposta.status_code == 400
+    assert resposta.json()["detail"] == detalhe
+    assert banco.query(models.Aluno).count() == 0
+
+def test_limite_de_linhas(banco, cliente, monkeypatch):
+    monkeypatch.setattr(importacao, "ALUNOS_IMPORTACAO_MAXIMO", 2)
+    professor = criar_professor(banco)
+    linhas = "".join(f"N{n},Novo {n},novo{n}@teste.com,senha\n" for n in range(3))
+    resposta = _importar(cliente, professor, ("ra,nome,email,senha\n" + linhas).encode())
+    assert resposta.status_code == 400
+    assert resposta.json()["detail"] == "Máximo de 2 alunos por importação"
+    assert banco.query(models.Aluno).count() == 0
+    # No limite, importa tudo
+    assert _importar(cliente, professor, ("ra,nome,email,senha\n" + linhas.split("\n", 1)[1]).encode()).json()["criados"] == 2
@@ -0,0 +1,120 @@
+"""As consultas do crud usam índices: nenhum comando faz scan sequencial de uma tabela.
+
+Popula o banco de teste com benchmarks.dados, executa as funções de leitura e de escrita filtrada
+do core.crud registrando o SQL emitido e roda EXPLAIN QUERY PLAN em cada comando. O critério do
+SQLite é um "SCAN tabela" sem "USING INDEX": sem ANALYZE, o planejador usa um índice sempre que
+houver um que atenda a consulta, então o resultado não depende do volume de dados.
+"""
+import asyncio
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import event
+
+from benchmarks import dados
+from core import crud, database, models, schemas
+
+async def _consultas(db):
+    """Executa as funções do crud que filtram linhas; devolve {nome: chamada}, na ordem de execução."""
+    materia = await crud.get_materia_by_id(db, 1)
+    materia_id, professor_id = materia.id, materia.professor_id
+    inscricao = (await crud.get_inscricoes_by_materia(db, materia_id, limite=1))[0]
+    aluno_id = inscricao.aluno_id
+    desempenho = (await crud.get_desempenhos_by_aluno(db, aluno_id))[0]
+    avaliacao_id = desempenho.avaliacao_id
+    questoes = await crud.get_questoes_by_materia(db, materia_id, expand={"respostas_aluno"}, limite=20)
+    respostas = await crud.get_respostas_by_aluno_and_avaliacao(db, aluno_id, avaliacao_id)
+    expand_materia = frozenset(crud.CARREGAMENTO_EXPANSOES[models.Materia])
+    expand_avaliacao = frozenset(crud.CARREGAMENTO_EXPANSOES[models.Avaliacao])
+
+    return {
+        "get_professor_by_email": lambda: crud.get_professor_by_email(db, "professor1@bench"),
+        "get_professor_by_id": lambda: crud.get_professor_by_id(db, professor_id),
+        "get_aluno_by_email": lambda: crud.get_aluno_by_email(db, "aluno1@bench"),
+        "get_aluno_by_ra": lambda: crud.get_aluno_by_ra(db, "RA1"),
+        "get_aluno_by_id": lambda: crud.get_aluno_by_id(db, aluno_id),
+        "get_materia_by_id": lambda: crud.get_materia_by_id(db, materia_id, expand=expand_materia),
+        "get_materias_by_professor": lambda: crud.get_materias_by_professor(db, professor_id, apos=0, limite=50),
+        "get_materias_by_aluno": lambda: crud.get_materias_by_aluno(db, aluno_id, limite=50),
+        "get_materia_by_senha_acesso": lambda: crud.get_materia_by_senha_acesso(db, materia.senha_acesso),
+        "get_materia_professor_id": lambda: crud.get_materia_professor_id(db, materia_id),
+        "get_acesso_avaliacao (professor)": lambda: crud.get_acesso_avaliacao(db, avaliacao_id, "professor", professor_id),
+        "get_acesso_avaliacao (aluno)": lambda: crud.get_acesso_avaliacao(db, avaliacao_id, "aluno", aluno_id),
+        "get_inscricao": lambda: crud.get_inscricao(db, aluno_id, materia_id),
+        "get_inscricoes_by_aluno": lambda: crud.get_inscricoes_by_aluno(db, aluno_id, apos=0, limite=50),
+        "get_inscricoes_by_materia": lambda: crud.get_inscricoes_by_materia(db, materia_id, professor_id, apos=0, limite=50),
+        "get_questao_by_id": lambda: crud.get_questao_by_id(db, questoes[0].id),
+        "get_questoes_by_materia": lambda: crud.get_questoes_by_materia(db, materia_id, apos=0, limite=50),
+        "get_avaliacao_by_id": lambda: crud.get_avaliacao_by_id(db, avaliacao_id),
+        "get_avaliacoes_by_materia": lambda: crud.get_avaliacoes_by_materia(db, materia_id),
+        "get_resposta_by_id": lambda: crud.get_resposta_by_id(db, respostas[0].id),
+        "get_gabarito": lambda: crud.get_gabarito(db, materia_id, [q.id for q in questoes]),
+        "get_respostas_by_aluno_and_avaliacao": lambda: crud.get_respostas_by_aluno_and_avaliacao(db, aluno_id, avaliacao_id),
+        "get_respostas_a_corrigir (avaliação)": lambda: crud.get_respostas_a_corrigir(db, avaliacao_id=avaliacao_id),
+        "get_respostas_a_corrigir (ids)": lambda: crud.get_respostas_a_corrigir(db, resposta_ids=[r.id for r in respostas]),
+        "get_desempenho_by_aluno_and_avaliacao": lambda: crud.get_desempenho_by_aluno_and_avaliacao(db, aluno_id, avaliacao_id),
+        "get_desempenhos_by_aluno": lambda: crud.get_desempenhos_by_aluno(db, aluno_id),
+        "get_relatorio_geral_turma": lambda: crud.get_relatorio_geral_turma(db, materia_id, professor_id),
+        "get_desempenho_individual_alunos": lambda: crud.get_desempenho_individual_alunos(db, materia_id, professor_id, limite=50),
+        "get_desempenho_individual_alunos (cursor)": lambda: crud.get_desempenho_individual_alunos(
+            db, materia_id, professor_id, apos=(desempenho.nota_final, desempenho.id), limite=50
+        ),
+        "get_job": lambda: crud.get_job(db, 1, "professor", 1),
+        "get_questoes_cache": lambda: crud.get_questoes_cache(db, ["0" * 64]),
+        "update_materia": lambda: crud.update_materia(
+            db, materia_id, professor_id, schemas.MateriaCreate.model_validate(materia, from_attributes=True)
+        ),
+        # Professor inexistente: nada é removido, mas o plano do DELETE é o mesmo
+        "delete_materia": lambda: crud.delete_materia(db, materia_id, -1),
+        "iniciar_job": lambda: crud.iniciar_job(db, 0, tentativas_maximo=3),
+        "recuperar_jobs": lambda: crud.recuperar_jobs(db, 10**9, tentativas_maximo=3),
+        "Avaliacao com expansões": lambda: db.scalar(
+            crud._com_expansoes(sa.select(models.Avaliacao).where(models.Avaliacao.id == avaliacao_id),
+                                models.Avaliacao, expand_avaliacao)
+        ),
+    }
+
+def _scans_sequenciais(linhas):
+    """Tabelas lidas por scan sequencial nas linhas do EXPLAIN QUERY PLAN."""
+    tabelas = set()
+    for linha in linhas:
+        detalhe = linha[-1]
+        if detalhe.startswith("SCAN ") and " USING " not in detalhe:
+            tabela = detalhe.split()[1]
+            if not tabela.startswith("(") and tabela != "CONSTANT":
+                tabelas.add(tabela)
+    return sorted(tabelas)
+
+def test_consultas_do_crud_usam_indices(banco):
+    comandos = []
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            comandos.append((funcao, statement, parameters))
+
+    async def cenario():
+        nonlocal funcao
+        async with database.async_engine.begin() as conn:
+            await dados.popular(conn, professores=3, materias=6, alunos=40, inscricoes_por_aluno=2,
+                                questoes_por_materia=4, avaliacoes_por_materia=2)
+        event.listen(database.async_engine.sync_engine, "before_cursor_execute", registrar)
+        try:
+            async with database.AsyncSessionLocal() as db:
+                for funcao, chamada in (await _consultas(db)).items():
+                    await chamada()
+        finally:
+            event.remove(database.async_engine.sync_engine, "before_cursor_execute", registrar)
+
+        falhas = []
+        async with database.async_engine.connect() as conn:
+            for nome, statement, parameters in comandos:
+                if statement.lstrip().split(None, 1)[0].upper() not in ("SELECT", "UPDATE", "DELETE", "WITH"):
+                    continue
+                plano = (await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)).all()
+                if tabelas := _scans_sequenciais(plano):
+                    falhas.append((nome, tabelas, " ".join(statement.split())))
+        await database.async_engine.dispose()
+        return falhas
+
+    funcao = "preparação"
+    assert asyncio.run(cenario()) == []
+    assert len({nome for nome, _, _ in comandos}) > 30
@@ -0,0 +1,73 @@
+"""Fila de jobs: execução na própria requisição (JOBS_WORKERS=0), erros e retomada após uma interrupção."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core import crud, database, jobs, models
+
+@pytest.fixture
+def tarefas(monkeypatch):
+    """Registra tarefas de teste só durante o teste."""
+    async def somar(db, a, b):
+        return {"soma": a + b}
+    async def falhar(db):
+        raise ValueError("Falha de teste")
+    monkeypatch.setitem(jobs.TAREFAS, "somar", somar)
+    monkeypatch.setitem(jobs.TAREFAS, "falhar", falhar)
+
+def _executar(coro_fn):
+    async def cenario():
+        async with database.AsyncSessionLocal() as db:
+            resultado = await coro_fn(db)
+        await database.async_engine.dispose()
+        return resultado
+    return asyncio.run(cenario())
+
+def test_sem_workers_o_job_roda_na_hora(banco, tarefas):
+    assert not jobs.fila.ativa
+    job = _executar(lambda db: jobs.fila.enfileirar(db, "somar", {"a": 2, "b": 3}, user_type="professor", user_id=1))
+    assert (job.status, job.resultado, job.erro, job.tentativas) == ("concluido", {"soma": 5}, None, 1)
+    assert job.concluido_em is not None
+
+def test_job_com_excecao_fica_com_erro(banco, tarefas):
+    job = _executar(lambda db: jobs.fila.enfileirar(db, "falhar", {}, user_type="professor", user_id=1))
+    assert (job.status, job.resultado, job.erro) == ("erro", None, "Falha de teste")
+
+def test_recuperacao_de_jobs_interrompidos(banco, tarefas):
+    agora = datetime.now(timezone.utc).replace(tzinfo=None) # como crud._agora
+    antigo = agora - timedelta(hours=1)
+    def job(status, tentativas, iniciado_em=None):
+        return models.Job(tipo="somar", parametros={"a": 1, "b": 1}, user_type="professor", user_id=1,
+                          status=status, tentativas=tentativas, iniciado_em=iniciado_em)
+    interrompido, esgotado, em_andamento, pendente = jobs_criados = [
+        job("executando", 1, antigo),
+        job("executando", 3, antigo),
+        job("executando", 1, agora),
+        job("pendente", 0),
+    ]
+    banco.add_all(jobs_criados)
+    banco.commit()
+
+    ids = _executar(lambda db: crud.recuperar_jobs(db, timeout=600, tentativas_maximo=3))
+    assert ids == [interrompido.id, pendente.id]
+    banco.expire_all()
+    assert [j.status for j in jobs_criados] == ["pendente", "erro", "executando", "pendente"]
+    assert "3 tentativas" in esgotado.erro and esgotado.concluido_em is not None
+
+    # A retomada executa de novo e conta mais uma tentativa
+    _executar(lambda db: jobs.fila.executar(interrompido.id))
+    banco.expire_all()
+    assert (interrompido.status, interrompido.resultado, interrompido.tentativas) == ("concluido", {"soma": 2}, 2)
+
+def test_job_sem_tentativas_restantes_nao_e_executado(banco, tarefas, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_TENTATIVAS_MAXIMO", 2)
+    job = models.Job(tipo="somar", parametros={"a": 1, "b": 1}, user_type="professor", user_id=1,
+                     status="pendente", tentativas=2)
+    banco.add(job)
+    banco.commit()
+
+    _executar(lambda db: jobs.fila.executar(job.id))
+    banco.expire_all()
+    assert (job.status, job.resultado, job.tentativas) == ("erro", None, 2)
+    assert "2 tentativas" in job.erro
@@ -0,0 +1,46 @@
+"""O que cada usuário vê de uma matéria: o aluno não recebe o gabarito nem os colegas inscritos."""
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+
+def test_aluno_recebe_questoes_sem_gabarito(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    materia, avaliacao = criar_materia(banco, professor, 1, alunos=[aluno, criar_aluno(banco, 2)])
+    cabecalhos = headers("aluno", aluno)
+
+    for rota in (
+        "/alunos/me/materias?expand=questoes,professor,avaliacoes",
+        f"/materias/{materia.id}?expand=questoes,professor,avaliacoes",
+        f"/avaliacoes/{avaliacao.id}/questoes",
+    ):
+        resposta = cliente.get(rota, headers=cabecalhos)
+        assert resposta.status_code == 200, resposta.text
+        assert "resposta_correta" not in resposta.text
+        assert "aluno2@teste.com" not in resposta.text
+
+    materias = cliente.get("/alunos/me/materias?expand=questoes", headers=cabecalhos).json()
+    assert len(materias["items"][0]["questoes"]) == 3
+
+def test_aluno_nao_expande_inscricoes(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    materia, _ = criar_materia(banco, professor, 1, alunos=[aluno, criar_aluno(banco, 2)])
+
+    assert cliente.get("/alunos/me/materias?expand=inscricoes", headers=headers("aluno", aluno)).status_code == 400
+    assert cliente.get(f"/materias/{materia.id}?expand=inscricoes", headers=headers("aluno", aluno)).status_code == 403
+
+def test_get_materia_exige_acesso(banco, cliente):
+    professor = criar_professor(banco)
+    outro = criar_professor(banco, 2)
+    inscrito, estranho = criar_aluno(banco, 1), criar_aluno(banco, 2)
+    materia, avaliacao = criar_materia(banco, professor, 1, alunos=[inscrito])
+    rota = f"/materias/{materia.id}?expand=questoes"
+
+    assert cliente.get(rota).status_code == 401
+    assert cliente.get(rota, headers=headers("aluno", estranho)).status_code == 403
+    assert cliente.get(rota, headers=headers("professor", outro)).status_code == 403
+    assert cliente.get(rota, headers=headers("aluno", inscrito)).status_code == 200
+    resposta = cliente.get(rota, headers=headers("professor", professor))
+    assert resposta.status_code == 200
+    assert all(questao["resposta_correta"] == "A" for questao in resposta.json()["questoes"])
+    resposta = cliente.get(f"/avaliacoes/{avaliacao.id}/questoes", headers=headers("professor", professor))
+    assert all(questao["resposta_correta"] == "A" for questao in resposta.json()["items"])
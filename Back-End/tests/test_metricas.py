@@ -0,0 +1,22 @@
+"""/metrics: fechado sem METRICAS_TOKEN e exigindo o token quando definido."""
+import main
+from conftest import criar_professor, headers
+
+def test_metricas_sem_token_configurado_nao_sao_expostas(banco, cliente, monkeypatch):
+    monkeypatch.setattr(main, "METRICAS_TOKEN", None)
+    assert cliente.get("/metrics").status_code == 404
+    assert cliente.get("/metrics", headers={"Authorization": "Bearer qualquer"}).status_code == 404
+
+def test_metricas_exigem_o_token(banco, cliente, monkeypatch):
+    monkeypatch.setattr(main, "METRICAS_TOKEN", "token-das-metricas")
+    professor = criar_professor(banco)
+    assert cliente.get("/professores/me/materias", headers=headers("professor", professor)).status_code == 200
+
+    assert cliente.get("/metrics").status_code == 401
+    assert cliente.get("/metrics", headers={"Authorization": "Bearer outro"}).status_code == 401
+    assert cliente.get("/metrics", headers=headers("professor", professor)).status_code == 401
+
+    resposta = cliente.get("/metrics", headers={"Authorization": "Bearer token-das-metricas"})
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.headers["content-type"].startswith("text/plain")
+    assert "/professores/me/materias" in resposta.text
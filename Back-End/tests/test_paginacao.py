@@ -0,0 +1,73 @@
+"""Paginação por cursor: percorrer todas as páginas entrega cada item uma vez, na ordem, e cursores inválidos dão 400."""
+import base64
+import json
+
+import pytest
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import models
+from core.paginacao import codificar_cursor
+
+def _percorrer(cliente, url, cabecalhos, limite):
+    """Itens de todas as páginas, seguindo next_cursor até o fim."""
+    itens, cursor = [], None
+    while True:
+        params = {"limite": limite, **({"cursor": cursor} if cursor else {})}
+        resposta = cliente.get(url, params=params, headers=cabecalhos)
+        assert resposta.status_code == 200, resposta.text
+        pagina = resposta.json()
+        assert len(pagina["items"]) <= limite
+        itens += pagina["items"]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            return itens
+
+def test_desempenho_individual_com_notas_empatadas(banco, cliente):
+    professor = criar_professor(banco)
+    notas = [5.5, 8, 5.5, None, 8, 0, 5.5, 5.5, 10]
+    alunos = [criar_aluno(banco, n) for n in range(len(notas))]
+    materia, avaliacao = criar_materia(banco, professor, 1, alunos=alunos)
+    desempenhos = [
+        models.Desempenho(aluno_id=aluno.id, avaliacao_id=avaliacao.id, materia_id=materia.id,
+                          total_questoes=3, acertos=1, nota_final=nota)
+        for aluno, nota in zip(alunos, notas)
+    ]
+    banco.add_all(desempenhos)
+    banco.commit()
+    # Nota (nula conta como zero) decrescente; nos empates, o desempenho mais recente primeiro
+    esperado = [
+        desempenho.aluno.ra
+        for desempenho in sorted(desempenhos, key=lambda d: (float(d.nota_final or 0), d.id), reverse=True)
+    ]
+
+    url = f"/materias/{materia.id}/desempenho-individual"
+    cabecalhos = headers("professor", professor)
+    for limite in (1, 2, 3, len(notas), 50):
+        assert [item["ra"] for item in _percorrer(cliente, url, cabecalhos, limite)] == esperado
+
+@pytest.mark.parametrize("cursor", [
+    "isto não é base64!",
+    base64.urlsafe_b64encode(b"nao-json").decode(),
+    codificar_cursor(),                # lista vazia
+    codificar_cursor("5.5"),           # falta o id
+    codificar_cursor("cinco", 3),      # nota que não é número
+    codificar_cursor("5.5", "tres"),   # id que não é inteiro
+    base64.urlsafe_b64encode(json.dumps({"nota": 5}).encode()).decode(),
+])
+def test_cursor_invalido(banco, cliente, cursor):
+    professor = criar_professor(banco)
+    materia, _ = criar_materia(banco, professor, 1)
+    resposta = cliente.get(f"/materias/{materia.id}/desempenho-individual", params={"cursor": cursor},
+                           headers=headers("professor", professor))
+    assert resposta.status_code == 400, resposta.text
+    assert resposta.json()["detail"] == "Cursor de paginação inválido"
+
+def test_listas_por_id(banco, cliente):
+    professor = criar_professor(banco)
+    alunos = [criar_aluno(banco, n) for n in range(7)]
+    materias = [criar_materia(banco, professor, n, alunos=alunos)[0] for n in range(5)]
+    cabecalhos = headers("professor", professor)
+
+    assert [m["id"] for m in _percorrer(cliente, "/professores/me/materias", cabecalhos, 2)] == [m.id for m in materias]
+    inscritos = _percorrer(cliente, f"/materias/{materias[0].id}/alunos", cabecalhos, 3)
+    assert [aluno["id"] for aluno in inscritos] == [aluno.id for aluno in alunos]
@@ -0,0 +1,57 @@
+"""Prova do aluno: questões sorteadas e envio restrito ao conjunto sorteado."""
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import models
+
+def test_prova_aberta_antes_das_questoes_nao_fica_vazia(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    materia, avaliacao = criar_materia(banco, professor, 1, questoes=0, alunos=[aluno], quantidade_questoes=2)
+    rota = f"/avaliacoes/{avaliacao.id}/questoes"
+
+    assert cliente.get(rota, headers=headers("aluno", aluno)).json()["items"] == []
+    novas = [
+        {"materia_id": materia.id, "pergunta": f"Nova {n}?", "opcoes": {"A": "a", "B": "b"}, "resposta_correta": "A"}
+        for n in range(3)
+    ]
+    criadas = cliente.post(f"/materias/{materia.id}/questoes/bulk", json=novas, headers=headers("professor", professor))
+    assert criadas.status_code == 200, criadas.text
+
+    assert len(cliente.get(rota, headers=headers("aluno", aluno)).json()["items"]) == 2
+    assert banco.query(models.ProvaAluno).count() == 1
+
+def test_envio_sem_abrir_a_prova_so_aceita_as_sorteadas(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    materia, avaliacao = criar_materia(banco, professor, 1, questoes=6, alunos=[aluno], quantidade_questoes=2)
+    cabecalhos = headers("aluno", aluno)
+    todas = [questao.id for questao in banco.query(models.Questao).filter_by(materia_id=materia.id)]
+
+    # Sem GET das questões: a prova é sorteada no envio, e o conjunto é o mesmo que o GET devolveria
+    envio = {"respostas": [{"questao_id": questao_id, "resposta_aluno": "A"} for questao_id in todas]}
+    assert cliente.post(f"/avaliacoes/{avaliacao.id}/submit", json=envio, headers=cabecalhos).status_code == 400
+    sorteadas = [questao["id"] for questao in cliente.get(f"/avaliacoes/{avaliacao.id}/questoes", headers=cabecalhos).json()["items"]]
+    assert len(sorteadas) == 2
+    fora = next(questao_id for questao_id in todas if questao_id not in sorteadas)
+    unica = {"aluno_id": aluno.id, "avaliacao_id": avaliacao.id, "questao_id": fora, "resposta_aluno": "A"}
+    assert cliente.post(f"/avaliacoes/{avaliacao.id}/submit_resposta", json=unica, headers=cabecalhos).status_code == 400
+
+    envio = {"respostas": [{"questao_id": questao_id, "resposta_aluno": "A"} for questao_id in sorteadas]}
+    resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/submit", json=envio, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["total_questoes"] == 2
+
+def test_prova_revalidada_com_etag(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    _, avaliacao = criar_materia(banco, professor, 1, alunos=[aluno])
+    cabecalhos = headers("aluno", aluno)
+    rota = f"/avaliacoes/{avaliacao.id}/questoes"
+
+    prova = cliente.get(rota, headers=cabecalhos)
+    assert prova.status_code == 200, prova.text
+    assert len(prova.json()["items"]) == 3
+    assert "resposta_correta" not in prova.text
+    etag = prova.headers["etag"]
+
+    assert cliente.get(rota, headers={**cabecalhos, "If-None-Match": etag}).status_code == 304
+    assert cliente.get(rota, headers={**cabecalhos, "If-None-Match": '"outro"'}).status_code == 200
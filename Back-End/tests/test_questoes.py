@@ -0,0 +1,50 @@
+"""Questões: geração pela fila de jobs (provedor local, executada na própria requisição) e importação em lote."""
+import main
+from conftest import criar_materia, criar_professor, headers
+from core import models
+
+def test_geracao_repetida_nao_duplica_questoes(banco, cliente):
+    professor = criar_professor(banco)
+    materia, _ = criar_materia(banco, professor, 1, questoes=0)
+    materia.texto_base = "A fotossíntese produz glicose. A respiração consome oxigênio. As plantas são autótrofas."
+    banco.commit()
+    rota = f"/ai/generate_questoes/{materia.id}?num_questoes=3"
+
+    primeira = cliente.post(rota, headers=headers("professor", professor))
+    assert primeira.status_code == 202, primeira.text
+    assert len(primeira.json()["resultado"]["questoes"]) == 3
+
+    # A segunda vem do cache: as mesmas perguntas não são inseridas de novo, nem regenerando
+    for sufixo in ("", "&regenerar=true"):
+        resultado = cliente.post(rota + sufixo, headers=headers("professor", professor)).json()["resultado"]
+        assert resultado["questoes"] == []
+        assert resultado["repetidas"] == 3
+
+    assert banco.query(models.Questao).filter_by(materia_id=materia.id).count() == 3
+
+def test_importacao_em_lote_valida_o_lote_inteiro(banco, cliente, monkeypatch):
+    monkeypatch.setattr(main, "QUESTOES_LOTE_MAXIMO", 3)
+    professor, outro = criar_professor(banco), criar_professor(banco, 2)
+    materia, _ = criar_materia(banco, professor, 1, questoes=0)
+    outra_materia, _ = criar_materia(banco, professor, 2, questoes=0)
+    rota = f"/materias/{materia.id}/questoes/bulk"
+    def questao(n, materia_id=materia.id):
+        return {"materia_id": materia_id, "pergunta": f"Pergunta {n}?", "opcoes": {"A": "a", "B": "b"}, "resposta_correta": "A"}
+
+    # Qualquer questão inválida recusa o lote todo
+    recusas = [
+        ([questao(1), questao(2, outra_materia.id)], headers("professor", professor), 400),
+        ([questao(n) for n in range(4)], headers("professor", professor), 400),
+        ([questao(1)], headers("professor", outro), 403),
+        ([{"materia_id": materia.id, "pergunta": "Sem gabarito?"}], headers("professor", professor), 422),
+    ]
+    for lote, cabecalhos, status in recusas:
+        assert cliente.post(rota, json=lote, headers=cabecalhos).status_code == status
+    assert banco.query(models.Questao).count() == 0
+
+    resposta = cliente.post(rota, json=[questao(n) for n in range(3)], headers=headers("professor", professor))
+    assert resposta.status_code == 200, resposta.text
+    # O retorno segue a ordem do lote enviado
+    assert [q["pergunta"] for q in resposta.json()] == ["Pergunta 0?", "Pergunta 1?", "Pergunta 2?"]
+    assert [q["id"] for q in resposta.json()] == sorted(q["id"] for q in resposta.json())
+    assert banco.query(models.Questao).filter_by(materia_id=materia.id).count() == 3
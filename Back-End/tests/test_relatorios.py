@@ -0,0 +1,67 @@
+"""Relatório agregado da turma: os contadores incrementais batem com um recálculo a partir das origens."""
+import asyncio
+
+import sqlalchemy as sa
+
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import database, models, relatorios
+
+def _agregado_atual(sessao, materia_id):
+    relatorio = sessao.get(models.RelatorioMateria, materia_id)
+    return (relatorio.total_alunos, float(relatorio.soma_notas), relatorio.quantidade_notas,
+            relatorio.menor_nota and float(relatorio.menor_nota), relatorio.maior_nota and float(relatorio.maior_nota))
+
+def _agregado_recalculado(sessao, materia_id):
+    d = models.Desempenho
+    total = sessao.scalar(sa.select(sa.func.count()).where(models.Inscricao.materia_id == materia_id))
+    soma, quantidade, menor, maior = sessao.execute(
+        sa.select(sa.func.coalesce(sa.func.sum(d.nota_final), 0), sa.func.count(), sa.func.min(d.nota_final), sa.func.max(d.nota_final))
+        .where(d.materia_id == materia_id)
+    ).one()
+    return (total, float(soma), quantidade, menor and float(menor), maior and float(maior))
+
+def test_relatorio_acompanha_inscricoes_envios_e_correcoes(banco, cliente):
+    professor = criar_professor(banco)
+    materia, avaliacao = criar_materia(banco, professor, 1, questoes=2, quantidade_questoes=3)
+    banco.add(models.Questao(materia_id=materia.id, tipo="aberta", pergunta="O que a fotossíntese produz?",
+                             resposta_correta="glicose e oxigênio"))
+    banco.commit()
+    alunos = [criar_aluno(banco, n) for n in range(1, 5)]
+    banco.commit()
+    for aluno in alunos:
+        resposta = cliente.post("/materias/join", params={"senha_acesso": materia.senha_acesso}, headers=headers("aluno", aluno))
+        assert resposta.status_code == 200, resposta.text
+    assert _agregado_atual(banco, materia.id) == (4, 0.0, 0, None, None)
+
+    # Múltipla escolha corrigida no envio; a aberta fica pendente, contando zero na nota final
+    envios = [("A", "A", "glicose e oxigênio"), ("A", "B", "glicose"), ("B", "B", "glicose e oxigênio")]
+    for aluno, (primeira, segunda, aberta) in zip(alunos, envios):
+        cabecalhos = headers("aluno", aluno)
+        questoes = cliente.get(f"/avaliacoes/{avaliacao.id}/questoes", headers=cabecalhos).json()["items"]
+        respostas = {"multipla_escolha": iter([primeira, segunda]), "aberta": iter([aberta])}
+        envio = {"respostas": [{"questao_id": questao["id"], "resposta_aluno": next(respostas[questao["tipo"]])}
+                               for questao in questoes]}
+        resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/submit", json=envio, headers=cabecalhos)
+        assert resposta.status_code == 200, resposta.text
+    banco.expire_all()
+    assert _agregado_atual(banco, materia.id) == _agregado_recalculado(banco, materia.id)
+    assert _agregado_atual(banco, materia.id)[1:] == (10.0, 3, 0.0, 6.67)
+
+    # A correção das abertas muda notas já agregadas: a maior sobe e a menor sai do zero (releitura)
+    resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/corrigir", headers=headers("professor", professor))
+    assert resposta.status_code == 202, resposta.text
+    assert resposta.json()["status"] == "concluido", resposta.text
+    banco.expire_all()
+    atual = _agregado_atual(banco, materia.id)
+    assert atual == _agregado_recalculado(banco, materia.id)
+    assert atual[3:] == (3.33, 10.0)
+
+    async def reconstruir():
+        async with database.AsyncSessionLocal() as db:
+            linhas = await relatorios.reconstruir(db)
+        await database.async_engine.dispose()
+        return linhas
+
+    assert asyncio.run(reconstruir()) == 1
+    banco.expire_all()
+    assert _agregado_atual(banco, materia.id) == atual
@@ -0,0 +1,39 @@
+"""Envio de respostas pelo aluno: cada questão é respondida uma vez por avaliação."""
+from conftest import criar_aluno, criar_materia, criar_professor, headers
+from core import models
+
+def test_resposta_repetida_e_recusada(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    _, avaliacao = criar_materia(banco, professor, 1, alunos=[aluno])
+    cabecalhos = headers("aluno", aluno)
+    questoes = [questao["id"] for questao in cliente.get(f"/avaliacoes/{avaliacao.id}/questoes", headers=cabecalhos).json()["items"]]
+    envio = {"respostas": [{"questao_id": questao_id, "resposta_aluno": "A"} for questao_id in questoes]}
+
+    resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/submit", json=envio, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    assert cliente.post(f"/avaliacoes/{avaliacao.id}/submit", json=envio, headers=cabecalhos).status_code == 409
+    unica = {"aluno_id": aluno.id, "avaliacao_id": avaliacao.id, "questao_id": questoes[0], "resposta_aluno": "B"}
+    assert cliente.post(f"/avaliacoes/{avaliacao.id}/submit_resposta", json=unica, headers=cabecalhos).status_code == 409
+
+    banco.expire_all()
+    assert banco.query(models.RespostaAluno).count() == 3
+    assert banco.query(models.Desempenho).one().total_questoes == 3
+
+def test_resposta_unica_ignora_correcao_enviada_pelo_cliente(banco, cliente):
+    professor = criar_professor(banco)
+    aluno = criar_aluno(banco, 1)
+    _, avaliacao = criar_materia(banco, professor, 1, alunos=[aluno])
+    cabecalhos = headers("aluno", aluno)
+    questao_id = cliente.get(f"/avaliacoes/{avaliacao.id}/questoes", headers=cabecalhos).json()["items"][0]["id"]
+    envio = {"aluno_id": aluno.id, "avaliacao_id": avaliacao.id, "questao_id": questao_id, "resposta_aluno": "B",
+             "correta": True, "nota": 10, "feedback_ia": "Perfeito!"}
+
+    resposta = cliente.post(f"/avaliacoes/{avaliacao.id}/submit_resposta", json=envio, headers=cabecalhos)
+    assert resposta.status_code == 200, resposta.text
+    assert (resposta.json()["correta"], resposta.json()["nota"], resposta.json()["feedback_ia"]) == (False, 0, None)
+    banco.expire_all()
+    gravada = banco.query(models.RespostaAluno).one()
+    assert (gravada.correta, float(gravada.nota), gravada.feedback_ia, gravada.corrigida_em) == (False, 0, None, None)
+    desempenho = banco.query(models.Desempenho).one()
+    assert (desempenho.acertos, float(desempenho.soma_notas)) == (0, 0)
@@ -0,0 +1,53 @@
+"""Sessões por método HTTP: GET/HEAD recebem a sessão somente leitura, os demais uma transação comum."""
+import asyncio
+
+import pytest
+import sqlalchemy as sa
+from fastapi import Request
+
+from core import database, models
+
+def _sessao(metodo: str, uso):
+    """Executa `uso(db)` com a sessão que get_db entrega para uma requisição com o método dado."""
+    async def cenario():
+        dependencia = database.get_db(Request({"type": "http", "method": metodo, "headers": []}))
+        db = await anext(dependencia)
+        try:
+            return await uso(db)
+        finally:
+            await dependencia.aclose()
+            await database.async_engine.dispose()
+    return asyncio.run(cenario())
+
+def _professor(n: int):
+    return {"nome": f"Professor {n}", "email": f"professor{n}@teste.com", "senha_hash": "x"}
+
+@pytest.mark.parametrize("escrita", [
+    lambda db: db.execute(sa.insert(models.Professor).values(**_professor(1))),
+    lambda db: db.execute(sa.update(models.Professor).values(nome="Outro")),
+    lambda db: db.execute(sa.delete(models.Professor)),
+], ids=["insert", "update", "delete"])
+def test_get_recusa_escrita(banco, escrita):
+    with pytest.raises(RuntimeError, match="somente leitura"):
+        _sessao("GET", escrita)
+    assert banco.query(models.Professor).count() == 0
+
+def test_get_recusa_flush(banco):
+    async def adicionar(db):
+        db.add(models.Professor(**_professor(1)))
+        await db.flush()
+    with pytest.raises(RuntimeError, match="somente leitura"):
+        _sessao("GET", adicionar)
+    assert banco.query(models.Professor).count() == 0
+
+def test_get_le_e_post_grava(banco):
+    banco.add(models.Professor(**_professor(1)))
+    banco.commit()
+    assert _sessao("HEAD", lambda db: db.scalar(sa.select(sa.func.count()).select_from(models.Professor))) == 1
+
+    async def gravar(db):
+        assert not isinstance(db.sync_session, database.SessaoLeitura)
+        db.add(models.Professor(**_professor(2)))
+        await db.commit()
+    _sessao("POST", gravar)
+    assert banco.query(models.Professor).count() == 2